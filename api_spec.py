@@ -0,0 +1,220 @@
+# api_spec.py
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional
+from .async_jobs import AsyncJobConfig
+from .body_template import CompiledBodyTemplate
+from .format_template import CompiledFormatTemplate
+from .json_path import CompiledJsonPath, ExtractPaths
+from .method_router import MethodRouter
+from .output_pager import OutputBudget
+from .quota import QuotaLimit
+from .micro_batch import BatchConfig, MATCH_BY_ID
+
+# 编译时读取的全局配置项，这些项或API自身配置变化时才需要重新编译
+_GLOBAL_KEYS = ("timeout", "max_response_bytes", "output")
+
+class ApiSpec:
+    """编译后的API配置
+    
+    加载配置时一次性解析 endpoint、请求头、方法路由表、请求体模板、提取路径、
+    格式化模板和超时等设置，请求路径上只读取预先解析好的属性；创建后不可修改
+    """
+    
+    __slots__ = (
+        "name", "config", "endpoint", "headers", "method_router", "body_template",
+        "extract_paths", "format_template", "fallback", "stream", "stream_path",
+        "incremental_json", "batch", "async_job", "quotas", "quota_reply", "output_budget", "timeout", "max_response_bytes", "global_defaults", "errors"
+    )
+    
+    def __init__(self, api_config: Dict[str, Any], global_config: Optional[Dict[str, Any]] = None):
+        """编译API配置，所有错误收集到 errors 中而不是抛出
+        
+        Args:
+            api_config: 单个API的原始配置
+            global_config: 全局配置，提供超时和响应大小上限的默认值
+        """
+        global_config = global_config or {}
+        errors: List[str] = []
+        name = api_config.get("name", "")
+        
+        def _error(message: str):
+            errors.append(f"API '{name}' {message}")
+        
+        # 原始配置及用到的全局配置项，热重载时用于判断编译结果和连接池、缓存等有状态组件能否沿用
+        self._set("name", name)
+        self._set("config", api_config)
+        self._set("global_defaults", _global_defaults(global_config))
+        
+        endpoint = api_config.get("endpoint", "")
+        if not endpoint:
+            _error("缺少必要的endpoint配置")
+        self._set("endpoint", endpoint.rstrip("/"))
+        
+        headers = api_config.get("headers") or {}
+        if not isinstance(headers, dict):
+            _error("的headers必须是对象")
+            headers = {}
+        self._set("headers", MappingProxyType({str(key): str(value) for key, value in headers.items()}))
+        
+        # HTTP方法路由表
+        method_router = None
+        if api_config.get("methods"):
+            try:
+                method_router = MethodRouter(api_config["methods"])
+            except ValueError as e:
+                _error(f"的methods配置无效: {str(e)}")
+        self._set("method_router", method_router)
+        
+        # 请求体模板，仅在启用预处理且配置了 body 时编译
+        body_template = None
+        preprocess = api_config.get("preprocess") or {}
+        template = preprocess.get("template") or {}
+        if preprocess.get("enabled", False) and "body" in template:
+            try:
+                body_template = CompiledBodyTemplate(template["body"])
+            except ValueError as e:
+                _error(f"的请求体模板无效: {str(e)}")
+        self._set("body_template", body_template)
+        
+        # 响应提取路径和格式化模板
+        response = api_config.get("response") or {}
+        self._set("extract_paths", ExtractPaths(
+            response.get("extract") or {},
+            lambda error: _error(f"的提取路径无效: {error}")
+        ))
+        format_template = None
+        if response.get("format_template"):
+            try:
+                format_template = CompiledFormatTemplate(response["format_template"])
+            except ValueError as e:
+                _error(f"的格式化模板无效: {str(e)}")
+        self._set("format_template", format_template)
+        self._set("fallback", response.get("fallback") or None)
+        
+        # 流式响应配置及逐事件提取路径，未启用时为None
+        stream = api_config.get("stream") or {}
+        stream_path = None
+        if not stream.get("enabled", False):
+            stream = None
+        elif stream.get("extract"):
+            try:
+                stream_path = CompiledJsonPath(stream["extract"])
+            except ValueError as e:
+                _error(f"的流式提取路径无效: {str(e)}")
+        self._set("stream", MappingProxyType(dict(stream)) if stream is not None else None)
+        self._set("stream_path", stream_path)
+        
+        self._set("incremental_json", bool(api_config.get("incremental_json", False)))
+        
+        # 微批配置，未启用时为None
+        batch = None
+        batch_config = api_config.get("batch") or {}
+        if batch_config.get("enabled", False):
+            try:
+                batch = BatchConfig(batch_config)
+            except (TypeError, ValueError) as e:
+                _error(f"的batch配置无效: {str(e)}")
+            # 按ID拆分时 batch_id 由请求体模板写入，没有模板时每条结果都找不到ID
+            if batch is not None and batch.match_by == MATCH_BY_ID and self.body_template is None:
+                _error("的batch配置无效: match_by 为 id 时需要启用 preprocess 请求体模板，并在其中用 {{batch_id}} 写入ID")
+                batch = None
+        self._set("batch", batch)
+        
+        # 异步任务配置，未启用时为None
+        async_job = None
+        job_config = api_config.get("async_job") or {}
+        if job_config.get("enabled", False):
+            try:
+                async_job = AsyncJobConfig(job_config)
+            except (TypeError, ValueError) as e:
+                _error(f"的async_job配置无效: {str(e)}")
+        self._set("async_job", async_job)
+        
+        # 调用配额及超出配额时的回复模板
+        quotas = []
+        for quota_config in api_config.get("quotas") or []:
+            try:
+                quotas.append((f"api:{name}", QuotaLimit.from_config(quota_config)))
+            except (AttributeError, ValueError) as e:
+                _error(f"的quotas配置无效: {str(e)}")
+        self._set("quotas", tuple(quotas))
+        quota_reply = None
+        if api_config.get("quota_reply"):
+            try:
+                quota_reply = CompiledFormatTemplate(api_config["quota_reply"])
+            except ValueError as e:
+                _error(f"的quota_reply模板无效: {str(e)}")
+        self._set("quota_reply", quota_reply)
+        
+        # 单条消息的输出预算，未单独配置（或为0）的项使用全局值
+        output_budget = None
+        output_config = dict(global_config.get("output") or {})
+        output_config.update({key: value for key, value in (api_config.get("output") or {}).items() if value})
+        try:
+            output_budget = OutputBudget.from_config(output_config)
+        except (TypeError, ValueError) as e:
+            _error(f"的output配置无效: {str(e)}")
+        self._set("output_budget", output_budget)
+        
+        # 超时和响应大小上限，未单独配置时使用全局值
+        try:
+            timeout = float(api_config.get("timeout", global_config.get("timeout", 30)))
+            if timeout <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            _error(f"的timeout无效: {api_config.get('timeout')!r}")
+            timeout = 30.0
+        self._set("timeout", timeout)
+        
+        try:
+            max_response_bytes = int(api_config.get(
+                "max_response_bytes", global_config.get("max_response_bytes", 16 * 1024 * 1024)
+            ))
+        except (TypeError, ValueError):
+            _error(f"的max_response_bytes无效: {api_config.get('max_response_bytes')!r}")
+            max_response_bytes = 16 * 1024 * 1024
+        self._set("max_response_bytes", max_response_bytes)
+        
+        self._set("errors", tuple(errors))
+    
+    def _set(self, attribute: str, value: Any):
+        """初始化阶段写入属性"""
+        object.__setattr__(self, attribute, value)
+    
+    def __setattr__(self, attribute: str, value: Any):
+        raise AttributeError(f"ApiSpec 不可修改: {attribute}")
+    
+    def __delattr__(self, attribute: str):
+        raise AttributeError(f"ApiSpec 不可修改: {attribute}")
+    
+    def __repr__(self) -> str:
+        return f"ApiSpec(name={self.name!r}, endpoint={self.endpoint!r})"
+    
+    @classmethod
+    def compile_all(cls, api_configs: List[Dict[str, Any]], global_config: Optional[Dict[str, Any]] = None,
+                    previous: Optional[Dict[str, "ApiSpec"]] = None) -> Dict[str, "ApiSpec"]:
+        """编译API配置列表，缺少名称的配置被忽略
+        
+        Args:
+            api_configs: 原始API配置列表
+            global_config: 全局配置
+            previous: 热重载前的编译结果，原始配置和用到的全局配置项都未变化的API直接沿用
+        
+        Returns:
+            Dict[str, ApiSpec]: 按名称索引的编译结果
+        """
+        previous = previous or {}
+        defaults = _global_defaults(global_config or {})
+        specs = {}
+        for api_config in api_configs:
+            if not isinstance(api_config, dict) or "name" not in api_config:
+                continue
+            spec = previous.get(api_config["name"])
+            if spec is None or spec.config != api_config or spec.global_defaults != defaults:
+                spec = cls(api_config, global_config)
+            specs[api_config["name"]] = spec
+        return specs
+
+def _global_defaults(global_config: Dict[str, Any]) -> Dict[str, Any]:
+    """取出编译时用到的全局配置项"""
+    return {key: global_config.get(key) for key in _GLOBAL_KEYS}
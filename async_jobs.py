@@ -0,0 +1,404 @@
+# async_jobs.py
+import asyncio
+import hmac
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from astrbot.api import logger
+from .body_template import CompiledBodyTemplate
+from .format_template import CompiledFormatTemplate
+from .json_path import CompiledJsonPath, MISSING
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_EXPIRED = "expired"
+
+# 完成方式
+MODE_POLL = "poll"
+MODE_CALLBACK = "callback"
+
+class AsyncJobConfig:
+    """API async_job 配置的编译结果"""
+    
+    __slots__ = (
+        "mode", "ack", "job_id_path", "status_url", "status_method", "state_path",
+        "done_values", "failed_values", "result_path", "poll_interval", "poll_max_interval",
+        "poll_backoff", "max_poll_errors", "max_wait"
+    )
+    
+    def __init__(self, job_config: Dict[str, Any]):
+        """编译 async_job 配置
+        
+        Args:
+            job_config: API的 async_job 配置块
+        
+        Raises:
+            ValueError: 配置无效
+        """
+        self.mode = job_config.get("mode", MODE_POLL)
+        if self.mode not in (MODE_POLL, MODE_CALLBACK):
+            raise ValueError(f"mode 只能是 poll 或 callback: {self.mode}")
+        
+        # 提交后立即回复的确认消息，可引用 {{job_id}} 和提交响应 {{response.xxx}}
+        self.ack = CompiledFormatTemplate(job_config.get("ack") or "任务已提交（{{job_id}}），完成后会通知你")
+        
+        # 提交响应中上游任务ID的路径
+        self.job_id_path: Optional[CompiledJsonPath] = None
+        if job_config.get("job_id_path"):
+            self.job_id_path = CompiledJsonPath(job_config["job_id_path"])
+        
+        # 轮询状态的URL模板，{{job_id}} 为上游任务ID；相对路径拼接在 endpoint 后
+        self.status_url: Optional[CompiledBodyTemplate] = None
+        if job_config.get("status_url"):
+            self.status_url = CompiledBodyTemplate(job_config["status_url"])
+        elif self.mode == MODE_POLL:
+            raise ValueError("poll 模式需要配置 status_url")
+        if self.mode == MODE_POLL and self.job_id_path is None:
+            raise ValueError("poll 模式需要配置 job_id_path")
+        self.status_method = job_config.get("status_method", "GET").upper()
+        
+        # 状态响应中任务状态的路径和表示完成/失败的取值
+        self.state_path = CompiledJsonPath(job_config.get("state_path", "$.status"))
+        self.done_values = {str(value) for value in job_config.get("done_values", ["done", "succeeded", "success", "completed"])}
+        self.failed_values = {str(value) for value in job_config.get("failed_values", ["failed", "error", "cancelled"])}
+        
+        # 完成后结果所在的路径，未配置时使用整个状态响应（回调模式为回调请求体）
+        self.result_path: Optional[CompiledJsonPath] = None
+        if job_config.get("result_path"):
+            self.result_path = CompiledJsonPath(job_config["result_path"])
+        
+        # 轮询间隔按倍数退避
+        self.poll_interval = float(job_config.get("poll_interval", 2))
+        self.poll_max_interval = float(job_config.get("poll_max_interval", 30))
+        self.poll_backoff = max(1.0, float(job_config.get("poll_backoff", 1.5)))
+        self.max_poll_errors = int(job_config.get("max_poll_errors", 5))
+        
+        # 任务最长等待时间（秒），超时后通知用户并放弃
+        self.max_wait = float(job_config.get("max_wait", 600))
+    
+    def extract_result(self, payload: Any) -> Any:
+        """从状态响应或回调请求体中取出结果"""
+        if self.result_path is None:
+            return payload
+        result = self.result_path.extract(payload)
+        return payload if result is MISSING else result
+
+class Job:
+    """一个异步任务"""
+    
+    __slots__ = ("job_id", "token", "api_name", "session", "upstream_id", "state", "created", "finished", "polls", "completion", "task")
+    
+    def __init__(self, job_id: str, api_name: str, session: str):
+        self.job_id = job_id
+        # 回调凭证，回调请求必须携带，防止猜测任务ID伪造结果
+        self.token = secrets.token_urlsafe(16)
+        self.api_name = api_name
+        # 发起任务的会话，完成后推送结果
+        self.session = session
+        # 提交请求返回后才知道上游任务ID
+        self.upstream_id: Optional[str] = None
+        self.state = JOB_PENDING
+        self.created = time.monotonic()
+        self.finished: Optional[float] = None
+        self.polls = 0
+        # 回调模式下收到的完成数据
+        self.completion: Optional[asyncio.Future] = None
+        self.task: Optional[asyncio.Task] = None
+
+class JobManager:
+    """异步任务表：提交后立即确认，后台轮询状态或等待回调，完成后把格式化结果推送回原会话
+    
+    任务表有界：超过 max_jobs 时先淘汰最早结束的任务，全部在进行中时拒绝新任务；
+    结束的任务保留 ttl 秒供管理员查看。任务表属于插件而不是运行时，热重载后继续使用新配置轮询
+    """
+    
+    def __init__(self, get_runtime: Callable[[], Any], notify: Callable[[str, str], Awaitable[None]],
+                 jobs_config: Optional[Dict[str, Any]] = None):
+        """初始化
+        
+        Args:
+            get_runtime: 返回当前运行时的函数
+            notify: 推送消息的协程函数，参数为会话标识和文本
+            jobs_config: 全局 async_jobs 配置块
+        """
+        self._get_runtime = get_runtime
+        self._notify = notify
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.configure(jobs_config)
+    
+    def configure(self, jobs_config: Optional[Dict[str, Any]] = None):
+        """应用全局 async_jobs 配置，热重载时调用，进行中的任务不受影响
+        
+        Args:
+            jobs_config: 全局 async_jobs 配置块
+        """
+        jobs_config = jobs_config or {}
+        self.max_jobs = int(jobs_config.get("max_jobs", 1000))
+        self.ttl = float(jobs_config.get("ttl", 3600))
+        # 回调模式对外暴露的地址，{{callback_url}} 为该地址加任务ID
+        callback_config = jobs_config.get("callback") or {}
+        self.callback_base_url = (callback_config.get("public_url") or "").rstrip("/")
+    
+    async def submit(self, runtime: Any, api_name: str, match_params: Dict[str, Any], session: str) -> str:
+        """提交任务并返回确认消息
+        
+        Args:
+            runtime: 处理该消息的运行时
+            api_name: API名称
+            match_params: 匹配参数
+            session: 发起任务的会话标识
+        
+        Returns:
+            str: 确认消息，提交失败时为格式化的错误
+        """
+        config = runtime.config_service.get_api_spec(api_name).async_job
+        # 发送提交请求前先占位，并发提交不会超过 max_jobs
+        if not self._make_room():
+            return "错误: 进行中的任务过多，请稍后再试"
+        job = Job(uuid.uuid4().hex[:12], api_name, session)
+        self._jobs[job.job_id] = job
+        
+        params = dict(match_params, job_id=job.job_id, callback_token=job.token)
+        if self.callback_base_url:
+            params["callback_url"] = f"{self.callback_base_url}/{job.job_id}?token={job.token}"
+        
+        # 每次提交都创建一个上游任务，不能共用缓存或合并的响应
+        try:
+            success, response = await runtime.request_engine.send_request(api_name, params, exclusive=True)
+        except BaseException:
+            self._jobs.pop(job.job_id, None)
+            raise
+        if not success:
+            self._jobs.pop(job.job_id, None)
+            status_code = response.get("status_code", 200) if isinstance(response, dict) else 200
+            return runtime.response_formatter.format_response(api_name, False, response, status_code)
+        
+        if config.job_id_path is not None:
+            value = config.job_id_path.extract(response)
+            if value is MISSING:
+                self._jobs.pop(job.job_id, None)
+                return f"错误: 提交响应中没有任务ID ({config.job_id_path.path})"
+            job.upstream_id = str(value)
+        
+        if config.mode == MODE_CALLBACK:
+            job.completion = asyncio.get_running_loop().create_future()
+            job.task = asyncio.ensure_future(self._wait_callback(job, config))
+        else:
+            job.task = asyncio.ensure_future(self._poll(job, config))
+        
+        return config.ack.render({"job_id": job.job_id, "upstream_id": job.upstream_id, "response": response})
+    
+    def complete(self, job_id: str, token: str, payload: Any) -> bool:
+        """接收回调模式任务的完成数据
+        
+        Args:
+            job_id: 本地任务ID
+            token: 回调请求携带的凭证
+            payload: 回调请求体
+        
+        Returns:
+            bool: 任务存在、凭证正确且仍在等待回调
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.completion is None or job.completion.done():
+            return False
+        if not hmac.compare_digest(job.token, token):
+            logger.warning(f"任务 {job_id} 的回调凭证不正确，已忽略")
+            return False
+        job.completion.set_result(payload)
+        return True
+    
+    def list_jobs(self, include_finished: bool = False) -> List[Dict[str, Any]]:
+        """列出任务
+        
+        Args:
+            include_finished: 是否包含已结束但尚未过期的任务
+        
+        Returns:
+            List[Dict]: 任务信息，按提交顺序排列
+        """
+        self._expire()
+        now = time.monotonic()
+        return [
+            {
+                "job_id": job.job_id,
+                "api": job.api_name,
+                "state": job.state,
+                "upstream_id": job.upstream_id,
+                "age": round(now - job.created, 1),
+                "polls": job.polls
+            }
+            for job in self._jobs.values()
+            if include_finished or job.state == JOB_PENDING
+        ]
+    
+    async def close(self):
+        """取消所有进行中的任务"""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+    
+    def _expire(self):
+        """移除结束超过 ttl 的任务"""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished is not None and now - job.finished > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+    
+    def _make_room(self) -> bool:
+        """为新任务腾出位置，返回是否可以提交"""
+        self._expire()
+        if len(self._jobs) < self.max_jobs:
+            return True
+        for job_id, job in self._jobs.items():
+            if job.state != JOB_PENDING:
+                del self._jobs[job_id]
+                return True
+        return False
+    
+    def _current_config(self, job: Job, config: AsyncJobConfig) -> Tuple[Any, AsyncJobConfig]:
+        """取当前运行时及其中该API的异步任务配置，热重载后使用新配置
+        
+        Returns:
+            Tuple: (运行时, 配置)；API已不存在时运行时为None，API不再是异步任务时沿用原配置
+        """
+        runtime = self._get_runtime()
+        spec = runtime.config_service.get_api_spec(job.api_name) if runtime is not None else None
+        if spec is None:
+            return None, config
+        return runtime, spec.async_job or config
+    
+    async def _poll(self, job: Job, config: AsyncJobConfig):
+        """按退避间隔轮询任务状态直到完成、失败或超时，每次轮询使用最新的配置"""
+        interval = config.poll_interval
+        errors = 0
+        while True:
+            remaining = job.created + config.max_wait - time.monotonic()
+            if remaining <= 0:
+                await self._finish(job, JOB_EXPIRED, f"任务 {job.job_id} 等待超时")
+                return
+            await asyncio.sleep(min(interval, remaining))
+            
+            runtime, config = self._current_config(job, config)
+            if runtime is None:
+                await self._finish(job, JOB_FAILED, f"任务 {job.job_id} 的API '{job.api_name}' 已不存在")
+                return
+            interval = min(interval * config.poll_backoff, config.poll_max_interval)
+            
+            spec = runtime.config_service.get_api_spec(job.api_name)
+            url = config.status_url.render({"job_id": job.upstream_id, "local_job_id": job.job_id})
+            if "://" not in url:
+                url = f"{spec.endpoint}/{url.lstrip('/')}"
+            job.polls += 1
+            runtime.enter()
+            try:
+                success, response = await runtime.request_engine.fetch(job.api_name, config.status_method, url)
+            finally:
+                runtime.leave()
+            if not success:
+                errors += 1
+                if errors >= config.max_poll_errors:
+                    text = runtime.response_formatter.format_response(job.api_name, False, response)
+                    await self._finish(job, JOB_FAILED, f"任务 {job.job_id} 查询状态失败\n{text}")
+                    return
+                continue
+            errors = 0
+            
+            state = config.state_path.extract(response)
+            if state is MISSING:
+                continue
+            if str(state) in config.done_values:
+                result = config.extract_result(response)
+                await self._finish(job, JOB_DONE, runtime.response_formatter.format_response(job.api_name, True, result))
+                return
+            if str(state) in config.failed_values:
+                await self._finish(job, JOB_FAILED, f"任务 {job.job_id} 失败: {state}")
+                return
+    
+    async def _wait_callback(self, job: Job, config: AsyncJobConfig):
+        """等待上游回调，超时后放弃；收到回调后按最新的配置提取结果"""
+        try:
+            payload = await asyncio.wait_for(job.completion, config.max_wait)
+        except asyncio.TimeoutError:
+            await self._finish(job, JOB_EXPIRED, f"任务 {job.job_id} 等待超时")
+            return
+        
+        runtime, config = self._current_config(job, config)
+        if runtime is None:
+            await self._finish(job, JOB_FAILED, f"任务 {job.job_id} 的API '{job.api_name}' 已不存在")
+            return
+        state = config.state_path.extract(payload)
+        if state is not MISSING and str(state) in config.failed_values:
+            await self._finish(job, JOB_FAILED, f"任务 {job.job_id} 失败: {state}")
+            return
+        result = config.extract_result(payload)
+        await self._finish(job, JOB_DONE, runtime.response_formatter.format_response(job.api_name, True, result))
+    
+    async def _finish(self, job: Job, state: str, text: str):
+        """结束任务并把结果推送回原会话"""
+        job.state = state
+        job.finished = time.monotonic()
+        try:
+            await self._notify(job.session, text)
+        except Exception as e:
+            logger.error(f"推送任务 {job.job_id} 的结果失败: {str(e)}")
+
+class JobCallbackServer:
+    """接收上游任务完成回调的本地HTTP服务：POST {path}/{job_id}?token={凭证}，请求体为JSON
+    
+    凭证也可以放在 X-Callback-Token 请求头中
+    """
+    
+    def __init__(self, manager: JobManager, host: str = "127.0.0.1", port: int = 9465, path: str = "/jobs"):
+        """初始化服务
+        
+        Args:
+            manager: 任务表
+            host: 监听地址
+            port: 监听端口
+            path: 回调路径前缀
+        """
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.path = "/" + path.strip("/")
+        self._runner = None
+    
+    async def start(self):
+        """启动HTTP服务"""
+        from aiohttp import web
+        
+        async def _handle(request):
+            try:
+                payload = await request.json()
+            except ValueError:
+                payload = await request.text()
+            token = request.query.get("token") or request.headers.get("X-Callback-Token", "")
+            if not self.manager.complete(request.match_info["job_id"], token, payload):
+                return web.Response(status=404, text="unknown job")
+            return web.Response(text="ok")
+        
+        app = web.Application()
+        app.router.add_post(self.path + "/{job_id}", _handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"任务回调服务已启动: http://{self.host}:{self.port}{self.path}")
+    
+    async def stop(self):
+        """停止HTTP服务"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,79 @@
+# benchmarks/__main__.py
+"""运行全部基准并输出JSON报告，可与之前提交的报告对比
+
+运行方式（在插件根目录下）：
+    python -m benchmarks                         # 输出到标准输出
+    python -m benchmarks -o result.json          # 写入文件
+    python -m benchmarks --only match --quick    # 只运行部分基准
+    python -m benchmarks -o new.json --compare old.json
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+from . import bench_body_template, bench_dispatch, bench_json, bench_match, bench_templates
+from ._common import emit, environment
+
+SUITES = {
+    "match": bench_match,
+    "templates": bench_templates,
+    "body_template": bench_body_template,
+    "dispatch": bench_dispatch,
+    "json": bench_json
+}
+
+def _result_key(result: Dict[str, Any]) -> str:
+    """用基准名和参数标识一条结果"""
+    return result["benchmark"] + json.dumps(result["params"], sort_keys=True)
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """对比两份报告的吞吐量
+    
+    Args:
+        baseline: 基线报告
+        current: 当前报告
+        threshold: 吞吐量下降超过该比例时标记为回退
+    
+    Returns:
+        List[str]: 每条共同结果一行的对比文本
+    """
+    previous = {_result_key(result): result for result in baseline.get("results", [])}
+    lines = []
+    for result in current["results"]:
+        old = previous.get(_result_key(result))
+        if old is None or not old.get("ops_per_sec"):
+            continue
+        ratio = result["ops_per_sec"] / old["ops_per_sec"]
+        flag = "  REGRESSION" if ratio < 1 - threshold else ""
+        lines.append(f"{result['benchmark']} {json.dumps(result['params'], sort_keys=True)}: {ratio:.2f}x{flag}")
+    return lines
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="外部API插件基准测试")
+    parser.add_argument("--only", action="append", choices=sorted(SUITES), help="只运行指定基准，可重复")
+    parser.add_argument("--quick", action="store_true", help="快速模式，缩小规模和测量时间")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument("-o", "--output", help="JSON报告输出路径，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之前的JSON报告对比吞吐量")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定为回退的吞吐量下降比例")
+    args = parser.parse_args(argv)
+    
+    report = {"environment": environment(args.seed), "results": []}
+    for name in args.only or list(SUITES):
+        print(f"运行基准: {name}", file=sys.stderr)
+        report["results"].extend(SUITES[name].run(quick=args.quick, seed=args.seed))
+    emit(report, args.output)
+    
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines = compare(baseline, report, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,150 @@
+# benchmarks/_common.py
+"""基准测试公共工具：加载插件模块、计时和输出JSON结果"""
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import types
+from typing import Any, Callable, Dict, List, Optional
+
+# 插件根目录
+PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _provide_logger():
+    """未安装 AstrBot 时注册只含 logger 的 astrbot.api 模块
+    
+    被测的插件模块只从 AstrBot 导入日志记录器，基准因此可以脱离 AstrBot 独立运行
+    """
+    try:
+        importlib.import_module("astrbot.api")
+        return
+    except ImportError:
+        pass
+    api = types.ModuleType("astrbot.api")
+    api.logger = logging.getLogger("astrbot")
+    package = types.ModuleType("astrbot")
+    package.__path__ = []
+    package.api = api
+    sys.modules.setdefault("astrbot", package)
+    sys.modules.setdefault("astrbot.api", api)
+
+def load_plugin_module(name: str):
+    """按包名导入插件模块，使模块内的相对导入可用
+    
+    Args:
+        name: 模块名，例如 "rule_factory"
+    
+    Returns:
+        导入的模块
+    """
+    parent = os.path.dirname(PLUGIN_ROOT)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    _provide_logger()
+    return importlib.import_module(f"{os.path.basename(PLUGIN_ROOT)}.{name}")
+
+def _percentile(samples: List[float], q: float) -> float:
+    """计算已排序样本的分位数"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+    return samples[index]
+
+def summarize(per_op_seconds: List[float], operations: int, elapsed: float) -> Dict[str, Any]:
+    """汇总计时样本
+    
+    Args:
+        per_op_seconds: 每个样本的单次操作耗时（秒）
+        operations: 总操作次数
+        elapsed: 总耗时（秒）
+    
+    Returns:
+        Dict: 吞吐量与耗时分位数（微秒）
+    """
+    samples = sorted(per_op_seconds)
+    return {
+        "operations": operations,
+        "ops_per_sec": operations / elapsed if elapsed > 0 else 0.0,
+        "mean_us": sum(samples) / len(samples) * 1e6 if samples else 0.0,
+        "p50_us": _percentile(samples, 0.50) * 1e6,
+        "p90_us": _percentile(samples, 0.90) * 1e6,
+        "p99_us": _percentile(samples, 0.99) * 1e6
+    }
+
+def measure(func: Callable[[], Any], ops_per_call: int = 1, min_time: float = 0.5, sample_time: float = 0.01) -> Dict[str, Any]:
+    """重复调用函数直到达到最短测量时间
+    
+    先校准每个样本的调用次数，使单个样本约为 sample_time 秒，再按样本记录单次操作耗时
+    
+    Args:
+        func: 被测函数
+        ops_per_call: 每次调用包含的操作数（例如一次遍历整个语料）
+        min_time: 最短测量时间（秒）
+        sample_time: 单个样本的目标时长（秒）
+    
+    Returns:
+        Dict: 见 summarize()
+    """
+    # 预热并校准
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= sample_time or calls >= 1 << 20:
+            break
+        calls *= 2
+    
+    samples = []
+    operations = 0
+    total = 0.0
+    while total < min_time:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        operations += calls * ops_per_call
+        samples.append(elapsed / (calls * ops_per_call))
+    return summarize(samples, operations, total)
+
+def git_commit() -> Optional[str]:
+    """获取当前提交哈希，不在git仓库中时返回None"""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PLUGIN_ROOT,
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+def environment(seed: int) -> Dict[str, Any]:
+    """收集便于跨提交对比的环境信息"""
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "seed": seed
+    }
+
+def emit(report: Dict[str, Any], output: Optional[str] = None):
+    """输出JSON报告
+    
+    Args:
+        report: 报告内容
+        output: 输出文件路径，None表示输出到标准输出
+    """
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
\ No newline at end of file
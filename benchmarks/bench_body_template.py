@@ -0,0 +1,90 @@
+# benchmarks/bench_body_template.py
+"""请求体模板微基准：对比预编译模板与逐参数 str.replace 的旧实现
+
+运行方式（在插件根目录下）：
+    python -m benchmarks.bench_body_template
+"""
+from typing import Any, Dict, List
+
+from ._common import emit, environment, load_plugin_module, measure
+
+# 模板中的字符串叶子数和额外参数数
+LEAF_COUNTS = (10, 100, 1000)
+EXTRA_PARAM_COUNTS = (0, 45)
+
+def legacy_apply_template(template, params):
+    """旧版 RequestTemplateEngine._apply_template 的实现，仅用于对比"""
+    def _process_value(value):
+        if isinstance(value, str):
+            for param_key, param_value in params.items():
+                value = value.replace(param_key, str(param_value))
+            return value
+        elif isinstance(value, dict):
+            return _process_dict(value)
+        elif isinstance(value, list):
+            return [_process_value(item) for item in value]
+        return value
+    
+    def _process_dict(template_dict):
+        return {key: _process_value(value) for key, value in template_dict.items()}
+    
+    return _process_dict(template)
+
+def build_template(leaves: int):
+    """构造含指定数量字符串叶子的模板"""
+    template = {"message": "$1", "source": "astrbot", "items": []}
+    for i in range(leaves):
+        template["items"].append({"text": f"第{i}项 $1 / {{{{content}}}}", "index": i})
+    return template
+
+def build_params(count: int):
+    """构造含指定数量参数的匹配参数"""
+    params = {
+        "$1": "hello",
+        "content": "world",
+        "api_name": "local_test",
+        "path_override": "/hello",
+        "method_override": "POST"
+    }
+    for i in range(count):
+        params[f"extra_{i}"] = f"value_{i}"
+    return params
+
+def run(quick: bool = False, seed: int = 0) -> List[Dict[str, Any]]:
+    """执行基准
+    
+    Args:
+        quick: 快速模式，缩短测量时间
+        seed: 随机种子（模板基准不使用随机数据，仅为接口一致）
+    
+    Returns:
+        List[Dict]: 每种实现、叶子数和参数数组合一条结果
+    """
+    body_template_module = load_plugin_module("body_template")
+    min_time = 0.2 if quick else 1.0
+    
+    results = []
+    for leaves in LEAF_COUNTS:
+        for extra in EXTRA_PARAM_COUNTS:
+            template = build_template(leaves)
+            params = build_params(extra)
+            compiled = body_template_module.CompiledBodyTemplate(template)
+            implementations = {
+                "legacy": lambda: legacy_apply_template(template, params),
+                "compiled": lambda: compiled.render(params)
+            }
+            for implementation, function in implementations.items():
+                result = measure(function, min_time=min_time)
+                result.update({
+                    "benchmark": "body_template_render",
+                    "params": {"impl": implementation, "leaves": leaves, "params": len(params)}
+                })
+                results.append(result)
+    return results
+
+def main():
+    """执行基准并输出JSON"""
+    emit({"environment": environment(0), "results": run()})
+
+if __name__ == "__main__":
+    main()
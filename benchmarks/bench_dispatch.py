@@ -0,0 +1,127 @@
+# benchmarks/bench_dispatch.py
+"""端到端请求基准：对本地 aiohttp 桩服务执行 RequestTemplateEngine.send_request
+
+运行方式（在插件根目录下）：
+    python -m benchmarks.bench_dispatch
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+from ._common import emit, environment, load_plugin_module, summarize
+from .synthetic import build_payload
+
+CONCURRENCY_LEVELS = (1, 16, 64)
+PAYLOAD_SIZES = (10, 1000)
+
+async def _start_stub_server(payloads: Dict[int, bytes]):
+    """启动返回固定JSON的桩服务
+    
+    Args:
+        payloads: 条目数到响应体的映射，通过 /echo?items=N 选择
+    
+    Returns:
+        Tuple[web.AppRunner, int]: 服务运行器和实际监听端口
+    """
+    async def _echo(request):
+        await request.read()
+        body = payloads[int(request.query.get("items", "10"))]
+        return web.Response(body=body, content_type="application/json")
+    
+    app = web.Application()
+    app.router.add_route("*", "/echo", _echo)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, port
+
+async def _run_level(engine, items: int, concurrency: int, total: int) -> Dict[str, Any]:
+    """以指定并发度发送固定数量的请求"""
+    params = {
+        "api_name": "bench",
+        "path_override": f"/echo?items={items}",
+        "method_override": "POST",
+        "content": "hello"
+    }
+    latencies: List[float] = []
+    failures = 0
+    remaining = total
+    
+    async def _worker():
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            success, _ = await engine.send_request("bench", params)
+            latencies.append(time.perf_counter() - started)
+            failures += not success
+    
+    # 预热连接池
+    await asyncio.gather(*(engine.send_request("bench", params) for _ in range(concurrency)))
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    result = summarize(latencies, len(latencies), elapsed)
+    result.update({
+        "benchmark": "send_request",
+        "params": {"items": items, "concurrency": concurrency},
+        "failures": failures
+    })
+    return result
+
+async def _run(quick: bool) -> List[Dict[str, Any]]:
+    engine_module = load_plugin_module("request_template_engine")
+    api_spec_module = load_plugin_module("api_spec")
+    payloads = {items: json.dumps(build_payload(items)).encode("utf-8") for items in PAYLOAD_SIZES}
+    runner, port = await _start_stub_server(payloads)
+    
+    api_config = {
+        "name": "bench",
+        "endpoint": f"http://127.0.0.1:{port}",
+        "headers": {"Content-Type": "application/json"},
+        "preprocess": {"enabled": True, "template": {"body": {"message": "{{content}}"}}},
+        # 每个请求都需真实发出，关闭合并
+        "coalesce": {"enabled": False}
+    }
+    global_config = {"timeout": 30}
+    engine = engine_module.RequestTemplateEngine(
+        api_spec_module.ApiSpec.compile_all([api_config], global_config), global_config
+    )
+    await engine.start()
+    
+    total = 500 if quick else 3000
+    results = []
+    try:
+        for items in PAYLOAD_SIZES:
+            for concurrency in CONCURRENCY_LEVELS:
+                results.append(await _run_level(engine, items, concurrency, total))
+    finally:
+        await engine.close()
+        await runner.cleanup()
+    return results
+
+def run(quick: bool = False, seed: int = 0) -> List[Dict[str, Any]]:
+    """执行基准
+    
+    Args:
+        quick: 快速模式，减少请求数量
+        seed: 随机种子（桩服务返回固定数据，仅为接口一致）
+    
+    Returns:
+        List[Dict]: 每个响应大小和并发度组合一条结果
+    """
+    return asyncio.run(_run(quick))
+
+def main():
+    """执行基准并输出JSON"""
+    emit({"environment": environment(0), "results": run()})
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+# benchmarks/bench_json.py
+"""JSON编解码基准：对比当前环境中可用的编解码器（orjson / msgspec / 标准库）
+
+覆盖插件中的三处JSON处理：从原始字节解码响应、编码请求体、格式化输出（缩进）
+
+运行方式（在插件根目录下）：
+    python -m benchmarks.bench_json
+"""
+import json
+from typing import Any, Dict, List
+
+from ._common import emit, environment, load_plugin_module, measure
+from .synthetic import build_payload
+
+# 常见响应大小（KB）
+PAYLOAD_KB = (50, 200, 500)
+
+def build_sized_payload(kilobytes: int) -> Dict[str, Any]:
+    """生成编码后约为指定大小的响应数据"""
+    per_item = len(json.dumps(build_payload(1)["data"]["items"][0], ensure_ascii=False).encode("utf-8")) + 1
+    return build_payload(max(1, kilobytes * 1024 // per_item))
+
+def run(quick: bool = False, seed: int = 0) -> List[Dict[str, Any]]:
+    """执行基准
+
+    Args:
+        quick: 快速模式，缩短测量时间
+        seed: 随机种子（编解码基准不使用随机数据，仅为接口一致）
+
+    Returns:
+        List[Dict]: 每个编解码器、操作和数据大小组合一条结果
+    """
+    codec_module = load_plugin_module("json_codec")
+    min_time = 0.2 if quick else 1.0
+
+    results = []
+    for kilobytes in PAYLOAD_KB:
+        payload = build_sized_payload(kilobytes)
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        for name, codec in codec_module.available_codecs().items():
+            operations = {
+                "loads": lambda: codec.loads(raw),
+                "dumps": lambda: codec.dumps(payload),
+                "dumps_indent": lambda: codec.dumps_text(payload, indent=True)
+            }
+            for operation, function in operations.items():
+                result = measure(function, min_time=min_time)
+                result.update({
+                    "benchmark": f"json_{operation}",
+                    "params": {"codec": name, "kb": kilobytes, "bytes": len(raw)}
+                })
+                results.append(result)
+    return results
+
+def main():
+    """执行基准并输出JSON"""
+    emit({"environment": environment(0), "results": run()})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_match.py
+"""规则匹配吞吐量基准：RuleFactory.match_message
+
+运行方式（在插件根目录下）：
+    python -m benchmarks.bench_match
+"""
+import time
+from typing import Any, Dict, List
+
+from ._common import emit, environment, load_plugin_module, measure
+from .synthetic import build_corpus, build_rules
+
+RULE_COUNTS = (10, 100, 1000, 10000)
+HIT_RATIOS = (0.05, 0.3)
+CORPUS_SIZE = 2000
+
+def run(quick: bool = False, seed: int = 0) -> List[Dict[str, Any]]:
+    """执行基准
+    
+    Args:
+        quick: 快速模式，跳过最大的规则规模并缩短测量时间
+        seed: 随机种子
+    
+    Returns:
+        List[Dict]: 每个规模和命中率组合一条结果
+    """
+    rule_factory_module = load_plugin_module("rule_factory")
+    counts = RULE_COUNTS[:-1] if quick else RULE_COUNTS
+    min_time = 0.2 if quick else 1.0
+    
+    results = []
+    for count in counts:
+        rules = build_rules(count, seed=seed)
+        factory = rule_factory_module.RuleFactory()
+        started = time.perf_counter()
+        factory.build_rules([rule_config for _, rule_config in rules])
+        build_seconds = time.perf_counter() - started
+        
+        for hit_ratio in HIT_RATIOS:
+            corpus = build_corpus(rules, CORPUS_SIZE, hit_ratio, seed=seed)
+            match_message = factory.match_message
+            hits = sum(1 for message in corpus if match_message(message)[0])
+            
+            def _run_corpus():
+                for message in corpus:
+                    match_message(message)
+            
+            result = measure(_run_corpus, ops_per_call=len(corpus), min_time=min_time)
+            result.update({
+                "benchmark": "match_message",
+                "params": {"rules": count, "hit_ratio": hit_ratio, "corpus": len(corpus)},
+                "observed_hit_ratio": hits / len(corpus),
+                "build_ms": build_seconds * 1e3
+            })
+            results.append(result)
+    return results
+
+def main():
+    """执行基准并输出JSON"""
+    emit({"environment": environment(0), "results": run()})
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
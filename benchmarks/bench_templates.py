@@ -0,0 +1,70 @@
+# benchmarks/bench_templates.py
+"""模板渲染基准：RequestTemplateEngine._apply_template 与 ResponseFormatter._apply_format_template
+
+运行方式（在插件根目录下）：
+    python -m benchmarks.bench_templates
+"""
+from typing import Any, Dict, List
+
+from ._common import emit, environment, load_plugin_module, measure
+from .synthetic import build_payload
+
+PAYLOAD_SIZES = (10, 100, 1000)
+
+# 格式化基准使用的模板，覆盖嵌套路径和各类格式化器
+FORMAT_TEMPLATE = "结果: {{result}}，共 {{count|number:,}} 条\n首条: {{items[0].title}}\n{{items|truncate:200}}"
+
+def build_body_template(leaves: int) -> Dict[str, Any]:
+    """构造含指定数量字符串叶子的请求体模板"""
+    return {
+        "message": "{{content}}",
+        "count": "{{count|int}}",
+        "items": [{"text": f"第{index}项 {{{{content}}}} / $1", "index": index} for index in range(leaves)]
+    }
+
+def run(quick: bool = False, seed: int = 0) -> List[Dict[str, Any]]:
+    """执行基准
+    
+    Args:
+        quick: 快速模式，缩短测量时间
+        seed: 随机种子（模板基准不使用随机数据，仅为接口一致）
+    
+    Returns:
+        List[Dict]: 每个模板和数据规模组合一条结果
+    """
+    engine_module = load_plugin_module("request_template_engine")
+    formatter_module = load_plugin_module("response_formatter")
+    body_template_module = load_plugin_module("body_template")
+    api_spec_module = load_plugin_module("api_spec")
+    min_time = 0.2 if quick else 1.0
+    
+    results = []
+    
+    # 请求体模板
+    engine = engine_module.RequestTemplateEngine({}, {})
+    params = {"$1": "hello", "content": "world", "count": "42", "api_name": "bench", "path_override": "/echo"}
+    for leaves in PAYLOAD_SIZES:
+        template = body_template_module.CompiledBodyTemplate(build_body_template(leaves))
+        result = measure(lambda: engine._apply_template(template, params), min_time=min_time)
+        result.update({"benchmark": "apply_template", "params": {"leaves": leaves}})
+        results.append(result)
+    
+    # 响应格式化：配置模板和无模板（JSON序列化）两种情况
+    formatter = formatter_module.ResponseFormatter(api_spec_module.ApiSpec.compile_all([
+        {"name": "templated", "response": {"format_template": FORMAT_TEMPLATE}},
+        {"name": "json", "response": {}}
+    ]))
+    for items in PAYLOAD_SIZES:
+        data = build_payload(items)["data"]
+        for api_name in ("templated", "json"):
+            result = measure(lambda: formatter._apply_format_template(api_name, data), min_time=min_time)
+            result.update({"benchmark": "apply_format_template", "params": {"mode": api_name, "items": items}})
+            results.append(result)
+    return results
+
+def main():
+    """执行基准并输出JSON"""
+    emit({"environment": environment(0), "results": run()})
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
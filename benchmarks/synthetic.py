@@ -0,0 +1,98 @@
+# benchmarks/synthetic.py
+"""合成规则配置与消息语料，使用固定随机种子保证可复现"""
+import random
+from typing import Dict, List, Tuple
+
+# 规则类型的混合比例
+RULE_MIX = (("REGEX", 0.2), ("KEYWORD", 0.3), ("COMMAND", 0.3), ("PREFIX", 0.2))
+
+# 未命中消息使用的常见聊天词汇，不含规则模式中使用的数字编号
+_CHAT_WORDS = (
+    "今天", "天气", "怎么样", "哈哈", "好的", "收到", "晚上", "吃什么", "明天", "开会",
+    "hello", "thanks", "ok", "lol", "see", "you", "later", "what", "time", "is", "it"
+)
+
+def _token(rng: random.Random, index: int) -> str:
+    """生成带编号的唯一模式片段"""
+    letters = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(4))
+    return f"{letters}{index:05d}"
+
+def build_rules(count: int, api_name: str = "bench", seed: int = 0) -> List[Tuple[str, str]]:
+    """生成混合类型的规则配置
+    
+    Args:
+        count: 规则数量
+        api_name: 规则指向的API名称
+        seed: 随机种子
+    
+    Returns:
+        List[Tuple[str, str]]: (规则类型, 规则配置字符串) 列表
+    """
+    rng = random.Random(seed)
+    types = [rule_type for rule_type, _ in RULE_MIX]
+    weights = [weight for _, weight in RULE_MIX]
+    rules = []
+    for index in range(count):
+        rule_type = rng.choices(types, weights)[0]
+        token = _token(rng, index)
+        if rule_type == "REGEX":
+            pattern = f"^{token}\\s+(\\w+)$"
+        elif rule_type == "KEYWORD":
+            pattern = f"kw{token}"
+        elif rule_type == "COMMAND":
+            pattern = f"/{token}"
+        else:
+            pattern = f"{token}:"
+        rules.append((rule_type, f"{rule_type},{pattern},{api_name},/echo,POST"))
+    return rules
+
+def _hit_message(rng: random.Random, rule_type: str, rule_config: str) -> str:
+    """生成命中指定规则的消息"""
+    pattern = rule_config.split(",")[1]
+    if rule_type == "REGEX":
+        token = pattern[1:pattern.index("\\")]
+        return f"{token} arg{rng.randint(0, 999)}"
+    if rule_type == "KEYWORD":
+        return f"{rng.choice(_CHAT_WORDS)} {pattern} {rng.choice(_CHAT_WORDS)}"
+    if rule_type == "COMMAND":
+        return f"{pattern} {rng.choice(_CHAT_WORDS)}"
+    return f"{pattern}{rng.choice(_CHAT_WORDS)}"
+
+def _miss_message(rng: random.Random) -> str:
+    """生成不命中任何规则的普通聊天消息"""
+    return " ".join(rng.choice(_CHAT_WORDS) for _ in range(rng.randint(2, 12)))
+
+def build_corpus(rules: List[Tuple[str, str]], size: int, hit_ratio: float, seed: int = 0) -> List[str]:
+    """生成消息语料
+    
+    Args:
+        rules: build_rules 生成的规则
+        size: 消息数量
+        hit_ratio: 命中规则的消息比例
+        seed: 随机种子
+    
+    Returns:
+        List[str]: 消息列表
+    """
+    rng = random.Random(seed + 1)
+    corpus = []
+    for _ in range(size):
+        if rules and rng.random() < hit_ratio:
+            rule_type, rule_config = rng.choice(rules)
+            corpus.append(_hit_message(rng, rule_type, rule_config))
+        else:
+            corpus.append(_miss_message(rng))
+    return corpus
+
+def build_payload(items: int) -> Dict:
+    """生成指定条目数的API响应数据"""
+    return {
+        "data": {
+            "result": "ok",
+            "count": items,
+            "items": [
+                {"id": index, "title": f"条目 {index}", "score": index * 0.5, "tags": ["a", "b"]}
+                for index in range(items)
+            ]
+        }
+    }
\ No newline at end of file
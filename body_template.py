@@ -0,0 +1,170 @@
+# body_template.py
+import re
+from typing import Dict, Any, List, Callable, Union
+
+# 占位符语法：{{name}}、{{name|int}} 或 $1
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([^{}|\s]+)\s*(?:\|\s*(\w+)\s*)?\}\}|\$(\d+)")
+
+def _to_bool(value: Any) -> bool:
+    """将参数转换为布尔值"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+# 类型化替换：整串只有一个占位符时，按类型输出原生值而非字符串
+_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": _to_bool,
+    "raw": lambda value: value
+}
+
+class _Slot:
+    """占位符槽位"""
+    
+    __slots__ = ("key", "converter", "source")
+    
+    def __init__(self, key: str, converter: Callable[[Any], Any], source: str):
+        self.key = key
+        self.converter = converter
+        # 参数缺失时原样保留占位符文本
+        self.source = source
+
+class _StringPlan:
+    """字符串叶子的编译结果：字面量片段与槽位交替排列"""
+    
+    __slots__ = ("parts", "single")
+    
+    def __init__(self, parts: List[Union[str, _Slot]]):
+        self.parts = parts
+        # 整个字符串就是一个占位符时可以输出类型化的值
+        self.single = parts[0] if len(parts) == 1 and isinstance(parts[0], _Slot) else None
+    
+    def render(self, params: Dict[str, Any]) -> Any:
+        """填充字符串，整串单占位符时返回类型化的值"""
+        single = self.single
+        if single is not None:
+            if single.key not in params:
+                return single.source
+            return single.converter(params[single.key])
+        
+        chunks = []
+        for part in self.parts:
+            if part.__class__ is str:
+                chunks.append(part)
+            elif part.key in params:
+                chunks.append(str(part.converter(params[part.key])))
+            else:
+                chunks.append(part.source)
+        return "".join(chunks)
+
+class _DictPlan:
+    """字典节点的编译结果"""
+    
+    __slots__ = ("items",)
+    
+    def __init__(self, items: List[tuple]):
+        self.items = items
+    
+    def render(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """逐项填充字典"""
+        return {key: plan.render(params) for key, plan in self.items}
+
+class _ListPlan:
+    """列表节点的编译结果"""
+    
+    __slots__ = ("items",)
+    
+    def __init__(self, items: List[Any]):
+        self.items = items
+    
+    def render(self, params: Dict[str, Any]) -> List[Any]:
+        """逐项填充列表"""
+        return [plan.render(params) for plan in self.items]
+
+class _ConstPlan:
+    """不含占位符的常量节点，渲染时直接返回"""
+    
+    __slots__ = ("value",)
+    
+    def __init__(self, value: Any):
+        self.value = value
+    
+    def render(self, params: Dict[str, Any]) -> Any:
+        """返回常量本身"""
+        return self.value
+
+class CompiledBodyTemplate:
+    """编译后的请求体模板
+    
+    在加载配置时一次性解析模板树，记录字面量片段、占位符槽位和类型转换，
+    渲染时对每个叶子只做一次线性填充，不再对参数逐个执行 str.replace
+    
+    支持的占位符：
+    - $1、$2 ...：正则捕获组
+    - {{name}}：命名捕获组或其他匹配参数（如 content、message）
+    - {{name|int}}：类型化替换，可选 str/int/float/bool/raw
+    """
+    
+    def __init__(self, template: Any):
+        """编译模板
+        
+        Args:
+            template: 模板（字典、列表、字符串或其他JSON值）
+        
+        Raises:
+            ValueError: 使用了不支持的类型转换
+        """
+        self._plan = self._compile(template)
+    
+    def render(self, params: Dict[str, Any]) -> Any:
+        """用匹配参数填充模板
+        
+        Args:
+            params: 匹配参数
+        
+        Returns:
+            Any: 填充后的请求体
+        """
+        return self._plan.render(params)
+    
+    def _compile(self, node: Any):
+        """递归编译模板节点"""
+        if isinstance(node, str):
+            return self._compile_string(node)
+        if isinstance(node, dict):
+            items = [(key, self._compile(value)) for key, value in node.items()]
+            return _DictPlan(items)
+        if isinstance(node, list):
+            return _ListPlan([self._compile(item) for item in node])
+        return _ConstPlan(node)
+    
+    def _compile_string(self, text: str):
+        """将字符串拆分为字面量片段和占位符槽位"""
+        parts: List[Union[str, _Slot]] = []
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                parts.append(text[position:match.start()])
+            
+            if match.group(3) is not None:
+                key = f"${match.group(3)}"
+                type_name = "str"
+            else:
+                key = match.group(1)
+                type_name = match.group(2) or "str"
+            
+            converter = _CONVERTERS.get(type_name)
+            if converter is None:
+                raise ValueError(f"不支持的模板类型转换 '{type_name}': {match.group(0)}")
+            
+            parts.append(_Slot(key, converter, match.group(0)))
+            position = match.end()
+        
+        if not parts:
+            return _ConstPlan(text)
+        
+        if position < len(text):
+            parts.append(text[position:])
+        return _StringPlan(parts)
\ No newline at end of file
@@ -0,0 +1,148 @@
+# circuit_breaker.py
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from astrbot.api import logger
+from .metrics import BREAKER_REJECTED, BREAKER_STATE, BREAKER_TRANSITIONS
+
+# 熔断器状态
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# 熔断状态指标的取值
+_STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+    pass
+
+class CircuitBreaker:
+    """单个API的熔断器
+    
+    在滑动时间窗口内统计失败率和慢调用率，超过阈值时打开熔断器并直接拒绝请求；
+    打开一段时间后进入半开状态放行少量探测请求，探测成功则关闭，失败则重新打开
+    """
+    
+    def __init__(self, api_name: str, breaker_config: Dict[str, Any]):
+        """初始化熔断器
+        
+        Args:
+            api_name: API名称
+            breaker_config: API的 circuit_breaker 配置块
+        """
+        self.api_name = api_name
+        self.window_seconds = float(breaker_config.get("window_seconds", 60))
+        self.min_calls = int(breaker_config.get("min_calls", 10))
+        self.failure_rate_threshold = float(breaker_config.get("failure_rate", 0.5))
+        # 未配置时不统计慢调用
+        self.slow_call_seconds: Optional[float] = breaker_config.get("slow_call_seconds")
+        self.slow_call_rate_threshold = float(breaker_config.get("slow_call_rate", 0.8))
+        self.open_seconds = float(breaker_config.get("open_seconds", 30))
+        self.half_open_probes = max(1, int(breaker_config.get("half_open_probes", 1)))
+        
+        self.state = STATE_CLOSED
+        self._opened_at = 0.0
+        # 窗口内的调用记录：(时间, 是否失败, 是否慢调用)
+        self._window: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow_calls = 0
+        # 半开状态下进行中和已成功的探测请求数
+        self._probes_inflight = 0
+        self._probe_successes = 0
+        
+        # 指标子项，热重载新建熔断器时状态从关闭开始
+        self._state_gauge = BREAKER_STATE.labels(api_name)
+        self._state_gauge.set(_STATE_VALUES[self.state])
+        self._rejected = BREAKER_REJECTED.labels(api_name)
+    
+    def allow_request(self) -> bool:
+        """判断是否放行请求
+        
+        Returns:
+            bool: 是否放行，放行的请求之后必须调用 record() 或 release()
+        """
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self._rejected.inc()
+                return False
+            self._transition(STATE_HALF_OPEN)
+        
+        if self.state == STATE_HALF_OPEN:
+            if self._probes_inflight >= self.half_open_probes:
+                self._rejected.inc()
+                return False
+            self._probes_inflight += 1
+        
+        return True
+    
+    def record(self, failed: bool, latency: float):
+        """记录一次调用结果
+        
+        Args:
+            failed: 是否为上游故障（连接错误、超时、5xx等）
+            latency: 调用耗时（秒）
+        """
+        slow = self.slow_call_seconds is not None and latency >= float(self.slow_call_seconds)
+        
+        if self.state == STATE_HALF_OPEN:
+            self._probes_inflight = max(0, self._probes_inflight - 1)
+            if failed or slow:
+                self._transition(STATE_OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(STATE_CLOSED)
+            return
+        
+        if self.state != STATE_CLOSED:
+            return
+        
+        now = time.monotonic()
+        self._window.append((now, failed, slow))
+        self._failures += failed
+        self._slow_calls += slow
+        self._prune(now)
+        
+        calls = len(self._window)
+        if calls < self.min_calls:
+            return
+        if self._failures / calls >= self.failure_rate_threshold:
+            logger.warning(f"API '{self.api_name}' 失败率 {self._failures}/{calls} 超过阈值")
+            self._transition(STATE_OPEN)
+        elif self.slow_call_seconds is not None and self._slow_calls / calls >= self.slow_call_rate_threshold:
+            logger.warning(f"API '{self.api_name}' 慢调用率 {self._slow_calls}/{calls} 超过阈值")
+            self._transition(STATE_OPEN)
+    
+    def release(self):
+        """放行的请求未产生结果（被取消或在排队时丢弃）时归还探测名额"""
+        if self.state == STATE_HALF_OPEN:
+            self._probes_inflight = max(0, self._probes_inflight - 1)
+    
+    def _prune(self, now: float):
+        """移除窗口外的调用记录"""
+        window = self._window
+        cutoff = now - self.window_seconds
+        while window and window[0][0] < cutoff:
+            _, failed, slow = window.popleft()
+            self._failures -= failed
+            self._slow_calls -= slow
+    
+    def _transition(self, state: str):
+        """切换状态，记录日志并更新指标"""
+        if state == self.state:
+            return
+        logger.info(f"API '{self.api_name}' 熔断器状态: {self.state} -> {state}")
+        BREAKER_TRANSITIONS.labels(self.api_name, self.state, state).inc()
+        self._state_gauge.set(_STATE_VALUES[state])
+        self.state = state
+        
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+        elif state == STATE_CLOSED:
+            self._window.clear()
+            self._failures = 0
+            self._slow_calls = 0
+        
+        self._probes_inflight = 0
+        self._probe_successes = 0
\ No newline at end of file
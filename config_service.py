@@ -3,6 +3,8 @@ import json
 import os
 from typing import Dict, List, Optional, Any
 from astrbot.api import logger
+from .api_spec import ApiSpec
+from .worker_pool import WorkerPool
 
 class ConfigService:
     """配置服务：负责解析、验证和提供API配置信息
@@ -13,15 +15,18 @@ class ConfigService:
     3. 提供API配置访问接口
     """
     
-    def __init__(self, config: Dict[str, Any] = None):
+    def __init__(self, config: Dict[str, Any] = None, previous: Optional["ConfigService"] = None):
         """初始化配置服务
         
         Args:
             config: 可选的配置字典，如果为None则使用空配置
+            previous: 热重载前的配置服务，未变化的API沿用其中的编译结果
         """
         self._config = config or {}
         self._apis = {}  # 按名称索引的API配置
+        self._specs: Dict[str, ApiSpec] = {}  # 按名称索引的编译后API配置
         self._rules = []  # 规则列表
+        self._previous_specs = previous.get_api_specs() if previous is not None else None
         
         # 如果提供了配置，立即进行解析
         if self._config:
@@ -56,19 +61,23 @@ class ConfigService:
             bool: 解析是否成功
         """
         try:
+            # 解析全局配置，API编译时使用其中的默认值
+            self._global = self._config.get("global", {})
+            
             # 解析API配置
             if "apis" in self._config:
                 for api_config in self._config["apis"]:
                     if "name" in api_config:
                         self._apis[api_config["name"]] = api_config
             
+            # 编译API配置，请求路径上只访问编译结果；解析完成后不再引用旧的编译结果
+            self._specs = ApiSpec.compile_all(list(self._apis.values()), self._global, self._previous_specs)
+            self._previous_specs = None
+            
             # 解析规则配置
             if "rules" in self._config:
                 self._rules = self._config["rules"]
             
-            # 解析全局配置
-            self._global = self._config.get("global", {})
-            
             return True
         except Exception as e:
             logger.error(f"解析配置失败: {str(e)}")
@@ -85,6 +94,25 @@ class ConfigService:
         """
         return self._apis.get(api_name)
     
+    def get_api_spec(self, api_name: str) -> Optional[ApiSpec]:
+        """获取指定名称的编译后API配置
+        
+        Args:
+            api_name: API名称
+            
+        Returns:
+            ApiSpec或None: 编译后的API配置，如果不存在则返回None
+        """
+        return self._specs.get(api_name)
+    
+    def get_api_specs(self) -> Dict[str, ApiSpec]:
+        """获取所有编译后的API配置
+        
+        Returns:
+            Dict[str, ApiSpec]: 按名称索引的编译后API配置
+        """
+        return self._specs
+    
     def get_rules(self) -> List[str]:
         """获取所有规则配置
         
@@ -113,12 +141,18 @@ class ConfigService:
         if not self._apis:
             errors.append("配置中未定义任何API")
         
-        for name, api in self._apis.items():
-            if "endpoint" not in api:
-                errors.append(f"API '{name}' 缺少必要的endpoint配置")
+        # 编译阶段发现的所有问题
+        for spec in self._specs.values():
+            errors.extend(spec.errors)
         
         # 验证规则配置
         if not self._rules:
             errors.append("配置中未定义任何规则")
         
+        # 验证工作池配置
+        try:
+            WorkerPool(self._global.get("offload") or {})
+        except (TypeError, ValueError) as e:
+            errors.append(f"offload配置无效: {str(e)}")
+        
         return errors
\ No newline at end of file
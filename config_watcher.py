@@ -0,0 +1,65 @@
+# config_watcher.py
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional, Tuple
+from astrbot.api import logger
+
+class ConfigWatcher:
+    """配置文件监视器：定期检查文件的修改时间和大小，变化时触发回调"""
+    
+    def __init__(self, config_path: str, on_change: Callable[[], Awaitable[None]], interval: float = 2.0):
+        """初始化监视器
+        
+        Args:
+            config_path: 配置文件路径
+            on_change: 文件变化时调用的协程函数
+            interval: 检查间隔（秒）
+        """
+        self.config_path = config_path
+        self.on_change = on_change
+        self.interval = max(0.1, float(interval))
+        self._signature = self._stat()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """开始监视（需要在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self):
+        """停止监视"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        """获取文件的修改时间和大小，文件不存在时返回None"""
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    async def _run(self):
+        """轮询文件变化"""
+        while True:
+            await asyncio.sleep(self.interval)
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            
+            # 等待文件写入稳定，避免读到写了一半的内容
+            await asyncio.sleep(self.interval)
+            if self._stat() != signature:
+                continue
+            
+            self._signature = signature
+            logger.info(f"检测到配置文件变化: {self.config_path}")
+            try:
+                await self.on_change()
+            except Exception as e:
+                logger.error(f"重新加载配置失败: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,153 @@
+# fan_out.py
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 结果合并策略
+MERGE_FIRST = "first"
+MERGE_ALL = "all"
+MERGE_QUORUM = "quorum"
+
+class FanOutPolicy:
+    """扇出规则的执行策略：同一条消息并发请求多个API，按策略合并结果
+    
+    - first：第一个成功的结果胜出，其余请求立即取消
+    - all：等待所有API（或截止时间），按配置顺序拼接全部结果
+    - quorum：收到指定数量的成功结果后取消其余请求，拼接这些结果
+    
+    规则选项写法：merge=first|all|quorum、quorum=N、deadline=秒
+    """
+    
+    __slots__ = ("api_names", "merge", "quorum", "deadline")
+    
+    def __init__(self, api_names: List[str], merge: str = MERGE_FIRST, quorum: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        """初始化
+        
+        Args:
+            api_names: 目标API名称，按配置顺序排列
+            merge: 合并策略
+            quorum: quorum 策略需要的成功结果数，默认为多数
+            deadline: 所有请求共享的截止时间（秒），None表示使用全局timeout
+        
+        Raises:
+            ValueError: 策略或参数无效
+        """
+        if merge not in (MERGE_FIRST, MERGE_ALL, MERGE_QUORUM):
+            raise ValueError(f"不支持的扇出合并策略: {merge}")
+        self.api_names = api_names
+        self.merge = merge
+        self.quorum = quorum if quorum is not None else len(api_names) // 2 + 1
+        if merge == MERGE_QUORUM and not 1 <= self.quorum <= len(api_names):
+            raise ValueError(f"quorum 必须在1到{len(api_names)}之间: {self.quorum}")
+        self.deadline = deadline
+    
+    @classmethod
+    def from_options(cls, api_names: List[str], options: Iterable[str]) -> "FanOutPolicy":
+        """从规则选项构造策略
+        
+        Args:
+            api_names: 目标API名称
+            options: 规则中的选项（已转为小写），忽略与扇出无关的选项
+        
+        Returns:
+            FanOutPolicy: 扇出策略
+        
+        Raises:
+            ValueError: 选项值无效
+        """
+        values: Dict[str, str] = {}
+        for option in options:
+            key, separator, value = option.partition("=")
+            if separator:
+                values[key.strip()] = value.strip()
+        try:
+            quorum = int(values["quorum"]) if "quorum" in values else None
+            deadline = float(values["deadline"]) if "deadline" in values else None
+        except ValueError:
+            raise ValueError(f"扇出选项无效: {values}")
+        return cls(api_names, values.get("merge", MERGE_FIRST), quorum, deadline)
+    
+    async def execute(self, request_engine, response_formatter, match_params: Dict[str, Any],
+                      default_deadline: float) -> str:
+        """并发请求所有目标API并合并格式化后的结果
+        
+        每个API的响应使用各自的 response 配置格式化
+        
+        Args:
+            request_engine: 请求模板引擎
+            response_formatter: 响应格式化器
+            match_params: 规则匹配参数
+            default_deadline: 未配置 deadline 时的截止时间（秒）
+        
+        Returns:
+            str: 合并后的回复文本
+        """
+        tasks = {
+            asyncio.ensure_future(request_engine.send_request(api_name, dict(match_params, api_name=api_name))): api_name
+            for api_name in self.api_names
+        }
+        needed = {MERGE_FIRST: 1, MERGE_QUORUM: self.quorum}.get(self.merge, len(self.api_names))
+        deadline = time.monotonic() + (self.deadline or default_deadline)
+        
+        # 已完成的结果：API名称 -> (是否成功, 格式化文本)，按完成顺序插入
+        finished: Dict[str, Tuple[bool, str]] = {}
+        successes = 0
+        pending = set(tasks)
+        try:
+            while pending and successes < needed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    api_name = tasks[task]
+                    try:
+                        success, response = task.result()
+                    except Exception as e:
+                        success, response = False, {"error": str(e)}
+                    status_code = response.get("status_code", 200) if isinstance(response, dict) else 200
+                    text = response_formatter.format_response(api_name, success, response, status_code)
+                    finished[api_name] = (success, text)
+                    successes += success
+                # 剩余请求全部成功也无法满足要求时提前结束
+                if successes + len(pending) < needed:
+                    break
+        finally:
+            # 取消未完成的请求
+            for task in pending:
+                task.cancel()
+        
+        return self._merge(finished, successes)
+    
+    def _merge(self, finished: Dict[str, Tuple[bool, str]], successes: int) -> str:
+        """按策略拼接结果
+        
+        Args:
+            finished: 已完成的结果，按完成顺序排列
+            successes: 成功的结果数
+        
+        Returns:
+            str: 回复文本
+        """
+        if self.merge == MERGE_FIRST:
+            for success, text in finished.values():
+                if success:
+                    return text
+            return self._labeled(self.api_names, finished)
+        
+        if self.merge == MERGE_QUORUM:
+            if successes < self.quorum:
+                return f"错误: 仅 {successes}/{self.quorum} 个API返回成功\n" + self._labeled(self.api_names, finished)
+            return self._labeled([api_name for api_name, (success, _) in finished.items() if success], finished)
+        
+        return self._labeled(self.api_names, finished)
+    
+    @staticmethod
+    def _labeled(api_names: List[str], finished: Dict[str, Tuple[bool, str]]) -> str:
+        """按给定顺序输出带API名称的结果，截止时间内未完成的标记为超时"""
+        sections = []
+        for api_name in api_names:
+            text = finished[api_name][1] if api_name in finished else "错误: 请求超时"
+            sections.append(f"[{api_name}]\n{text}")
+        return "\n\n".join(sections)
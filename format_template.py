@@ -0,0 +1,176 @@
+# format_template.py
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from .json_path import CompiledJsonPath, MISSING
+
+# 占位符语法：{{字段路径|格式化器:参数|...}}
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{(.*?)\}\}")
+
+def _format_truncate(value: Any, arg: Optional[str]) -> str:
+    """截断到指定长度，超出部分以省略号代替"""
+    text = _to_text(value)
+    limit = int(arg) if arg else 100
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "…"
+
+def _format_number(value: Any, arg: Optional[str]) -> str:
+    """按 format() 规格格式化数字，例如 number:.2f、number:,"""
+    if isinstance(value, str):
+        try:
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        except ValueError:
+            return value
+    try:
+        return format(value, arg or "")
+    except (TypeError, ValueError):
+        return _to_text(value)
+
+def _format_join(value: Any, arg: Optional[str]) -> str:
+    """将列表用分隔符连接，默认为 ", " """
+    separator = ", " if arg is None else arg.replace("\\n", "\n")
+    if isinstance(value, (list, tuple)):
+        return separator.join(_to_text(item) for item in value)
+    return _to_text(value)
+
+def _format_default(value: Any, arg: Optional[str]) -> str:
+    """值为空时使用默认文本"""
+    if value is None or value == "" or value == [] or value == {}:
+        return arg or ""
+    return _to_text(value)
+
+def _to_text(value: Any) -> str:
+    """将值转换为文本"""
+    return value if isinstance(value, str) else str(value)
+
+# 可用的字段格式化器
+FORMATTERS: Dict[str, Callable[[Any, Optional[str]], str]] = {
+    "truncate": _format_truncate,
+    "number": _format_number,
+    "join": _format_join,
+    "default": _format_default
+}
+
+class _Field:
+    """模板中的字段占位符"""
+    
+    __slots__ = ("name", "path", "filters", "source")
+    
+    def __init__(self, name: str, path: Optional[CompiledJsonPath], filters: List[Tuple[Callable, Optional[str]]], source: str):
+        self.name = name
+        # 字段名不是字典的直接键时，按该路径做嵌套访问
+        self.path = path
+        self.filters = filters
+        # 字段不存在时原样保留占位符文本
+        self.source = source
+
+class CompiledFormatTemplate:
+    """编译后的响应格式化模板
+    
+    加载配置时把 format_template 拆分为字面量片段和字段占位符，渲染时一次遍历完成填充
+    
+    支持的占位符：
+    - {{result}}：提取结果不是字典时代表整个提取结果
+    - {{name}}：提取结果字典中的字段
+    - {{data.items.0.title}} / {{items[0].title}}：嵌套字段访问
+    - {{name|truncate:50}}、{{price|number:.2f}}、{{tags|join:、}}、{{name|default:无}}：字段格式化
+    
+    无法按上述语法解析的占位符（两侧带空白、未知格式化器、无效路径）与旧版一致，
+    只在提取结果字典中有同名键时替换，否则原样保留
+    """
+    
+    def __init__(self, template: str):
+        """编译模板
+        
+        Args:
+            template: 格式化模板字符串
+        """
+        self.template = template
+        self._parts: List[Union[str, _Field]] = []
+        
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(template):
+            if match.start() > position:
+                self._parts.append(template[position:match.start()])
+            self._parts.append(self._compile_field(match.group(1), match.group(0)))
+            position = match.end()
+        if position < len(template):
+            self._parts.append(template[position:])
+    
+    def render(self, data: Any) -> str:
+        """用提取的数据填充模板
+        
+        Args:
+            data: 提取的数据
+        
+        Returns:
+            str: 填充后的文本
+        """
+        is_dict = isinstance(data, dict)
+        chunks = []
+        for part in self._parts:
+            if part.__class__ is str:
+                chunks.append(part)
+                continue
+            
+            value = self._resolve(part, data, is_dict)
+            if value is MISSING:
+                # 字段不存在时仍执行 default 格式化器，否则保留原文
+                if part.filters and part.filters[-1][0] is _format_default:
+                    chunks.append(part.filters[-1][1] or "")
+                else:
+                    chunks.append(part.source)
+                continue
+            
+            if part.filters:
+                for formatter, arg in part.filters:
+                    value = formatter(value, arg)
+                chunks.append(value)
+            else:
+                chunks.append(_to_text(value))
+        return "".join(chunks)
+    
+    @staticmethod
+    def _resolve(field: _Field, data: Any, is_dict: bool) -> Any:
+        """查找字段值"""
+        if is_dict:
+            if field.name in data:
+                return data[field.name]
+            if field.path is not None:
+                return field.path.extract(data)
+            return MISSING
+        
+        # 非字典数据只能通过 result 引用
+        if field.name == "result":
+            return data
+        if field.name.startswith(("result.", "result[")) and field.path is not None:
+            return field.path.extract({"result": data})
+        return MISSING
+    
+    @staticmethod
+    def _compile_field(expression: str, source: str) -> _Field:
+        """编译单个占位符表达式，无法解析时整个表达式作为字典键"""
+        # 只按整个表达式查找同名键，与旧版的逐键替换一致
+        literal = _Field(expression, None, [], source)
+        
+        segments = expression.split("|")
+        name = segments[0]
+        if not name or name != name.strip():
+            return literal
+        
+        filters = []
+        for segment in segments[1:]:
+            filter_name, separator, arg = segment.partition(":")
+            formatter = FORMATTERS.get(filter_name.strip())
+            if formatter is None:
+                return literal
+            filters.append((formatter, arg if separator else None))
+        
+        path = None
+        if "." in name or "[" in name:
+            try:
+                path = CompiledJsonPath("$" + name if name.startswith("[") else "$." + name)
+            except ValueError:
+                return literal
+        
+        return _Field(name, path, filters, source)
\ No newline at end of file
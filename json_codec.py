@@ -0,0 +1,129 @@
+# json_codec.py
+import json
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+class JsonCodec:
+    """JSON编解码器，基于标准库 json
+    
+    编码结果统一为UTF-8字节串且保留非ASCII字符；解码接受字节串或字符串。
+    其他实现遇到标准库能处理而自身不支持的数据（例如超出64位的整数、非字符串的键）时回退到这里
+    """
+    
+    name = "json"
+    
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        """解码JSON
+        
+        Args:
+            data: JSON文本，字节串按UTF-8解码
+        
+        Returns:
+            Any: 解码结果
+        
+        Raises:
+            ValueError: 不是合法的JSON
+        """
+        return json.loads(data)
+    
+    def dumps(self, obj: Any, sort_keys: bool = False) -> bytes:
+        """编码为紧凑的JSON字节串
+        
+        Args:
+            obj: 要编码的数据
+            sort_keys: 是否按键排序，用于生成稳定的缓存键
+        
+        Returns:
+            bytes: UTF-8编码的JSON
+        
+        Raises:
+            TypeError: 数据无法序列化
+        """
+        return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+    
+    def dumps_text(self, obj: Any, indent: bool = False) -> str:
+        """编码为便于阅读的JSON文本
+        
+        Args:
+            obj: 要编码的数据
+            indent: 是否按两个空格缩进
+        
+        Returns:
+            str: JSON文本
+        
+        Raises:
+            TypeError: 数据无法序列化
+        """
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+_STDLIB = JsonCodec()
+
+class _OrjsonCodec(JsonCodec):
+    """基于 orjson 的编解码器"""
+    
+    name = "orjson"
+    
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        return orjson.loads(data)
+    
+    def dumps(self, obj: Any, sort_keys: bool = False) -> bytes:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+        except TypeError:
+            return _STDLIB.dumps(obj, sort_keys)
+    
+    def dumps_text(self, obj: Any, indent: bool = False) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+        except TypeError:
+            return _STDLIB.dumps_text(obj, indent)
+
+class _MsgspecCodec(JsonCodec):
+    """基于 msgspec 的编解码器"""
+    
+    name = "msgspec"
+    
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    
+    def dumps(self, obj: Any, sort_keys: bool = False) -> bytes:
+        try:
+            return msgspec.json.encode(obj, order="sorted" if sort_keys else None)
+        except (TypeError, msgspec.EncodeError):
+            return _STDLIB.dumps(obj, sort_keys)
+    
+    def dumps_text(self, obj: Any, indent: bool = False) -> str:
+        try:
+            encoded = msgspec.json.encode(obj)
+        except (TypeError, msgspec.EncodeError):
+            return _STDLIB.dumps_text(obj, indent)
+        return (msgspec.json.format(encoded, indent=2) if indent else encoded).decode("utf-8")
+
+def available_codecs() -> Dict[str, JsonCodec]:
+    """获取当前环境可用的编解码器
+    
+    Returns:
+        Dict[str, JsonCodec]: 按名称索引，按优先级排列
+    """
+    codecs: Dict[str, JsonCodec] = {}
+    if orjson is not None:
+        codecs["orjson"] = _OrjsonCodec()
+    if msgspec is not None:
+        codecs["msgspec"] = _MsgspecCodec()
+    codecs["json"] = _STDLIB
+    return codecs
+
+# 插件使用的编解码器：优先 orjson，其次 msgspec，都未安装时使用标准库
+CODEC = next(iter(available_codecs().values()))
@@ -0,0 +1,306 @@
+# json_path.py
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from astrbot.api import logger
+
+# 提取不到数据时的哨兵值
+MISSING = object()
+
+# 路径步骤类型
+_KEY = 0
+_INDEX = 1
+_WILDCARD = 2
+_SLICE = 3
+
+class CompiledJsonPath:
+    """编译后的JSONPath提取器
+    
+    加载配置时解析一次路径，之后每次提取只按预解析的步骤访问数据
+    
+    支持的语法：
+    - $.data.result：字典键，对列表使用数字键时按下标访问（$.items.0）
+    - $.data['key.with.dot'] / $.data["key"]：带引号的键
+    - $.items[0] / $.items[-1]：数组下标
+    - $.items[*] / $.data.*：通配符
+    - $.items[1:10:2]：切片
+    
+    含通配符或切片的路径会产生多个结果，逐个惰性求值
+    """
+    
+    def __init__(self, path: str):
+        """解析路径
+        
+        Args:
+            path: JSONPath风格路径，例如 $.data.items[*].title
+        
+        Raises:
+            ValueError: 路径语法错误
+        """
+        self.path = path
+        self.steps = self._parse(path)
+        # 是否可能产生多个结果
+        self.is_multi = any(step[0] in (_WILDCARD, _SLICE) for step in self.steps)
+        # 只含字典键和非负下标的路径可以在读取响应时增量提取
+        self.is_streamable = bool(self.steps) and all(
+            step[0] == _KEY or (step[0] == _INDEX and step[1] >= 0) for step in self.steps
+        )
+    
+    def extract(self, data: Any, default: Any = MISSING) -> Any:
+        """提取数据
+        
+        Args:
+            data: 数据对象
+            default: 路径不匹配时的返回值
+        
+        Returns:
+            Any: 单值路径返回匹配的值；多值路径返回结果列表
+        """
+        if self.is_multi:
+            return list(self.iter_matches(data))
+        
+        current = data
+        for step in self.steps:
+            current = self._step_single(current, step)
+            if current is MISSING:
+                return default
+        return current
+    
+    def wrap(self, value: Any) -> Any:
+        """构造只包含该路径的最小结构，使 extract() 能从中取回 value
+        
+        用于增量解析只读取了目标子树的场景，下标步骤以字符串键的字典表示
+        
+        Args:
+            value: 路径指向的值
+        
+        Returns:
+            Any: 包装后的结构
+        """
+        for step in reversed(self.steps):
+            value = {step[1] if step[0] == _KEY else str(step[1]): value}
+        return value
+    
+    def first(self, data: Any, default: Any = MISSING) -> Any:
+        """返回第一个匹配结果，找到后立即停止遍历
+        
+        Args:
+            data: 数据对象
+            default: 没有匹配时的返回值
+        
+        Returns:
+            Any: 第一个匹配的值
+        """
+        return next(self.iter_matches(data), default)
+    
+    def iter_matches(self, data: Any) -> Iterator[Any]:
+        """惰性遍历所有匹配结果
+        
+        Args:
+            data: 数据对象
+        
+        Returns:
+            Iterator[Any]: 匹配结果迭代器
+        """
+        return self._iter(data, 0)
+    
+    def _iter(self, node: Any, position: int) -> Iterator[Any]:
+        """从指定步骤开始递归求值"""
+        steps = self.steps
+        # 单值步骤直接顺序执行，避免生成器嵌套
+        while position < len(steps) and steps[position][0] in (_KEY, _INDEX):
+            node = self._step_single(node, steps[position])
+            if node is MISSING:
+                return
+            position += 1
+        
+        if position == len(steps):
+            yield node
+            return
+        
+        step = steps[position]
+        if step[0] == _WILDCARD:
+            if isinstance(node, dict):
+                children = iter(node.values())
+            elif isinstance(node, (list, tuple)):
+                children = iter(node)
+            else:
+                return
+        else:
+            if not isinstance(node, (list, tuple)):
+                return
+            children = self._slice(node, step[1], step[2], step[3])
+        
+        for child in children:
+            yield from self._iter(child, position + 1)
+    
+    @staticmethod
+    def _step_single(node: Any, step: Tuple) -> Any:
+        """执行一个单值步骤，不匹配时返回 MISSING"""
+        kind, value = step[0], step[1]
+        if kind == _KEY:
+            if isinstance(node, dict):
+                return node.get(value, MISSING)
+            if isinstance(node, (list, tuple)) and step[2] is not None:
+                kind, value = _INDEX, step[2]
+            else:
+                return MISSING
+        
+        if isinstance(node, (list, tuple)):
+            if -len(node) <= value < len(node):
+                return node[value]
+            return MISSING
+        if isinstance(node, dict):
+            return node.get(str(value), MISSING)
+        return MISSING
+    
+    @staticmethod
+    def _slice(node: Any, start, stop, step) -> Iterator[Any]:
+        """惰性切片，仅在需要负数下标时退回普通切片"""
+        step = step or 1
+        if step > 0 and (start is None or start >= 0) and (stop is None or stop >= 0):
+            return islice(node, start, stop, step)
+        return iter(node[start:stop:step])
+    
+    @staticmethod
+    def _parse(path: str) -> List[Tuple]:
+        """将路径字符串解析为步骤列表"""
+        if not path.startswith("$"):
+            raise ValueError(f"提取路径必须以 $ 开头: {path}")
+        
+        steps = []
+        position = 1
+        length = len(path)
+        while position < length:
+            char = path[position]
+            if char == ".":
+                position += 1
+                if position < length and path[position] == "*":
+                    steps.append((_WILDCARD, None))
+                    position += 1
+                    continue
+                end = position
+                while end < length and path[end] not in ".[":
+                    end += 1
+                name = path[position:end]
+                if name:
+                    steps.append(CompiledJsonPath._key_step(name))
+                position = end
+            elif char == "[":
+                end = CompiledJsonPath._find_bracket_end(path, position)
+                steps.append(CompiledJsonPath._parse_bracket(path[position + 1:end].strip(), path))
+                position = end + 1
+            else:
+                raise ValueError(f"提取路径语法错误: {path}（位置 {position}）")
+        return steps
+    
+    @staticmethod
+    def _key_step(name: str) -> Tuple:
+        """构造键步骤，纯数字键额外记录对应的列表下标"""
+        index = None
+        if name.lstrip("-").isdigit():
+            index = int(name)
+        return (_KEY, name, index)
+    
+    @staticmethod
+    def _find_bracket_end(path: str, start: int) -> int:
+        """查找与 [ 对应的 ]，跳过引号内的内容"""
+        quote = None
+        position = start + 1
+        while position < len(path):
+            char = path[position]
+            if quote:
+                if char == "\\":
+                    position += 1
+                elif char == quote:
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char == "]":
+                return position
+            position += 1
+        raise ValueError(f"提取路径缺少 ]: {path}")
+    
+    @staticmethod
+    def _parse_bracket(content: str, path: str) -> Tuple:
+        """解析方括号中的内容"""
+        if content == "*":
+            return (_WILDCARD, None)
+        
+        if len(content) >= 2 and content[0] in "'\"" and content[-1] == content[0]:
+            name = content[1:-1].replace("\\" + content[0], content[0]).replace("\\\\", "\\")
+            return (_KEY, name, None)
+        
+        try:
+            if ":" in content:
+                parts = content.split(":")
+                if len(parts) > 3:
+                    raise ValueError
+                values = [int(part) if part.strip() else None for part in parts]
+                values += [None] * (3 - len(values))
+                if values[2] == 0:
+                    raise ValueError
+                return (_SLICE, values[0], values[1], values[2])
+            return (_INDEX, int(content))
+        except ValueError:
+            raise ValueError(f"提取路径中的下标无效 '[{content}]': {path}")
+
+
+class ExtractPaths:
+    """API extract 配置的编译结果，按状态码选择提取路径"""
+    
+    def __init__(self, extract_config: Dict[str, Any], on_error: Optional[Callable[[str], None]] = None):
+        """编译 extract 配置
+        
+        Args:
+            extract_config: API的 response.extract 配置
+            on_error: 路径无效时的回调，参数为错误信息；无效路径编译为None（返回原始数据）。
+                不以 $ 开头的路径与旧版一致，直接返回原始数据，只记录警告
+        """
+        extract_config = extract_config or {}
+        self.by_status: Dict[str, Optional[CompiledJsonPath]] = {}
+        for status, path in (extract_config.get("by_status") or {}).items():
+            self.by_status[str(status)] = self._compile(path, on_error)
+        
+        self.has_default = bool(extract_config.get("default"))
+        self.default: Optional[CompiledJsonPath] = None
+        if self.has_default:
+            self.default = self._compile(extract_config["default"], on_error)
+    
+    def select(self, status_code: int) -> Tuple[bool, Optional[CompiledJsonPath]]:
+        """按状态码选择提取路径
+        
+        依次尝试精确状态码、状态码范围(4xx, 5xx)和默认路径
+        
+        Args:
+            status_code: HTTP状态码
+        
+        Returns:
+            Tuple[bool, Optional[CompiledJsonPath]]: 是否配置了路径和对应的提取器
+        """
+        by_status = self.by_status
+        if by_status:
+            status_key = str(status_code)
+            if status_key in by_status:
+                return True, by_status[status_key]
+            
+            status_prefix = f"{status_code // 100}xx"
+            if status_prefix in by_status:
+                return True, by_status[status_prefix]
+        
+        if self.has_default:
+            return True, self.default
+        
+        return False, None
+    
+    @staticmethod
+    def _compile(path: str, on_error: Optional[Callable[[str], None]]) -> Optional[CompiledJsonPath]:
+        """编译单个路径，失败时返回None"""
+        if isinstance(path, str) and not path.startswith("$"):
+            logger.warning(f"提取路径不以 $ 开头，将返回原始数据: {path}")
+            return None
+        try:
+            return CompiledJsonPath(path)
+        except ValueError as e:
+            if on_error is not None:
+                on_error(str(e))
+            return None
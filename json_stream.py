@@ -0,0 +1,204 @@
+# json_stream.py
+import re
+from typing import Any, List, Optional
+from .json_codec import CODEC
+from .json_path import CompiledJsonPath, MISSING, _KEY
+
+# JSON中的结构字符，字符串之外只需关注这些位置
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+
+class _Frame:
+    """解析栈中的一层容器"""
+    
+    __slots__ = ("is_object", "on_path", "index", "key", "expect_key")
+    
+    def __init__(self, is_object: bool, on_path: bool):
+        self.is_object = is_object
+        # 该容器本身是否位于目标路径上
+        self.on_path = on_path
+        self.index = 0
+        self.key: Optional[str] = None
+        self.expect_key = is_object
+
+class JsonSubtreeParser:
+    """增量JSON子树解析器
+    
+    边读取响应边扫描JSON文本，只保留提取路径指向的子树文本，其余内容扫描后即丢弃；
+    找到目标子树后可以立即停止读取。内存占用只与目标子树大小和单个数据块大小有关
+    
+    仅支持只含字典键和非负下标的路径（CompiledJsonPath.is_streamable）
+    """
+    
+    def __init__(self, path: CompiledJsonPath):
+        """初始化解析器
+        
+        Args:
+            path: 提取路径，必须是 is_streamable 的路径
+        """
+        if not path.is_streamable:
+            raise ValueError(f"提取路径不支持增量解析: {path.path}")
+        self.path = path
+        self._steps = path.steps
+        
+        self._buffer = ""
+        self._position = 0
+        self._stack: List[_Frame] = []
+        
+        # 目标子树在缓冲区中的起始位置，以及它所在容器的栈深度
+        self._capture_start: Optional[int] = None
+        self._capture_level = 0
+        
+        self.done = False
+        self._result: Any = MISSING
+    
+    def feed(self, text: str) -> bool:
+        """追加一段JSON文本
+        
+        Args:
+            text: 新读取的文本
+        
+        Returns:
+            bool: 是否已经找到目标子树（之后的数据可以不再读取）
+        """
+        if self.done:
+            return True
+        
+        # 未在捕获时丢弃已扫描的部分
+        if self._capture_start is None:
+            self._buffer = self._buffer[self._position:] + text
+            self._position = 0
+        else:
+            self._buffer += text
+        
+        self._scan()
+        return self.done
+    
+    def result(self) -> Any:
+        """获取提取结果
+        
+        Returns:
+            Any: 目标子树，未找到时返回 MISSING
+        """
+        return self._result
+    
+    def _scan(self):
+        """扫描缓冲区中已到达的内容"""
+        buffer = self._buffer
+        stack = self._stack
+        position = self._position
+        
+        while not self.done:
+            match = _STRUCTURAL.search(buffer, position)
+            if match is None:
+                # 剩余部分不含结构字符，等待更多数据
+                position = len(buffer)
+                break
+            
+            index = match.start()
+            char = buffer[index]
+            
+            if char == '"':
+                end = self._find_string_end(buffer, index + 1)
+                if end < 0:
+                    # 字符串未读完，从引号处重新扫描
+                    position = index
+                    break
+                if stack and stack[-1].expect_key:
+                    frame = stack[-1]
+                    frame.key = CODEC.loads(buffer[index:end + 1]) if frame.on_path else None
+                position = end + 1
+                continue
+            
+            position = index + 1
+            
+            if char == ":":
+                frame = stack[-1]
+                frame.expect_key = False
+                self._open_slot(frame, position)
+            elif char == ",":
+                if self._close_slot(index):
+                    break
+                frame = stack[-1]
+                if frame.is_object:
+                    frame.expect_key = True
+                else:
+                    frame.index += 1
+                    self._open_slot(frame, position)
+            elif char in "{[":
+                on_path = self._slot_on_path()
+                frame = _Frame(char == "{", on_path)
+                stack.append(frame)
+                if not frame.is_object:
+                    self._open_slot(frame, position)
+            else:
+                # } 或 ]
+                if self._close_slot(index):
+                    break
+                stack.pop()
+                if not stack:
+                    # 根容器结束，目标不存在
+                    self.done = True
+        
+        self._position = position
+    
+    def _slot_on_path(self) -> bool:
+        """判断当前值位置的容器是否位于目标路径上（尚未到达目标本身）"""
+        stack = self._stack
+        if not stack:
+            return True
+        frame = stack[-1]
+        return frame.on_path and len(stack) < len(self._steps) and self._step_matches(frame, len(stack) - 1)
+    
+    def _open_slot(self, frame: _Frame, position: int):
+        """进入容器中的一个值位置，是目标时开始捕获"""
+        level = len(self._stack)
+        if frame.on_path and level == len(self._steps) and self._step_matches(frame, level - 1):
+            self._capture_start = position
+            self._capture_level = level
+    
+    def _close_slot(self, index: int) -> bool:
+        """值位置结束，若正在捕获目标则解析目标文本
+        
+        Returns:
+            bool: 是否完成提取
+        """
+        if self._capture_start is None or len(self._stack) != self._capture_level:
+            return False
+        
+        text = self._buffer[self._capture_start:index].strip()
+        self._capture_start = None
+        if text:
+            self._result = CODEC.loads(text)
+        self.done = True
+        return True
+    
+    def _step_matches(self, frame: _Frame, depth: int) -> bool:
+        """判断容器当前的键或下标是否匹配路径的第 depth 步"""
+        step = self._steps[depth]
+        if frame.is_object:
+            if frame.key is None:
+                return False
+            if step[0] == _KEY:
+                return frame.key == step[1]
+            return frame.key == str(step[1])
+        if step[0] == _KEY:
+            return step[2] is not None and frame.index == step[2]
+        return frame.index == step[1]
+    
+    @staticmethod
+    def _find_string_end(buffer: str, start: int) -> int:
+        """查找字符串结束引号的位置，未找到时返回-1"""
+        position = start
+        while True:
+            end = buffer.find('"', position)
+            if end < 0:
+                return -1
+            # 统计引号前连续反斜杠的数量，偶数个表示引号未被转义
+            backslashes = 0
+            check = end - 1
+            while check >= start and buffer[check] == "\\":
+                backslashes += 1
+                check -= 1
+            if backslashes % 2 == 0:
+                return end
+            position = end + 1
\ No newline at end of file
@@ -1,15 +1,17 @@
 # main.py
 import os
 import json
-from astrbot.api.event import filter, AstrMessageEvent
+import asyncio
+from astrbot.api.event import filter, AstrMessageEvent, MessageChain
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 from astrbot.core.star.star_tools import StarTools
 
 from .config_service import ConfigService
-from .rule_factory import RuleFactory
-from .request_template_engine import RequestTemplateEngine
-from .response_formatter import ResponseFormatter
+from .config_watcher import ConfigWatcher
+from .plugin_runtime import PluginRuntime
+from .metrics import REGISTRY, EVENT_LOOP_LAG, LoopLagMonitor, MetricsHttpServer
+from .async_jobs import JobManager, JobCallbackServer
 
 @register("astrbot_plugin_external_api", "YourName", "通过简单指令调用外部API", "1.0.0", "https://github.com/yourusername/astrbot_plugin_external_api")
 class ExternalAPIPlugin(Star):
@@ -27,36 +29,55 @@ class ExternalAPIPlugin(Star):
         """
         super().__init__(context)
 
-        # 初始化组件
-        self.config_service = ConfigService()
-        self.rule_factory = RuleFactory()
-        self.request_engine = None
-        self.response_formatter = None
+        # 当前使用的运行时组件（规则、请求引擎、响应格式化器），热重载时整体替换
+        self.runtime = None
         
         # 加载配置
         self.config = config
         
+        # 配置文件路径及其监视器，仅在从 config.json 加载配置时使用
+        self._config_path = None
+        self._config_watcher = None
+        self._reload_lock = asyncio.Lock()
+        
+        # 热重载后等待旧运行时排空的后台任务，插件终止时一并结束
+        self._retiring = set()
+        
+        # 可选的 Prometheus 指标HTTP服务和事件循环延迟测量，及其当前使用的配置
+        self._metrics_server = None
+        self._loop_lag_monitor = None
+        self._metrics_config = None
+        
+        # 异步任务表及可选的任务完成回调服务，跨热重载保留
+        self.jobs = None
+        self._job_callback_server = None
+        self._job_callback_config = None
+        
         # 初始化完成后的标志
         self.initialized = False
     
     async def initialize(self):
         """插件初始化"""
         logger.info("开始初始化外部API插件...")
-        print(self.config)
+        # 配置中可能有密钥请求头，只记录API名称
+        logger.debug(f"传入配置中的API: {[api.get('name') for api in (self.config.apis or [])]}")
+        
+        config_service = ConfigService()
         
         # 加载插件配置
         try:
             if self.config.apis:
-                self.config_service._config = self.config
-                self.config_service._parse_config()
+                config_service._config = self.config
+                config_service._parse_config()
                 logger.info("从传入配置加载API配置成功")
             else:
                 # 获取数据目录
                 data_dir = self._get_data_dir()
                 config_path = os.path.join(data_dir, "config.json")
+                self._config_path = config_path
                 
                 if os.path.exists(config_path):
-                    self.config_service.load_config(config_path)
+                    config_service.load_config(config_path)
                     logger.info(f"从 {config_path} 加载API配置成功")
                 else:
                     logger.warning(f"配置文件 {config_path} 不存在，使用默认配置")
@@ -66,28 +87,176 @@ class ExternalAPIPlugin(Star):
             logger.error(f"加载配置失败: {str(e)}")
             return
         
+        # 监视配置文件，修改后自动热重载
+        if self._config_path:
+            self._start_config_watcher(config_service.get_global_config())
+        
+        # 启动指标服务并创建异步任务表，配置中其他部分无效时也需要，修正后的热重载直接可用
+        await self._apply_global_services(config_service.get_global_config())
+        
         # 验证配置
-        errors = self.config_service.validate_config()
+        errors = config_service.validate_config()
         if errors:
             for error in errors:
                 logger.error(f"配置错误: {error}")
             return
         
-        # 创建规则
-        rules = self.rule_factory.build_rules(self.config_service.get_rules())
-        logger.info(f"创建了 {len(rules)} 条规则")
+        # 创建规则、请求引擎和响应格式化器
+        runtime = PluginRuntime(config_service)
+        await runtime.start()
+        logger.info(f"创建了 {len(runtime.rule_factory.rules)} 条规则")
+        self.runtime = runtime
+        
+        self.initialized = True
+        logger.info("外部API插件初始化完成")
+    
+    async def _apply_global_services(self, global_config):
+        """按全局配置启动或重建指标服务和异步任务表，配置未变化的部分保持不变
+        
+        Args:
+            global_config: 全局配置
+        """
+        try:
+            await self._apply_metrics_config(global_config.get("metrics") or {})
+            await self._apply_jobs_config(global_config.get("async_jobs") or {})
+        except (TypeError, ValueError) as e:
+            logger.error(f"指标或异步任务配置无效: {str(e)}")
+    
+    async def _apply_metrics_config(self, metrics_config):
+        """按配置启动事件循环延迟测量和本地指标HTTP服务，配置变化时先停止已有的服务
+        
+        Args:
+            metrics_config: 全局配置中的 metrics 配置块
+        """
+        if metrics_config == self._metrics_config:
+            return
+        await self._stop_metrics_server()
+        self._metrics_config = metrics_config
+        
+        loop_lag_config = metrics_config.get("loop_lag") or {}
+        if loop_lag_config.get("enabled", True):
+            self._loop_lag_monitor = LoopLagMonitor(EVENT_LOOP_LAG, float(loop_lag_config.get("interval", 0.5)))
+            self._loop_lag_monitor.start()
         
-        # 初始化请求引擎
-        self.request_engine = RequestTemplateEngine(
-            self.config_service._apis,
-            self.config_service.get_global_config()
+        http_config = metrics_config.get("http") or {}
+        if not http_config.get("enabled", False):
+            return
+        server = MetricsHttpServer(
+            REGISTRY,
+            host=http_config.get("host", "127.0.0.1"),
+            port=int(http_config.get("port", 9464)),
+            path=http_config.get("path", "/metrics")
         )
+        try:
+            await server.start()
+        except OSError as e:
+            logger.error(f"启动指标服务失败: {str(e)}")
+            return
+        self._metrics_server = server
+    
+    async def _stop_metrics_server(self):
+        """停止事件循环延迟测量和指标HTTP服务"""
+        if self._metrics_server:
+            await self._metrics_server.stop()
+            self._metrics_server = None
+        if self._loop_lag_monitor:
+            await self._loop_lag_monitor.stop()
+            self._loop_lag_monitor = None
+    
+    async def _apply_jobs_config(self, jobs_config):
+        """创建或更新异步任务表，回调服务配置变化时重新启动回调服务
         
-        # 初始化响应格式化器
-        self.response_formatter = ResponseFormatter(self.config_service._apis)
+        Args:
+            jobs_config: 全局配置中的 async_jobs 配置块
+        """
+        if self.jobs is None:
+            self.jobs = JobManager(lambda: self.runtime, self._push_message, jobs_config)
+        else:
+            self.jobs.configure(jobs_config)
         
-        self.initialized = True
-        logger.info("外部API插件初始化完成")
+        callback_config = jobs_config.get("callback") or {}
+        if callback_config == self._job_callback_config:
+            return
+        if self._job_callback_server:
+            await self._job_callback_server.stop()
+            self._job_callback_server = None
+        self._job_callback_config = callback_config
+        
+        if not callback_config.get("enabled", False):
+            return
+        server = JobCallbackServer(
+            self.jobs,
+            host=callback_config.get("host", "127.0.0.1"),
+            port=int(callback_config.get("port", 9465)),
+            path=callback_config.get("path", "/jobs")
+        )
+        try:
+            await server.start()
+        except OSError as e:
+            logger.error(f"启动任务回调服务失败: {str(e)}")
+            return
+        self._job_callback_server = server
+    
+    async def _push_message(self, session, text):
+        """主动向会话推送消息
+        
+        Args:
+            session: 会话标识（unified_msg_origin）
+            text: 消息文本
+        """
+        await self.context.send_message(session, MessageChain().message(text))
+    
+    def _start_config_watcher(self, global_config):
+        """启动配置文件监视器
+        
+        Args:
+            global_config: 全局配置，读取其中的 hot_reload 配置块
+        """
+        hot_reload = global_config.get("hot_reload") or {}
+        if not hot_reload.get("enabled", True):
+            return
+        self._config_watcher = ConfigWatcher(
+            self._config_path,
+            self.reload_config,
+            interval=float(hot_reload.get("interval", 2))
+        )
+        self._config_watcher.start()
+    
+    async def reload_config(self):
+        """重新加载配置文件并热替换运行时
+        
+        只重建变化的规则和API，配置无效时保留当前运行时；旧运行时在后台等待请求处理完成后再释放，
+        不阻塞后续的热重载
+        """
+        async with self._reload_lock:
+            config_service = ConfigService(previous=self.runtime.config_service if self.runtime is not None else None)
+            if not config_service.load_config(self._config_path):
+                logger.error("重新加载配置失败，保留当前配置")
+                return
+            
+            errors = config_service.validate_config()
+            if errors:
+                for error in errors:
+                    logger.error(f"配置错误，保留当前配置: {error}")
+                return
+            
+            # 指标服务和异步任务表不属于运行时，按新的全局配置启动或更新
+            await self._apply_global_services(config_service.get_global_config())
+            
+            previous = self.runtime
+            runtime = PluginRuntime(config_service, previous)
+            await runtime.start()
+            
+            # 整体替换，之后到达的消息使用新配置
+            self.runtime = runtime
+            self.initialized = True
+            logger.info(f"配置已重新加载，当前共 {len(runtime.rule_factory.rules)} 条规则")
+            
+            if previous is not None:
+                hot_reload = config_service.get_global_config().get("hot_reload") or {}
+                task = asyncio.create_task(previous.retire(runtime, float(hot_reload.get("drain_timeout", 30))))
+                self._retiring.add(task)
+                task.add_done_callback(self._retiring.discard)
     
     async def _create_sample_config(self, config_path):
         """创建示例配置文件
@@ -157,31 +326,120 @@ class ExternalAPIPlugin(Star):
         
         message = event.message_str
         
-        # 匹配规则
-        matched, params = self.rule_factory.match_message(message)
-        if not matched:
-            return
-        
-        print(f"匹配到规则: {params}")
-        
-        # 获取目标API
-        api_name = params.get("api_name")
-        if not api_name:
+        # 整条消息使用同一个运行时，处理期间发生的热重载不影响本次请求
+        runtime = self.runtime
+        runtime.enter()
+        try:
+            # 翻页指令直接从缓存的分页输出，不经过规则匹配，也不请求上游
+            page = runtime.more_page(event.unified_msg_origin, message)
+            if page is not None:
+                yield event.plain_result(page)
+                return
+            
+            # 丢弃同一会话的重复消息，防抖时只处理连续消息中的最后一条
+            if not await runtime.admission.admit(event.unified_msg_origin, message):
+                return
+            
+            # 匹配规则
+            matched, params = runtime.rule_factory.match_message(message)
+            if not matched:
+                return
+            
+            logger.debug(f"匹配到规则: {params}")
+            
+            # 获取目标API
+            api_name = params.get("api_name")
+            if not api_name:
+                return
+            
+            # 超出用户、群或会话配额时直接回复，不发送请求
+            denied = runtime.check_quota(params, {
+                "user": event.get_sender_id(),
+                "group": event.get_group_id(),
+                "session": event.unified_msg_origin
+            })
+            if denied is not None:
+                yield event.plain_result(denied)
+                return
+            
+            # 扇出规则并发请求多个API，按规则的合并策略回复
+            fan_out = params.get("fan_out")
+            if fan_out is not None:
+                global_config = runtime.config_service.get_global_config()
+                result = await fan_out.execute(
+                    runtime.request_engine,
+                    runtime.response_formatter,
+                    params,
+                    float(global_config.get("timeout", 30))
+                )
+                yield event.plain_result(result)
+                return
+            
+            # 异步任务API立即确认，完成后再把结果推送回当前会话
+            if runtime.request_engine.is_async_job(api_name):
+                if self.jobs is None:
+                    yield event.plain_result("错误: 异步任务表未初始化")
+                    return
+                yield event.plain_result(await self.jobs.submit(runtime, api_name, params, event.unified_msg_origin))
+                return
+            
+            # 流式API边接收边分段回复
+            if runtime.request_engine.is_streaming(api_name):
+                events = runtime.request_engine.stream_request(api_name, params)
+                async for chunk in runtime.response_formatter.iter_stream_text(api_name, events):
+                    yield event.plain_result(chunk)
+                return
+            
+            # 发送请求，超过卸载阈值的响应保持原始字节串
+            success, response = await runtime.request_engine.send_request(api_name, params, keep_raw=True)
+            
+            # 格式化响应，超出输出预算时只输出第一页；大响应在工作池中解码和格式化
+            pager = await runtime.response_formatter.paginate_async(
+                api_name,
+                success,
+                response,
+                response.get("status_code", 200) if isinstance(response, dict) else 200
+            )
+            
+            yield event.plain_result(runtime.first_page(event.unified_msg_origin, pager))
+        finally:
+            runtime.leave()
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("api_metrics")
+    async def show_metrics(self, event: AstrMessageEvent):
+        """查看插件运行指标（仅管理员）"""
+        yield event.plain_result(REGISTRY.summary())
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("api_jobs")
+    async def show_jobs(self, event: AstrMessageEvent):
+        """查看进行中的异步任务（仅管理员）"""
+        jobs = self.jobs.list_jobs() if self.jobs is not None else []
+        if not jobs:
+            yield event.plain_result("暂无进行中的任务")
             return
-        
-        # 发送请求
-        success, response = await self.request_engine.send_request(api_name, params)
-        
-        # 格式化响应
-        result = self.response_formatter.format_response(
-            api_name,
-            success,
-            response,
-            response.get("status_code", 200) if isinstance(response, dict) else 200
-        )
-        
-        yield event.plain_result(result)
+        lines = [
+            f"{job['job_id']} [{job['api']}] 上游ID {job['upstream_id'] or '-'}，已等待 {job['age']} 秒，轮询 {job['polls']} 次"
+            for job in jobs
+        ]
+        yield event.plain_result(f"进行中的任务 {len(jobs)} 个:\n" + "\n".join(lines))
     
     async def terminate(self):
         """插件终止时的处理"""
+        if self._job_callback_server:
+            await self._job_callback_server.stop()
+        if self.jobs:
+            await self.jobs.close()
+        await self._stop_metrics_server()
+        if self._config_watcher:
+            await self._config_watcher.stop()
+        # 不再等待旧运行时排空，取消后由 retire 直接释放其连接池和工作池
+        retiring = list(self._retiring)
+        for task in retiring:
+            task.cancel()
+        await asyncio.gather(*retiring, return_exceptions=True)
+        if self.runtime:
+            await self.runtime.request_engine.close()
+            self.runtime.offload.shutdown()
         logger.info("外部API插件已终止")
\ No newline at end of file
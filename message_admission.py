@@ -0,0 +1,124 @@
+# message_admission.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Optional, Set, Tuple
+from .metrics import ADMISSION_ADMITTED, ADMISSION_DROPPED, ADMISSION_DEDUP_OVERFLOWS, ADMISSION_DEBOUNCING
+
+class _DedupWindow:
+    """按时间分桶的去重窗口
+    
+    窗口被切分为若干个时间桶，每个桶保存该时间段内出现过的键；
+    过期的桶整体丢弃，不需要逐条清理。每个桶的容量固定，内存占用与会话数无关
+    """
+    
+    # 窗口切分的桶数，窗口外的重复最多延后 1/BUCKETS 个窗口才被放行
+    BUCKETS = 4
+    
+    def __init__(self, window: float, max_entries: int):
+        """初始化
+        
+        Args:
+            window: 去重窗口（秒）
+            max_entries: 整个窗口最多记录的键数，桶满后新键不再记录（直接放行）
+        """
+        self.width = window / self.BUCKETS
+        self.bucket_capacity = max(1, max_entries // (self.BUCKETS + 1))
+        self._buckets: Deque[Tuple[int, Set[Hashable]]] = deque()
+        self._overflows = ADMISSION_DEDUP_OVERFLOWS.labels()
+    
+    def seen(self, key: Hashable, now: float) -> bool:
+        """检查键是否在窗口内出现过，未出现时记录下来
+        
+        Args:
+            key: 去重键
+            now: 当前时间（单调时钟）
+        
+        Returns:
+            bool: 是否重复
+        """
+        index = int(now // self.width)
+        buckets = self._buckets
+        # 丢弃窗口之外的桶
+        while buckets and buckets[0][0] < index - self.BUCKETS:
+            buckets.popleft()
+        
+        for _, keys in buckets:
+            if key in keys:
+                return True
+        
+        if not buckets or buckets[-1][0] != index:
+            buckets.append((index, set()))
+        current = buckets[-1][1]
+        if len(current) < self.bucket_capacity:
+            current.add(key)
+        else:
+            self._overflows.inc()
+        return False
+
+class MessageAdmission:
+    """消息准入：在规则匹配之前丢弃同一会话在窗口内的重复消息，并可把连续发送的消息防抖为最后一条
+    
+    防抖时消息先等待 debounce 秒，期间同一会话有新消息到达则放弃较早的消息；
+    等待中的会话数有上限，超过后不再防抖而是直接放行
+    """
+    
+    def __init__(self, admission_config: Optional[Dict[str, Any]] = None):
+        """初始化
+        
+        Args:
+            admission_config: 全局 admission 配置块
+        """
+        admission_config = admission_config or {}
+        self.config = admission_config
+        self.enabled = admission_config.get("enabled", False)
+        
+        window = float(admission_config.get("dedup_window", 5))
+        max_entries = int(admission_config.get("max_entries", 100000))
+        self._dedup = _DedupWindow(window, max_entries) if window > 0 else None
+        
+        self.debounce = float(admission_config.get("debounce", 0))
+        self.max_debounce_sessions = int(admission_config.get("max_debounce_sessions", 10000))
+        # 正在防抖的会话 -> 最新一条消息的序号
+        self._latest: Dict[str, int] = {}
+        self._sequence = 0
+        
+        self._admitted = ADMISSION_ADMITTED.labels()
+        self._duplicates = ADMISSION_DROPPED.labels("duplicate")
+        self._debounced = ADMISSION_DROPPED.labels("debounce")
+        self._debouncing_gauge = ADMISSION_DEBOUNCING.labels()
+    
+    async def admit(self, session: str, message: str) -> bool:
+        """判断消息是否进入规则匹配
+        
+        Args:
+            session: 会话标识
+            message: 消息内容
+        
+        Returns:
+            bool: 是否放行，False表示重复或已被同一会话的后续消息取代
+        """
+        if not self.enabled:
+            return True
+        
+        if self._dedup is not None and self._dedup.seen((session, hash(message.strip())), time.monotonic()):
+            self._duplicates.inc()
+            return False
+        
+        if self.debounce > 0 and (session in self._latest or len(self._latest) < self.max_debounce_sessions):
+            self._sequence += 1
+            sequence = self._latest[session] = self._sequence
+            self._debouncing_gauge.set(len(self._latest))
+            try:
+                await asyncio.sleep(self.debounce)
+            finally:
+                superseded = self._latest.get(session) != sequence
+                if not superseded:
+                    del self._latest[session]
+                    self._debouncing_gauge.set(len(self._latest))
+            if superseded:
+                self._debounced.inc()
+                return False
+        
+        self._admitted.inc()
+        return True
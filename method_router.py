@@ -0,0 +1,192 @@
+# method_router.py
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# 允许配置的HTTP方法
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+# 方法缓存的条目上限；缓存键是规则中的路径模板，数量有限，上限只是防御
+_MAX_CACHED_PATHS = 4096
+
+class _RouteNode:
+    """路由字符树的节点"""
+    
+    __slots__ = ("exact", "param", "wildcard", "any_child", "catch_all", "method", "fallback")
+    
+    def __init__(self):
+        # 精确匹配的子节点
+        self.exact: Dict[str, "_RouteNode"] = {}
+        # {name} 段对应的子节点
+        self.param: Optional["_RouteNode"] = None
+        # * 段对应的子节点
+        self.wildcard: Optional["_RouteNode"] = None
+        # 对象形式的 DEFAULT 子树，匹配任意一段
+        self.any_child: Optional["_RouteNode"] = None
+        # ** 段：匹配剩余所有段的方法
+        self.catch_all: Optional[str] = None
+        # 路径在此结束时使用的方法
+        self.method: Optional[str] = None
+        # 后续段没有匹配的子节点时使用的方法
+        self.fallback: Optional[str] = None
+
+class MethodRouter:
+    """HTTP方法路由表：加载配置时将 methods 编译为按路径段索引的字符树
+    
+    methods 可以是单个方法字符串，也可以是嵌套对象：
+    - 键为路径段，也可以是带斜杠的多段路径，例如 "/hello"、"/users/{id}"
+    - {name} 匹配任意一段，* 同样匹配任意一段，** 匹配剩余所有段
+    - DEFAULT 为字符串时作为该层的默认方法，为对象时作为任意一段的后备子树
+    - 值为字符串时，该路径及其下的所有路径都使用此方法
+    
+    匹配优先级依次为精确段、{name}、*、DEFAULT 子树；同一路径模板的解析结果会被缓存
+    """
+    
+    def __init__(self, methods_config: Union[str, Dict[str, Any], None]):
+        """编译路由表
+        
+        Args:
+            methods_config: API的 methods 配置
+        
+        Raises:
+            ValueError: 方法名无效或配置结构错误
+        """
+        self._root = _RouteNode()
+        self._cache: Dict[str, Tuple[str, bool]] = {}
+        
+        if not methods_config:
+            return
+        if isinstance(methods_config, str):
+            method = self._check_method(methods_config, "methods")
+            self._root.method = self._root.fallback = method
+            return
+        if not isinstance(methods_config, dict):
+            raise ValueError("methods 必须是字符串或对象")
+        self._compile(self._root, methods_config, "")
+    
+    @staticmethod
+    def split_path(path: str) -> List[str]:
+        """将路径拆分为段，忽略查询字符串和空段
+        
+        Args:
+            path: 请求路径
+        
+        Returns:
+            List[str]: 路径段
+        """
+        path = path.split("?", 1)[0].split("#", 1)[0]
+        return [segment for segment in path.split("/") if segment]
+    
+    @staticmethod
+    def _check_method(method: Any, where: str) -> str:
+        """检查方法名并统一为大写"""
+        if not isinstance(method, str) or method.upper() not in HTTP_METHODS:
+            raise ValueError(f"{where} 的HTTP方法无效: {method!r}")
+        return method.upper()
+    
+    def _compile(self, node: _RouteNode, config: Dict[str, Any], where: str):
+        """递归编译对象形式的配置
+        
+        Args:
+            node: 当前节点
+            config: 当前层的配置对象
+            where: 当前层的路径，用于错误信息
+        """
+        for key, value in config.items():
+            if key == "DEFAULT":
+                if isinstance(value, dict):
+                    if node.any_child is None:
+                        node.any_child = _RouteNode()
+                    self._compile(node.any_child, value, f"{where}/DEFAULT")
+                else:
+                    method = self._check_method(value, f"{where}/DEFAULT")
+                    node.method = node.fallback = method
+                continue
+            
+            segments = self.split_path(key)
+            if "**" in segments[:-1]:
+                raise ValueError(f"路径 '{where}/{key}' 中的 ** 只能作为最后一段")
+            
+            target = node
+            for segment in segments:
+                if segment == "**":
+                    break
+                target = self._child(target, segment)
+            label = f"{where}/{key.strip('/')}"
+            
+            if segments and segments[-1] == "**":
+                target.catch_all = self._check_method(value, label)
+            elif isinstance(value, dict):
+                self._compile(target, value, label)
+            else:
+                method = self._check_method(value, label)
+                target.method = method
+                # 字符串值同时作用于该路径下的所有子路径
+                if target.fallback is None:
+                    target.fallback = method
+    
+    @staticmethod
+    def _child(node: _RouteNode, segment: str) -> _RouteNode:
+        """获取或创建路径段对应的子节点"""
+        if segment.startswith("{") and segment.endswith("}") and len(segment) > 2:
+            if node.param is None:
+                node.param = _RouteNode()
+            return node.param
+        if segment == "*":
+            if node.wildcard is None:
+                node.wildcard = _RouteNode()
+            return node.wildcard
+        child = node.exact.get(segment)
+        if child is None:
+            child = node.exact[segment] = _RouteNode()
+        return child
+    
+    def resolve(self, path_template: str) -> str:
+        """获取路径模板对应的HTTP方法
+        
+        路径模板中含 { 的段（例如 {$1}）视为运行时才确定的值，只匹配 {name}、* 和 DEFAULT
+        
+        Args:
+            path_template: 规则中配置的路径（替换参数之前）
+        
+        Returns:
+            str: HTTP方法，没有匹配的配置时为 GET
+        """
+        cached = self._cache.get(path_template)
+        if cached is None:
+            cached = self._lookup(path_template)
+            if len(self._cache) < _MAX_CACHED_PATHS:
+                self._cache[path_template] = cached
+        return cached[0]
+    
+    def is_routed(self, path_template: str) -> bool:
+        """判断路径模板是否命中了显式配置的方法
+        
+        Args:
+            path_template: 规则中配置的路径
+        
+        Returns:
+            bool: 未命中任何配置（使用隐含的 GET）时为False
+        """
+        return self._lookup(path_template)[1]
+    
+    def _lookup(self, path_template: str) -> Tuple[str, bool]:
+        """沿字符树查找方法，没有匹配的子节点时使用最近一层的默认方法
+        
+        Returns:
+            Tuple[str, bool]: HTTP方法和是否命中显式配置
+        """
+        node = self._root
+        inherited = None
+        for segment in self.split_path(path_template):
+            inherited = node.catch_all or node.fallback or inherited
+            
+            child = None if "{" in segment else node.exact.get(segment)
+            if child is None:
+                child = node.param or node.wildcard or node.any_child
+            if child is None:
+                break
+            node = child
+        else:
+            # 所有段都已匹配，使用路径结束处的方法
+            inherited = node.method or node.catch_all or inherited
+        
+        return (inherited, True) if inherited else ("GET", False)
@@ -0,0 +1,464 @@
+# metrics.py
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from astrbot.api import logger
+
+# 耗时类指标的默认分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 进程内快速操作（规则匹配、模板渲染）的分桶（秒）
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+# 响应体大小的分桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# 状态码分类，按 status // 100 索引，避免每次请求拼接字符串
+_STATUS_CLASSES = ("0xx", "1xx", "2xx", "3xx", "4xx", "5xx")
+
+def status_class(status: int) -> str:
+    """获取HTTP状态码的分类标签
+    
+    Args:
+        status: HTTP状态码
+    
+    Returns:
+        str: 例如 "2xx"、"5xx"
+    """
+    index = status // 100
+    return _STATUS_CLASSES[index] if 0 <= index < len(_STATUS_CLASSES) else "other"
+
+def _escape(value: str) -> str:
+    """转义 Prometheus 标签值"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """生成 {name="value",...} 形式的标签文本"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_number(value: Union[int, float]) -> str:
+    """按 Prometheus 文本格式输出数值"""
+    if isinstance(value, float) and value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class _CounterChild:
+    """某一组标签值对应的计数器"""
+    
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0
+    
+    def inc(self, amount: Union[int, float] = 1):
+        """增加计数
+        
+        Args:
+            amount: 增加量
+        """
+        self.value += amount
+
+class _GaugeChild:
+    """某一组标签值对应的仪表，可增可减"""
+    
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0
+    
+    def set(self, value: Union[int, float]):
+        """设置当前值
+        
+        Args:
+            value: 当前值
+        """
+        self.value = value
+    
+    def inc(self, amount: Union[int, float] = 1):
+        """增加当前值
+        
+        Args:
+            amount: 增加量，可以为负数
+        """
+        self.value += amount
+
+class _HistogramChild:
+    """某一组标签值对应的直方图，分桶固定，观测时不分配对象"""
+    
+    __slots__ = ("bounds", "counts", "sum", "count")
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 各桶的非累计计数，最后一个为 +Inf 桶
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        """记录一次观测值
+        
+        Args:
+            value: 观测值
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, q: float) -> float:
+        """按分桶估算分位数的上界
+        
+        Args:
+            q: 分位数，0到1之间
+        
+        Returns:
+            float: 分位数所在桶的上界，落在 +Inf 桶时返回 inf
+        """
+        target = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and cumulative > 0:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return 0.0
+
+class _Metric(ABC):
+    """指标族：同名、同标签维度的一组子指标"""
+    
+    metric_type = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+    
+    def labels(self, *values: str):
+        """获取某组标签值对应的子指标，首次访问时创建
+        
+        Args:
+            values: 标签值，顺序与 labelnames 一致
+        
+        Returns:
+            子指标，可在调用方缓存以省去查找
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要 {len(self.labelnames)} 个标签值")
+            child = self._children[values] = self._new_child()
+        return child
+    
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """获取所有子指标
+        
+        Returns:
+            List: (标签值, 子指标) 列表
+        """
+        return list(self._children.items())
+    
+    @abstractmethod
+    def _new_child(self):
+        """创建一个子指标"""
+    
+    @abstractmethod
+    def render(self) -> List[str]:
+        """输出 Prometheus 文本格式的样本行"""
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+    
+    metric_type = "counter"
+    
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+    
+    def render(self) -> List[str]:
+        """输出 Prometheus 文本格式的样本行"""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_number(child.value)}"
+            for values, child in self.children()
+        ]
+
+class Gauge(Counter):
+    """可增可减的仪表，表示当前状态（队列长度、熔断状态等）"""
+    
+    metric_type = "gauge"
+    
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+class Histogram(_Metric):
+    """固定分桶的直方图"""
+    
+    metric_type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+    
+    def render(self) -> List[str]:
+        """输出 Prometheus 文本格式的样本行（分桶为累计计数）"""
+        lines = []
+        for values, child in self.children():
+            cumulative = 0
+            for index, count in enumerate(child.counts):
+                cumulative += count
+                bound = self.buckets[index] if index < len(self.buckets) else float("inf")
+                labels = _format_labels(self.labelnames, values, ("le", _format_number(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_number(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class MetricsRegistry:
+    """指标注册表：集中保存插件的所有指标，热重载后继续累计"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """注册计数器，同名指标已存在时直接返回
+        
+        Args:
+            name: 指标名
+            documentation: 说明
+            labelnames: 标签名
+        
+        Returns:
+            Counter: 计数器
+        """
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """注册仪表，同名指标已存在时直接返回
+        
+        Args:
+            name: 指标名
+            documentation: 说明
+            labelnames: 标签名
+        
+        Returns:
+            Gauge: 仪表
+        """
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """注册直方图，同名指标已存在时直接返回
+        
+        Args:
+            name: 指标名
+            documentation: 说明
+            labelnames: 标签名
+            buckets: 分桶上界
+        
+        Returns:
+            Histogram: 直方图
+        """
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def _register(self, metric: _Metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self) -> str:
+        """输出 Prometheus 文本格式
+        
+        Returns:
+            str: 可被 Prometheus 抓取的文本
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def summary(self) -> str:
+        """输出便于在聊天中查看的指标摘要
+        
+        Returns:
+            str: 每个有数据的子指标一行
+        """
+        lines = []
+        for metric in self._metrics.values():
+            for values, child in metric.children():
+                labels = ",".join(values)
+                title = f"{metric.name}[{labels}]" if labels else metric.name
+                if isinstance(child, _HistogramChild):
+                    if not child.count:
+                        continue
+                    average = child.sum / child.count
+                    p95 = child.quantile(0.95)
+                    lines.append(f"{title}: 次数 {child.count}，平均 {average:.4g}，p95 ≤ {p95:.4g}")
+                else:
+                    lines.append(f"{title}: {_format_number(child.value)}")
+        return "\n".join(lines) if lines else "暂无指标数据"
+
+class MetricsHttpServer:
+    """在本地端口上以 Prometheus 文本格式提供指标"""
+    
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464, path: str = "/metrics"):
+        """初始化服务
+        
+        Args:
+            registry: 指标注册表
+            host: 监听地址
+            port: 监听端口
+            path: 指标路径
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner = None
+    
+    async def start(self):
+        """启动HTTP服务"""
+        from aiohttp import web
+        
+        async def _handle(request):
+            return web.Response(
+                body=self.registry.render().encode("utf-8"),
+                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+            )
+        
+        app = web.Application()
+        app.router.add_get(self.path, _handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"指标服务已启动: http://{self.host}:{self.port}{self.path}")
+    
+    async def stop(self):
+        """停止HTTP服务"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+class LoopLagMonitor:
+    """定期测量事件循环延迟：计划在 interval 秒后唤醒，实际唤醒时间晚出的部分即为循环被占用的时长"""
+    
+    def __init__(self, histogram: Histogram, interval: float = 0.5):
+        """初始化
+        
+        Args:
+            histogram: 记录延迟的直方图（无标签）
+            interval: 测量间隔（秒）
+        """
+        self.histogram = histogram
+        self.interval = interval
+        self._task = None
+    
+    def start(self):
+        """开始测量"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def _run(self):
+        child = self.histogram.labels()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            child.observe(max(0.0, time.monotonic() - expected))
+    
+    async def stop(self):
+        """停止测量"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# 插件的全局指标注册表
+REGISTRY = MetricsRegistry()
+
+# 事件循环
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "extapi_event_loop_lag_seconds", "事件循环延迟：定时唤醒比计划晚的时长，反映循环被同步代码占用的程度",
+    (), (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+# 准入
+ADMISSION_ADMITTED = REGISTRY.counter("extapi_admission_admitted_total", "启用准入时放行进入规则匹配的消息数")
+ADMISSION_DROPPED = REGISTRY.counter("extapi_admission_dropped_total", "准入阶段丢弃的消息数，按原因区分（duplicate/debounce）", ("reason",))
+ADMISSION_DEDUP_OVERFLOWS = REGISTRY.counter("extapi_admission_dedup_overflows_total", "去重窗口的时间桶已满、未记录而直接放行的消息数")
+ADMISSION_DEBOUNCING = REGISTRY.gauge("extapi_admission_debouncing", "当前正在防抖等待的会话数")
+
+# 配额
+QUOTA_ALLOWED = REGISTRY.counter("extapi_quota_allowed_total", "通过全部配额检查的调用次数")
+QUOTA_REJECTED = REGISTRY.counter("extapi_quota_rejected_total", "超出配额被拒绝的调用次数，按配额维度区分", ("scope",))
+QUOTA_EVICTED = REGISTRY.counter("extapi_quota_evicted_total", "超出容量被提前淘汰的配额键数，被淘汰的调用者配额提前恢复")
+QUOTA_KEYS = REGISTRY.gauge("extapi_quota_keys", "配额存储当前保存的键数")
+
+# 规则匹配
+RULE_MATCH_SECONDS = REGISTRY.histogram(
+    "extapi_rule_match_seconds", "规则匹配耗时，按命中规则的类型区分（未命中为 none）",
+    ("rule_type",), FAST_BUCKETS
+)
+RULE_HITS = REGISTRY.counter("extapi_rule_hits_total", "各规则的命中次数，按规则在配置中的序号和类型区分", ("index", "rule_type"))
+
+# 请求
+REQUEST_BUILD_SECONDS = REGISTRY.histogram(
+    "extapi_request_build_seconds", "构造请求参数耗时", ("api",), FAST_BUCKETS
+)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "extapi_upstream_seconds", "上游请求延迟，按状态码分类（超时为 timeout，其他错误为 error）",
+    ("api", "status_class")
+)
+UPSTREAM_RETRIES = REGISTRY.counter("extapi_upstream_retries_total", "上游请求重试次数", ("api",))
+UPSTREAM_HEDGES = REGISTRY.counter("extapi_upstream_hedges_total", "对冲请求次数：sent 为补发次数，won 为对冲请求先于原请求成功的次数，skipped 为限流器没有空闲名额而放弃对冲的次数", ("api", "result"))
+UPSTREAM_TIMEOUTS = REGISTRY.counter("extapi_upstream_timeouts_total", "上游请求超时次数", ("api",))
+RESPONSE_BYTES = REGISTRY.histogram("extapi_response_bytes", "上游响应体大小（字节）", ("api",), SIZE_BUCKETS)
+BATCH_SIZE = REGISTRY.histogram("extapi_batch_size", "微批请求包含的条目数", ("api",), (1, 2, 4, 8, 16, 32, 64, 128))
+
+# 请求合并
+COALESCE_REQUESTS = REGISTRY.counter(
+    "extapi_coalesce_requests_total", "参与单飞合并的调用数：leader 实际发起请求，coalesced 等待进行中的相同请求", ("api", "role")
+)
+
+# 限流
+LIMITER_ADMITTED = REGISTRY.counter("extapi_limiter_admitted_total", "限流器放行的请求数", ("api",))
+LIMITER_QUEUED = REGISTRY.counter("extapi_limiter_queued_total", "超出并发数或速率而进入等待队列的请求数", ("api",))
+LIMITER_DROPPED = REGISTRY.counter("extapi_limiter_dropped_total", "限流器丢弃的请求数，按原因区分（queue_full/timeout）", ("api", "reason"))
+LIMITER_WAITING = REGISTRY.gauge("extapi_limiter_waiting", "当前在等待队列中的请求数", ("api",))
+LIMITER_WAIT_SECONDS = REGISTRY.histogram("extapi_limiter_wait_seconds", "请求在等待队列中的等待时间", ("api",))
+
+# 响应缓存
+CACHE_LOOKUPS = REGISTRY.counter("extapi_cache_lookups_total", "响应缓存查找次数，按结果区分（hit/miss，过期计为 miss）", ("api", "result"))
+CACHE_EVICTIONS = REGISTRY.counter("extapi_cache_evictions_total", "超出条目数或字节预算被淘汰的缓存条目数", ("api",))
+CACHE_ENTRIES = REGISTRY.gauge("extapi_cache_entries", "响应缓存当前条目数", ("api",))
+CACHE_BYTES = REGISTRY.gauge("extapi_cache_bytes", "响应缓存当前估算字节数", ("api",))
+
+# 熔断
+BREAKER_STATE = REGISTRY.gauge("extapi_breaker_state", "熔断器当前状态：0 关闭，1 半开，2 打开", ("api",))
+BREAKER_TRANSITIONS = REGISTRY.counter("extapi_breaker_transitions_total", "熔断器状态切换次数", ("api", "from", "to"))
+BREAKER_REJECTED = REGISTRY.counter("extapi_breaker_rejected_total", "熔断器打开或半开探测名额已满时直接拒绝的请求数", ("api",))
+
+# 分页
+CURSOR_PAGES = REGISTRY.counter("extapi_cursor_pages_total", "通过翻页指令输出的后续页数")
+CURSOR_DROPPED = REGISTRY.counter(
+    "extapi_cursor_dropped_total", "未输出完就被丢弃的分页数，按原因区分（expired/evicted/rejected，rejected 为单个分页超过字节数上限）", ("reason",)
+)
+CURSOR_SESSIONS = REGISTRY.gauge("extapi_cursor_sessions", "当前保存分页的会话数")
+CURSOR_BYTES = REGISTRY.gauge("extapi_cursor_bytes", "当前保存的分页的估算字节数")
+
+# 格式化
+FORMAT_SECONDS = REGISTRY.histogram("extapi_format_seconds", "响应格式化耗时", ("api",), FAST_BUCKETS)
+OFFLOADED_RESPONSES = REGISTRY.counter(
+    "extapi_offloaded_responses_total", "交给工作池处理的大响应数，工作池已满时在事件循环上处理（inline）", ("mode",)
+)
+OFFLOAD_INFLIGHT = REGISTRY.gauge("extapi_offload_inflight", "已提交到工作池、尚未完成的任务数")
\ No newline at end of file
@@ -0,0 +1,181 @@
+# micro_batch.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from .body_template import CompiledBodyTemplate
+from .json_path import CompiledJsonPath, MISSING
+
+# 批量响应的拆分方式
+MATCH_BY_INDEX = "index"
+MATCH_BY_ID = "id"
+
+# 没有请求体的方法，无法携带批量请求的条目数组
+BODYLESS_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+class BatchConfig:
+    """API batch 配置的编译结果"""
+    
+    __slots__ = ("max_size", "max_wait", "path", "method", "body_template", "items_path", "match_by", "id_path")
+    
+    def __init__(self, batch_config: Dict[str, Any]):
+        """编译 batch 配置
+        
+        Args:
+            batch_config: API的 batch 配置块
+        
+        Raises:
+            ValueError: 配置无效
+        """
+        self.max_size = int(batch_config.get("max_size", 16))
+        if self.max_size < 1:
+            raise ValueError(f"max_size 必须大于0: {self.max_size}")
+        self.max_wait = float(batch_config.get("max_wait_ms", 20)) / 1000
+        
+        # 批量请求的路径和方法，未配置时使用单条请求的路径和方法
+        self.path: Optional[str] = batch_config.get("path") or None
+        self.method: Optional[str] = (batch_config.get("method") or "").upper() or None
+        if self.method in BODYLESS_METHODS:
+            raise ValueError(f"批量请求体需要随请求发送，method 不能是 {self.method}")
+        
+        # 批量请求体模板，{{items|raw}} 为各条请求体组成的数组；未配置时直接发送数组
+        self.body_template: Optional[CompiledBodyTemplate] = None
+        if batch_config.get("body_template") is not None:
+            self.body_template = CompiledBodyTemplate(batch_config["body_template"])
+        
+        # 响应中结果数组的位置，未配置时整个响应即为数组
+        self.items_path: Optional[CompiledJsonPath] = None
+        if batch_config.get("response_items"):
+            self.items_path = CompiledJsonPath(batch_config["response_items"])
+        
+        # 按下标或按结果中的ID把结果分配给各条请求
+        self.match_by = batch_config.get("match_by", MATCH_BY_INDEX)
+        if self.match_by not in (MATCH_BY_INDEX, MATCH_BY_ID):
+            raise ValueError(f"match_by 只能是 index 或 id: {self.match_by}")
+        self.id_path: Optional[CompiledJsonPath] = None
+        if self.match_by == MATCH_BY_ID:
+            if not batch_config.get("id_path"):
+                raise ValueError("match_by 为 id 时需要配置 id_path")
+            self.id_path = CompiledJsonPath(batch_config["id_path"])
+    
+    def applies_to(self, method: str) -> bool:
+        """判断该方法的单条请求能否合并为批量请求
+        
+        Args:
+            method: 单条请求的HTTP方法
+        
+        Returns:
+            bool: 批量请求的实际方法可以携带请求体
+        """
+        return (self.method or method.upper()) not in BODYLESS_METHODS
+    
+    def split(self, response: Any, count: int) -> List[Tuple[bool, Any]]:
+        """把批量响应拆分为每条请求的结果
+        
+        Args:
+            response: 批量请求的响应数据
+            count: 批次中的请求条数
+        
+        Returns:
+            List[Tuple[bool, Any]]: 与请求顺序对应的 (是否成功, 结果)
+        """
+        items = self.items_path.extract(response) if self.items_path is not None else response
+        if not isinstance(items, list):
+            error = (False, {"error": "批量响应中没有结果数组", "response": response})
+            return [error] * count
+        
+        if self.match_by == MATCH_BY_ID:
+            by_id = {}
+            for item in items:
+                item_id = self.id_path.extract(item)
+                if item_id is not MISSING:
+                    by_id[str(item_id)] = item
+            return [
+                (True, by_id[str(index)]) if str(index) in by_id
+                else (False, {"error": f"批量响应缺少ID为 {index} 的结果"})
+                for index in range(count)
+            ]
+        
+        return [
+            (True, items[index]) if index < len(items)
+            else (False, {"error": f"批量响应缺少第 {index + 1} 条结果"})
+            for index in range(count)
+        ]
+
+class _PendingBatch:
+    """正在收集中的批次"""
+    
+    __slots__ = ("items", "futures", "timer")
+    
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class MicroBatcher:
+    """微批处理：收集同一批次键的并发请求，凑满条数或等待超时后合并为一次上游调用
+    
+    每个调用者等待自己的 Future，批量请求完成后按顺序把拆分后的结果分发给各调用者
+    """
+    
+    def __init__(self, config: BatchConfig, send: Callable[[Hashable, List[Any]], Awaitable[List[Tuple[bool, Any]]]]):
+        """初始化
+        
+        Args:
+            config: 编译后的 batch 配置
+            send: 发送一个批次的协程函数，参数为批次键和条目列表，返回与条目顺序对应的结果
+        """
+        self.config = config
+        self._send = send
+        self._pending: Dict[Hashable, _PendingBatch] = {}
+        # 正在发送的批次，保留引用避免任务被回收
+        self._running: set = set()
+    
+    async def submit(self, key: Hashable, item: Any) -> Tuple[bool, Any]:
+        """加入批次并等待结果
+        
+        Args:
+            key: 批次键，只有键相同的请求才会合并
+            item: 条目数据
+        
+        Returns:
+            Tuple[bool, Any]: 该条目的 (是否成功, 结果)
+        
+        Raises:
+            Exception: 发送批次时抛出的异常
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch()
+            batch.timer = loop.call_later(self.config.max_wait, self._flush, key)
+        
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.config.max_size:
+            self._flush(key)
+        return await future
+    
+    def _flush(self, key: Hashable):
+        """结束收集并在后台发送批次"""
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+    
+    async def _run(self, key: Hashable, batch: _PendingBatch):
+        """发送批次并分发结果，发送时的异常原样转交给每个调用者"""
+        try:
+            results = await self._send(key, batch.items)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(batch.futures, results):
+            # 调用者可能已被取消
+            if not future.done():
+                future.set_result(result)
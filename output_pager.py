@@ -0,0 +1,306 @@
+# output_pager.py
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from .json_codec import CODEC
+from .response_cache import estimate_size
+from .metrics import CURSOR_PAGES, CURSOR_DROPPED, CURSOR_SESSIONS, CURSOR_BYTES
+
+# 元素多于该数量的数组或对象逐个元素编码，只编码到当前页所需的位置；较小的整体交给 CODEC 一次编码
+_SPLIT_ITEMS = 64
+
+def iter_pretty_json(data: Any) -> Iterator[str]:
+    """逐段生成缩进两格的JSON文本，无法序列化时输出 str(data)
+    
+    Args:
+        data: 要输出的数据
+    
+    Returns:
+        Iterator[str]: JSON文本片段
+    """
+    chunks = _iter_pretty(data)
+    try:
+        first = next(chunks, "")
+    except (TypeError, ValueError):
+        yield str(data)
+        return
+    yield first
+    yield from chunks
+
+def iter_pretty_json_array(items: Iterable[Any]) -> Iterator[str]:
+    """把惰性产生的元素逐个输出为缩进两格的JSON数组，与整体序列化列表的结果相同
+    
+    元素只在取到对应页面时才被求值，多值提取路径的结果不需要先收集为列表
+    
+    Args:
+        items: 数组元素，可以是惰性迭代器
+    
+    Returns:
+        Iterator[str]: JSON文本片段
+    """
+    separator = "[\n  "
+    for item in items:
+        yield separator
+        separator = ",\n  "
+        for chunk in _iter_pretty(item):
+            yield chunk.replace("\n", "\n  ")
+    yield "[]" if separator == "[\n  " else "\n]"
+
+def _iter_pretty_object(data: Dict[Any, Any]) -> Iterator[str]:
+    """逐个键值对输出缩进两格的JSON对象，键的转换规则与标准库相同"""
+    separator = "{\n  "
+    for key, value in data.items():
+        if not isinstance(key, str):
+            if key is not None and not isinstance(key, (int, float)):
+                raise TypeError(f"JSON对象的键不能是 {type(key).__name__}")
+            key = CODEC.dumps_text(key)
+        yield separator + CODEC.dumps_text(key) + ": "
+        separator = ",\n  "
+        for chunk in _iter_pretty(value):
+            yield chunk.replace("\n", "\n  ")
+    yield "{}" if separator == "{\n  " else "\n}"
+
+def _iter_pretty(data: Any) -> Iterator[str]:
+    """按大小选择逐个元素编码或整体编码"""
+    if isinstance(data, (list, tuple)) and len(data) > _SPLIT_ITEMS:
+        yield from iter_pretty_json_array(data)
+    elif isinstance(data, dict) and len(data) > _SPLIT_ITEMS:
+        yield from _iter_pretty_object(data)
+    else:
+        yield CODEC.dumps_text(data, indent=True)
+
+class OutputBudget:
+    """单条消息的输出预算，0表示该维度不限制"""
+    
+    __slots__ = ("max_chars", "max_lines")
+    
+    def __init__(self, max_chars: int = 0, max_lines: int = 0):
+        self.max_chars = max_chars
+        self.max_lines = max_lines
+    
+    @classmethod
+    def from_config(cls, output_config: Dict[str, Any]) -> Optional["OutputBudget"]:
+        """从 output 配置块构造预算
+        
+        Args:
+            output_config: 包含 max_chars、max_lines 的配置
+        
+        Returns:
+            Optional[OutputBudget]: 两个维度都不限制时为None
+        
+        Raises:
+            ValueError: 配置无效
+        """
+        max_chars = int(output_config.get("max_chars", 0))
+        max_lines = int(output_config.get("max_lines", 0))
+        if max_chars < 0 or max_lines < 0:
+            raise ValueError(f"max_chars 和 max_lines 不能为负数: {max_chars}/{max_lines}")
+        if not max_chars and not max_lines:
+            return None
+        return cls(max_chars, max_lines)
+
+class OutputPager:
+    """按输出预算把文本片段流切分为多页，只在取下一页时消费所需的片段"""
+    
+    __slots__ = ("budget", "_chunks", "_rest", "_exhausted", "_ready", "_source", "_size", "pages")
+    
+    def __init__(self, chunks: Iterable[str], budget: Optional[OutputBudget] = None, source: Any = None):
+        """初始化
+        
+        Args:
+            chunks: 文本片段，可以是惰性生成器
+            budget: 每页的预算，None表示全部内容作为一页
+            source: 惰性片段引用的数据，用于估算分页保留的内存；片段为现成文本时为None
+        """
+        self.budget = budget
+        self._source = source
+        self._size: Optional[int] = None
+        self._chunks = iter(chunks)
+        self._rest = ""
+        self._exhausted = False
+        # 预先生成的下一页
+        self._ready: Optional[str] = None
+        # 已输出的页数
+        self.pages = 0
+    
+    @property
+    def done(self) -> bool:
+        """是否已输出全部内容"""
+        return self._ready is None and self._exhausted and not self._rest
+    
+    def retained_bytes(self) -> int:
+        """估算分页保留的字节数：尚未输出的文本加上惰性片段引用的数据，首次调用时计算
+        
+        Returns:
+            int: 估算的字节数
+        """
+        if self._size is None:
+            size = len(self._rest.encode("utf-8"))
+            if self._ready is not None:
+                size += len(self._ready.encode("utf-8"))
+            if self._source is not None:
+                size += estimate_size(self._source)
+                self._source = None
+            self._size = size
+        return self._size
+    
+    def prefetch(self):
+        """预先生成下一页，使生成页面的开销发生在调用方所在的线程"""
+        if self._ready is None:
+            self._ready = self._build_page()
+    
+    def next_page(self) -> str:
+        """取下一页
+        
+        Returns:
+            str: 页面文本，没有剩余内容时为空字符串
+        """
+        page = self._ready if self._ready is not None else self._build_page()
+        self._ready = None
+        self.pages += 1
+        return page
+    
+    def _build_page(self) -> str:
+        """消费片段并切出一页"""
+        budget = self.budget
+        parts = [self._rest]
+        chars = len(self._rest)
+        lines = self._rest.count("\n")
+        while not self._exhausted and (budget is None or (
+            (not budget.max_chars or chars <= budget.max_chars)
+            and (not budget.max_lines or lines < budget.max_lines)
+        )):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                break
+            parts.append(chunk)
+            chars += len(chunk)
+            lines += chunk.count("\n")
+        
+        text = "".join(parts)
+        cut = self._find_cut(text)
+        page, self._rest = text[:cut], text[cut:]
+        if cut < len(text) and self._rest.startswith("\n"):
+            self._rest = self._rest[1:]
+        # 预读一个片段，使 done 在最后一页输出后立即为真
+        if not self._rest and not self._exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+            else:
+                self._rest = chunk
+        return page.rstrip("\n")
+    
+    def _find_cut(self, text: str) -> int:
+        """确定本页的结束位置，优先在换行处断开"""
+        budget = self.budget
+        if budget is None:
+            return len(text)
+        limit = len(text)
+        if budget.max_chars:
+            limit = min(limit, budget.max_chars)
+        if budget.max_lines:
+            newline = -1
+            for _ in range(budget.max_lines):
+                newline = text.find("\n", newline + 1)
+                if newline < 0:
+                    break
+            if newline >= 0:
+                limit = min(limit, newline)
+        if limit >= len(text):
+            return len(text)
+        
+        # 在预算内的最后一个换行处断开，换行太靠前时直接截断
+        newline = text.rfind("\n", 0, limit + 1)
+        return newline if newline > limit // 2 else max(1, limit)
+
+class CursorCache:
+    """按会话保存未输出完的分页，有会话数和字节数上限以及过期时间
+    
+    每个会话只保留最近一次响应的分页，超出任一上限时淘汰最久未使用的会话
+    """
+    
+    def __init__(self, max_sessions: int = 10000, ttl: float = 600, max_bytes: int = 64 * 1024 * 1024):
+        """初始化
+        
+        Args:
+            max_sessions: 最多保存的会话数
+            ttl: 分页的保留时间（秒）
+            max_bytes: 所有分页保留数据的估算字节数上限
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[OutputPager, float]]" = OrderedDict()
+        self._bytes = 0
+        
+        self._served = CURSOR_PAGES.labels()
+        self._expired = CURSOR_DROPPED.labels("expired")
+        self._evicted = CURSOR_DROPPED.labels("evicted")
+        self._rejected = CURSOR_DROPPED.labels("rejected")
+        self._sessions_gauge = CURSOR_SESSIONS.labels()
+        self._bytes_gauge = CURSOR_BYTES.labels()
+    
+    def put(self, session: str, pager: OutputPager) -> bool:
+        """保存会话的分页，替换该会话之前的分页
+        
+        Args:
+            session: 会话标识
+            pager: 尚未输出完的分页
+        
+        Returns:
+            bool: 是否已保存；单个分页超过字节数上限时不保存
+        """
+        self.discard(session)
+        size = pager.retained_bytes()
+        if size > self.max_bytes:
+            self._rejected.inc()
+            return False
+        self._entries[session] = (pager, time.monotonic() + self.ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_sessions or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted.retained_bytes()
+            self._evicted.inc()
+        self._update_gauges()
+        return True
+    
+    def discard(self, session: str):
+        """丢弃会话的分页"""
+        entry = self._entries.pop(session, None)
+        if entry is not None:
+            self._bytes -= entry[0].retained_bytes()
+            self._update_gauges()
+    
+    def _update_gauges(self):
+        """更新会话数和字节数指标"""
+        self._sessions_gauge.set(len(self._entries))
+        self._bytes_gauge.set(self._bytes)
+    
+    def next_page(self, session: str) -> Optional[Tuple[str, bool]]:
+        """取会话的下一页
+        
+        Args:
+            session: 会话标识
+        
+        Returns:
+            Optional[Tuple[str, bool]]: (页面文本, 是否还有更多)；没有可用分页时为None
+        """
+        entry = self._entries.get(session)
+        if entry is None:
+            return None
+        pager, expires = entry
+        if time.monotonic() > expires:
+            self.discard(session)
+            self._expired.inc()
+            return None
+        
+        page = pager.next_page()
+        self._served.inc()
+        if pager.done:
+            self.discard(session)
+            return page, False
+        self._entries.move_to_end(session)
+        self._entries[session] = (pager, time.monotonic() + self.ttl)
+        return page, True
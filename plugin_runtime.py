@@ -0,0 +1,208 @@
+# plugin_runtime.py
+import asyncio
+import math
+from typing import Any, Dict, Optional
+from astrbot.api import logger
+
+from .config_service import ConfigService
+from .rule_factory import RuleFactory
+from .request_template_engine import RequestTemplateEngine
+from .response_formatter import ResponseFormatter
+from .message_admission import MessageAdmission
+from .quota import QuotaStore
+from .output_pager import CursorCache, OutputPager
+from .worker_pool import WorkerPool
+from .format_template import CompiledFormatTemplate
+
+class PluginRuntime:
+    """一份已加载配置对应的运行时组件：规则、请求引擎和响应格式化器
+    
+    热重载时构建新的运行时并整体替换插件持有的引用；处理中的消息继续使用开始时取得的旧运行时，
+    旧运行时在所有请求完成后关闭未被新运行时沿用的连接池
+    """
+    
+    def __init__(self, config_service: ConfigService, previous: Optional["PluginRuntime"] = None):
+        """根据配置构建运行时
+        
+        Args:
+            config_service: 已加载并验证的配置服务
+            previous: 当前正在使用的运行时，未变化的规则、连接池和缓存从中沿用
+        """
+        self.config_service = config_service
+        
+        # 消息准入（去重与防抖），配置未变化时沿用，保留去重窗口中的记录
+        admission_config = config_service.get_global_config().get("admission") or {}
+        if previous is not None and previous.admission.config == admission_config:
+            self.admission = previous.admission
+        else:
+            self.admission = MessageAdmission(admission_config)
+        
+        self.rule_factory = RuleFactory()
+        self.rule_factory.build_rules(
+            config_service.get_rules(),
+            previous.rule_factory if previous is not None else None
+        )
+        
+        # 大响应的工作池，配置未变化时沿用
+        offload_config = config_service.get_global_config().get("offload") or {}
+        if previous is not None and previous.offload.config == offload_config:
+            self.offload = previous.offload
+        else:
+            self.offload = WorkerPool(offload_config)
+        
+        self.request_engine = RequestTemplateEngine(
+            config_service.get_api_specs(),
+            config_service.get_global_config(),
+            previous.request_engine if previous is not None else None,
+            self.offload
+        )
+        
+        # 规则的路径覆盖在路由表中没有对应的方法时提示
+        for warning in self.request_engine.check_rule_paths(self.rule_factory.rules):
+            logger.warning(warning)
+        
+        self.response_formatter = ResponseFormatter(config_service.get_api_specs(), self.offload)
+        
+        # 配额存储，键包含配额参数，修改配额后自动重新计数，因此可以一直沿用
+        quota_config = config_service.get_global_config().get("quota") or {}
+        if previous is not None and previous.quota_store.max_keys == int(quota_config.get("max_keys", 100000)):
+            self.quota_store = previous.quota_store
+        else:
+            self.quota_store = QuotaStore(int(quota_config.get("max_keys", 100000)))
+        self.quota_reply = CompiledFormatTemplate(
+            quota_config.get("reply") or "调用过于频繁，请在 {{retry_after}} 秒后再试"
+        )
+        
+        # 超出输出预算的响应按会话保存剩余分页，翻页时不再请求上游
+        output_config = config_service.get_global_config().get("output") or {}
+        cursor_options = (
+            int(output_config.get("max_cursors", 10000)),
+            float(output_config.get("cursor_ttl", 600)),
+            int(output_config.get("cursor_max_bytes", 64 * 1024 * 1024))
+        )
+        if previous is not None and (previous.cursors.max_sessions, previous.cursors.ttl, previous.cursors.max_bytes) == cursor_options:
+            self.cursors = previous.cursors
+        else:
+            self.cursors = CursorCache(*cursor_options)
+        more_commands = [command.lstrip("/").lower() for command in output_config.get("more_commands") or ["more", "next"]]
+        self.more_commands = set(more_commands)
+        self.more_hint = f"\n（内容较长，发送 {more_commands[0]} 查看下一页）"
+        self.truncated_hint = "\n（内容过长，仅显示第一页）"
+        
+        # 正在使用该运行时处理的消息数
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+    
+    def first_page(self, session: str, pager: OutputPager) -> str:
+        """输出响应的第一页，其余分页保存到会话的游标中
+        
+        Args:
+            session: 会话标识
+            pager: 响应的分页器
+            
+        Returns:
+            str: 第一页文本，还有后续分页时附带翻页提示；剩余内容超过游标的字节数上限时附带截断提示
+        """
+        page = pager.next_page()
+        if pager.done:
+            # 新的响应已完整输出，之前未看完的分页不再有意义
+            self.cursors.discard(session)
+            return page
+        if not self.cursors.put(session, pager):
+            return page + self.truncated_hint
+        return page + self.more_hint
+    
+    def more_page(self, session: str, message: str) -> Optional[str]:
+        """处理查看后续分页的指令
+        
+        Args:
+            session: 会话标识
+            message: 消息内容
+            
+        Returns:
+            Optional[str]: 下一页文本；不是翻页指令或该会话没有未输出完的分页时为None
+        """
+        if message.strip().lstrip("/").lower() not in self.more_commands:
+            return None
+        result = self.cursors.next_page(session)
+        if result is None:
+            return None
+        page, has_more = result
+        return page + self.more_hint if has_more else page
+    
+    def check_quota(self, params: Dict[str, Any], identity: Dict[str, Optional[str]]) -> Optional[str]:
+        """检查规则和目标API的配额，全部未超出时计一次调用
+        
+        Args:
+            params: 规则匹配参数
+            identity: 调用者标识，键为 user、group、session；私聊没有 group
+            
+        Returns:
+            Optional[str]: 未超出时为None，否则为回复文本
+        """
+        fan_out = params.get("fan_out")
+        api_names = fan_out.api_names if fan_out is not None else [params.get("api_name")]
+        
+        quotas = list(params.get("quotas") or ())
+        reply = self.quota_reply
+        for api_name in api_names:
+            spec = self.config_service.get_api_spec(api_name)
+            if spec is not None and spec.quotas:
+                quotas.extend(spec.quotas)
+                reply = spec.quota_reply or reply
+        if not quotas:
+            return None
+        
+        # 缺少对应标识的配额（例如私聊中的群配额）不生效
+        checks = [
+            ((owner, identity[limit.scope]) + limit.key(), limit)
+            for owner, limit in quotas
+            if identity.get(limit.scope)
+        ]
+        denied = self.quota_store.acquire(checks)
+        if denied is None:
+            return None
+        
+        limit, retry_after = denied
+        return reply.render({
+            "retry_after": max(1, math.ceil(retry_after)),
+            "scope": limit.scope,
+            "limit": limit.limit,
+            "window": f"{limit.window:g}"
+        })
+    
+    async def start(self):
+        """创建尚未沿用的连接池"""
+        await self.request_engine.start()
+    
+    def enter(self):
+        """开始用该运行时处理一条消息"""
+        self._inflight += 1
+        self._idle.clear()
+    
+    def leave(self):
+        """一条消息处理完成"""
+        self._inflight -= 1
+        if self._inflight <= 0:
+            self._inflight = 0
+            self._idle.set()
+    
+    async def retire(self, successor: Optional["PluginRuntime"] = None, drain_timeout: float = 30):
+        """等待处理中的消息完成后释放资源
+        
+        等待被取消时（插件终止）也会释放资源
+        
+        Args:
+            successor: 替换该运行时的新运行时，其沿用的连接池不会被关闭
+            drain_timeout: 最长等待秒数，超时后直接关闭
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"旧配置仍有 {self._inflight} 个请求未完成，强制关闭")
+        finally:
+            keep = successor.request_engine.sessions() if successor is not None else ()
+            await self.request_engine.close(keep)
+            if successor is None or successor.offload is not self.offload:
+                self.offload.shutdown()
\ No newline at end of file
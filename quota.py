@@ -0,0 +1,147 @@
+# quota.py
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from .metrics import QUOTA_ALLOWED, QUOTA_REJECTED, QUOTA_EVICTED, QUOTA_KEYS
+
+# 配额的统计维度
+QUOTA_SCOPES = ("user", "group", "session")
+
+class QuotaLimit:
+    """一条配额：某个维度上每 window 秒最多 limit 次调用"""
+    
+    __slots__ = ("scope", "limit", "window", "interval", "tolerance")
+    
+    def __init__(self, scope: str, limit: int, window: float):
+        """初始化
+        
+        Args:
+            scope: 统计维度，user 按发送者、group 按群、session 按会话
+            limit: 窗口内允许的调用次数
+            window: 窗口长度（秒）
+        
+        Raises:
+            ValueError: 参数无效
+        """
+        if scope not in QUOTA_SCOPES:
+            raise ValueError(f"配额维度只能是 {'/'.join(QUOTA_SCOPES)}: {scope}")
+        if limit < 1 or window <= 0:
+            raise ValueError(f"配额次数和窗口必须大于0: {limit}/{window}")
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        # GCRA 参数：相邻两次调用的理论间隔，以及允许的突发量（窗口内全部次数）
+        self.interval = window / limit
+        self.tolerance = window - self.interval
+    
+    @classmethod
+    def parse(cls, text: str) -> "QuotaLimit":
+        """解析规则选项中的配额，格式为 维度:次数/秒数，例如 user:10/60
+        
+        Args:
+            text: 配额文本
+        
+        Returns:
+            QuotaLimit: 配额
+        
+        Raises:
+            ValueError: 格式无效
+        """
+        scope, _, rate = text.partition(":")
+        limit, _, window = rate.partition("/")
+        try:
+            return cls(scope.strip(), int(limit), float(window))
+        except ValueError as e:
+            raise ValueError(f"配额格式应为 维度:次数/秒数，例如 user:10/60: {text} ({str(e)})")
+    
+    @classmethod
+    def from_config(cls, quota_config: Dict[str, Any]) -> "QuotaLimit":
+        """从API的 quotas 配置项构造配额
+        
+        Args:
+            quota_config: 包含 scope、limit、window 的配置
+        
+        Returns:
+            QuotaLimit: 配额
+        
+        Raises:
+            ValueError: 配置无效
+        """
+        try:
+            return cls(quota_config.get("scope", "user"), int(quota_config["limit"]), float(quota_config.get("window", 60)))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"配额配置无效: {quota_config} ({str(e)})")
+    
+    def key(self) -> Tuple[str, int, float]:
+        """配额参数组成的键，参数变化后重新计数"""
+        return (self.scope, self.limit, self.window)
+    
+    def __repr__(self) -> str:
+        return f"{self.scope}:{self.limit}/{self.window:g}"
+
+class QuotaStore:
+    """基于 GCRA（通用信元速率算法）的配额存储
+    
+    每个键只保存一个浮点数：理论到达时间（TAT）。TAT 不晚于当前时间的键已完全恢复配额，
+    删除后与从未出现过等价，因此定期清理这类空闲键即可把内存控制在活跃调用者的数量上
+    """
+    
+    def __init__(self, max_keys: int = 100000, sweep_interval: float = 60):
+        """初始化
+        
+        Args:
+            max_keys: 最多保存的键数，清理空闲键后仍超出时淘汰最早创建的键
+            sweep_interval: 清理空闲键的最小间隔（秒）
+        """
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._tats: Dict[Hashable, float] = {}
+        self._last_sweep = time.monotonic()
+        
+        self._allowed = QUOTA_ALLOWED.labels()
+        self._rejected = {scope: QUOTA_REJECTED.labels(scope) for scope in QUOTA_SCOPES}
+        self._evicted = QUOTA_EVICTED.labels()
+        self._keys_gauge = QUOTA_KEYS.labels()
+    
+    def acquire(self, checks: Iterable[Tuple[Hashable, QuotaLimit]], now: Optional[float] = None) -> Optional[Tuple[QuotaLimit, float]]:
+        """检查一组配额，全部未超出时各计一次调用
+        
+        Args:
+            checks: (键, 配额) 列表，键中应包含调用者标识和配额参数
+            now: 当前时间（单调时钟），默认取当前时间
+        
+        Returns:
+            Optional[Tuple[QuotaLimit, float]]: 未超出时为None；否则为超出的配额和需要等待的秒数
+        """
+        if now is None:
+            now = time.monotonic()
+        self._maybe_sweep(now)
+        
+        # 先检查全部配额，都通过后再写入，避免被拒绝的调用消耗其他配额
+        updates: List[Tuple[Hashable, float]] = []
+        for key, limit in checks:
+            tat = max(self._tats.get(key, now), now)
+            if tat - now > limit.tolerance:
+                self._rejected[limit.scope].inc()
+                return limit, tat - limit.tolerance - now
+            updates.append((key, tat + limit.interval))
+        
+        for key, tat in updates:
+            self._tats[key] = tat
+        self._allowed.inc()
+        self._keys_gauge.set(len(self._tats))
+        return None
+    
+    def _maybe_sweep(self, now: float):
+        """按间隔或在超出容量时清理空闲键"""
+        if len(self._tats) < self.max_keys and now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+        
+        # 仍然超出容量时淘汰最早创建的键（留出一成余量，避免每次调用都触发清理），被淘汰的调用者配额提前恢复
+        overflow = len(self._tats) - int(self.max_keys * 0.9)
+        if overflow > 0:
+            for key in list(self._tats)[:overflow]:
+                del self._tats[key]
+            self._evicted.inc(overflow)
+        self._keys_gauge.set(len(self._tats))
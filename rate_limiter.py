@@ -0,0 +1,156 @@
+# rate_limiter.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from .metrics import LIMITER_ADMITTED, LIMITER_DROPPED, LIMITER_QUEUED, LIMITER_WAIT_SECONDS, LIMITER_WAITING
+
+class RateLimitExceeded(Exception):
+    """排队已满或排队超时，请求被丢弃"""
+    pass
+
+class ApiLimiter:
+    """单个API的并发限制与令牌桶限速
+    
+    超出并发数或速率的请求进入有界等待队列，按到达顺序依次放行，
+    以平滑突发流量；只有队列已满或排队超过最长等待时间时才丢弃请求
+    """
+    
+    def __init__(self, api_name: str, limits_config: Dict[str, Any], default_queue_time: float = 30):
+        """初始化限流器
+        
+        Args:
+            api_name: API名称，用作指标标签
+            limits_config: API的 limits 配置块
+            default_queue_time: 未配置 max_queue_time 时的最长排队时间（秒）
+        """
+        self.max_concurrency = int(limits_config.get("max_concurrency", 0))
+        self.rate = float(limits_config.get("rate", 0))
+        self.burst = max(1, int(limits_config.get("burst", max(1, int(self.rate)))))
+        self.max_queue = int(limits_config.get("max_queue", 100))
+        self.max_queue_time = float(limits_config.get("max_queue_time", default_queue_time))
+        
+        # max_concurrency/rate 为0表示不限制
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        if self.max_concurrency > 0:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # 令牌桶状态，取令牌时加锁保证先到先得
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._token_lock = asyncio.Lock()
+        
+        self._waiting = 0
+        
+        # 指标子项
+        self._admitted = LIMITER_ADMITTED.labels(api_name)
+        self._queued = LIMITER_QUEUED.labels(api_name)
+        self._dropped_full = LIMITER_DROPPED.labels(api_name, "queue_full")
+        self._dropped_timeout = LIMITER_DROPPED.labels(api_name, "timeout")
+        self._wait_seconds = LIMITER_WAIT_SECONDS.labels(api_name)
+        self._waiting_gauge = LIMITER_WAITING.labels(api_name)
+        self._waiting_gauge.set(0)
+    
+    @asynccontextmanager
+    async def slot(self):
+        """获取一个请求名额，退出时归还并发名额
+        
+        Raises:
+            RateLimitExceeded: 排队已满或排队超时
+        """
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+    
+    async def acquire(self):
+        """等待并发名额和令牌
+        
+        Raises:
+            RateLimitExceeded: 排队已满或排队超时
+        """
+        if not self._must_wait():
+            await self._wait_for_slot()
+            self._admitted.inc()
+            return
+        
+        if self._waiting >= self.max_queue:
+            self._dropped_full.inc()
+            raise RateLimitExceeded(f"等待队列已满（{self.max_queue}）")
+        
+        self._waiting += 1
+        self._waiting_gauge.set(self._waiting)
+        self._queued.inc()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._wait_for_slot(), timeout=self.max_queue_time)
+        except asyncio.TimeoutError:
+            self._dropped_timeout.inc()
+            raise RateLimitExceeded(f"排队超过 {self.max_queue_time} 秒")
+        finally:
+            self._waiting -= 1
+            self._waiting_gauge.set(self._waiting)
+            self._wait_seconds.observe(time.monotonic() - started)
+        
+        self._admitted.inc()
+    
+    async def try_acquire(self) -> bool:
+        """不排队地获取一个请求名额，成功后必须调用 release()
+        
+        Returns:
+            bool: 有空闲的并发名额和令牌且没有请求在排队时为True
+        """
+        if self._must_wait():
+            return False
+        if self._semaphore is not None:
+            # 未锁定时立即返回，不会让出事件循环
+            await self._semaphore.acquire()
+        if self.rate > 0:
+            # _must_wait() 已补充令牌并确认至少有一个
+            self._tokens -= 1
+        self._admitted.inc()
+        return True
+    
+    def release(self):
+        """归还并发名额"""
+        if self._semaphore is not None:
+            self._semaphore.release()
+    
+    def _must_wait(self) -> bool:
+        """判断当前请求是否需要排队"""
+        if self._waiting > 0:
+            return True
+        if self._semaphore is not None and self._semaphore.locked():
+            return True
+        if self.rate > 0:
+            self._refill()
+            return self._tokens < 1
+        return False
+    
+    async def _wait_for_slot(self):
+        """依次获取并发名额和令牌，被取消时归还已拿到的并发名额"""
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            if self.rate > 0:
+                await self._take_token()
+        except BaseException:
+            self.release()
+            raise
+    
+    async def _take_token(self):
+        """从令牌桶取一个令牌，不足时等待补充"""
+        async with self._token_lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def _refill(self):
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
\ No newline at end of file
@@ -1,9 +1,71 @@
 # request_template_engine.py
 import re
-import json
+import time
+import codecs
+import asyncio
+import functools
 import aiohttp
-from typing import Dict, Any, Optional, Tuple, Union
+from typing import Dict, Any, AsyncIterator, Callable, Iterable, List, Mapping, Optional, Tuple, Union
 from astrbot.api import logger
+from .api_spec import ApiSpec
+from .body_template import CompiledBodyTemplate
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+from .rate_limiter import ApiLimiter, RateLimitExceeded
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .retry_policy import RetryPolicy
+from .micro_batch import MicroBatcher, MATCH_BY_ID
+from .stream_reader import iter_lines, iter_sse_events, iter_json_lines, iter_text
+from .json_path import MISSING
+from .json_stream import JsonSubtreeParser
+from .json_codec import CODEC
+from .worker_pool import RawResponse, WorkerPool
+from .metrics import (
+    REQUEST_BUILD_SECONDS, UPSTREAM_SECONDS, UPSTREAM_RETRIES, UPSTREAM_HEDGES, UPSTREAM_TIMEOUTS, RESPONSE_BYTES, BATCH_SIZE,
+    COALESCE_REQUESTS, status_class
+)
+
+class _ApiMetrics:
+    """单个API在请求路径上使用的子指标，构建引擎时创建，请求时不再按标签查找"""
+    
+    __slots__ = (
+        "api_name", "build_seconds", "response_bytes", "timeouts", "retries",
+        "hedges_sent", "hedges_won", "hedges_skipped", "batch_size", "coalesce", "_upstream_seconds"
+    )
+    
+    def __init__(self, api_name: str, spec: ApiSpec):
+        """初始化
+        
+        Args:
+            api_name: API名称
+            spec: 编译后的API配置，未启用微批时不创建批次大小指标
+        """
+        self.api_name = api_name
+        self.build_seconds = REQUEST_BUILD_SECONDS.labels(api_name)
+        self.response_bytes = RESPONSE_BYTES.labels(api_name)
+        self.timeouts = UPSTREAM_TIMEOUTS.labels(api_name)
+        self.retries = UPSTREAM_RETRIES.labels(api_name)
+        self.hedges_sent = UPSTREAM_HEDGES.labels(api_name, "sent")
+        self.hedges_won = UPSTREAM_HEDGES.labels(api_name, "won")
+        self.hedges_skipped = UPSTREAM_HEDGES.labels(api_name, "skipped")
+        self.batch_size = BATCH_SIZE.labels(api_name) if spec.batch is not None else None
+        self.coalesce = (COALESCE_REQUESTS.labels(api_name, "leader"), COALESCE_REQUESTS.labels(api_name, "coalesced"))
+        # 上游延迟按状态分类区分，只为实际出现过的分类创建子指标
+        self._upstream_seconds: Dict[str, Any] = {}
+    
+    def upstream_seconds(self, outcome: str):
+        """获取某个状态分类的上游延迟子指标
+        
+        Args:
+            outcome: 状态分类，例如 "2xx"、"timeout"
+        
+        Returns:
+            上游延迟直方图的子指标
+        """
+        child = self._upstream_seconds.get(outcome)
+        if child is None:
+            child = self._upstream_seconds[outcome] = UPSTREAM_SECONDS.labels(self.api_name, outcome)
+        return child
 
 class RequestTemplateEngine:
     """请求模板引擎：根据模板构造和发送API请求
@@ -11,218 +73,955 @@ class RequestTemplateEngine:
     负责将匹配参数应用到请求模板，构造并发送HTTP请求
     """
     
-    def __init__(self, api_configs: Dict[str, Dict[str, Any]], global_config: Dict[str, Any]):
+    def __init__(self, api_specs: Dict[str, ApiSpec], global_config: Dict[str, Any],
+                 previous: Optional["RequestTemplateEngine"] = None, offload: Optional[WorkerPool] = None):
         """初始化请求模板引擎
         
         Args:
-            api_configs: API配置字典，键为API名称
+            api_specs: 编译后的API配置，键为API名称
             global_config: 全局配置
+            previous: 热重载前的引擎，相关配置未变化的API沿用其连接池、缓存和限流/熔断状态
+            offload: 大响应的工作池，None表示始终在事件循环上解码
         """
-        self.api_configs = api_configs
+        self.api_specs = api_specs
+        self._offload = offload
+        # 原始配置只用于判断热重载时有状态组件能否沿用
+        self.api_configs = {api_name: spec.config for api_name, spec in api_specs.items()}
         self.global_config = global_config
         self.timeout = global_config.get("timeout", 30)
         self.proxy = global_config.get("proxy", None)
+        
+        # 每个API一个长连接会话，复用TCP/TLS连接和DNS缓存
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        if previous is not None:
+            for api_name, spec in api_specs.items():
+                session = previous._sessions.get(api_name)
+                old_spec = previous.api_specs.get(api_name)
+                if (session is not None and not session.closed
+                        and old_spec is not None and old_spec.timeout == spec.timeout
+                        and self._same_config(previous, api_name, ("endpoint",))
+                        and previous._get_connector_options(old_spec.config) == self._get_connector_options(spec.config)):
+                    self._sessions[api_name] = session
+        
+        # 各API请求路径上的子指标
+        self._metrics: Dict[str, _ApiMetrics] = {api_name: _ApiMetrics(api_name, spec) for api_name, spec in api_specs.items()}
+        
+        # 启用了缓存的API各自拥有一个响应缓存；缓存的是原始响应，端点不变即可沿用
+        self._caches: Dict[str, ResponseCache] = self._build_per_api(
+            previous, "_caches", ("endpoint", "cache", "incremental_json", "response"),
+            lambda api_name, api_config: (
+                ResponseCache(api_name, api_config["cache"])
+                if (api_config.get("cache") or {}).get("enabled", False) else None
+            )
+        )
+        
+        # 相同请求的并发调用合并为一次，记录各API允许合并的HTTP方法；
+        # 请求键包含URL和请求体，新旧引擎共用同一实例是安全的
+        self._single_flight = previous._single_flight if previous is not None else SingleFlight()
+        self._coalesce_methods: Dict[str, set] = {}
+        for api_name, api_config in self.api_configs.items():
+            coalesce_config = api_config.get("coalesce") or {}
+            if coalesce_config.get("enabled", True):
+                methods = coalesce_config.get("methods", ["GET", "HEAD"])
+                self._coalesce_methods[api_name] = {method.upper() for method in methods}
+        
+        # 配置了 limits 的API各自拥有并发限制和令牌桶
+        self._limiters: Dict[str, ApiLimiter] = self._build_per_api(
+            previous if previous is not None and previous.timeout == self.timeout else None,
+            "_limiters", ("limits", "timeout"),
+            lambda api_name, api_config: (
+                ApiLimiter(api_name, api_config["limits"], api_specs[api_name].timeout) if api_config.get("limits") else None
+            )
+        )
+        
+        # 启用了熔断的API各自拥有一个熔断器
+        self._breakers: Dict[str, CircuitBreaker] = self._build_per_api(
+            previous, "_breakers", ("endpoint", "circuit_breaker"),
+            lambda api_name, api_config: (
+                CircuitBreaker(api_name, api_config["circuit_breaker"])
+                if (api_config.get("circuit_breaker") or {}).get("enabled", False) else None
+            )
+        )
+        
+        # 配置了重试或对冲的API各自拥有一个重试策略
+        self._retry_policies: Dict[str, RetryPolicy] = self._build_per_api(
+            previous, "_retry_policies", ("endpoint", "retry", "hedge"),
+            lambda api_name, api_config: (
+                RetryPolicy(api_config.get("retry") or {"max_attempts": 1}, api_config.get("hedge"))
+                if api_config.get("retry") or (api_config.get("hedge") or {}).get("enabled", False) else None
+            )
+        )
+    
+        # 启用了微批的API各自拥有一个批处理器；收集中的批次属于所在引擎，不跨重载沿用
+        self._batchers: Dict[str, MicroBatcher] = {
+            api_name: MicroBatcher(spec.batch, functools.partial(self._send_batch, api_name))
+            for api_name, spec in api_specs.items()
+            if spec.batch is not None
+        }
+    
+    def _same_config(self, previous: "RequestTemplateEngine", api_name: str, keys: Tuple[str, ...]) -> bool:
+        """判断API的指定配置项在重载前后是否相同
+        
+        Args:
+            previous: 重载前的引擎
+            api_name: API名称
+            keys: 要比较的配置项
+            
+        Returns:
+            bool: 两边都存在该API且各配置项均相同
+        """
+        old_config = previous.api_configs.get(api_name)
+        new_config = self.api_configs.get(api_name)
+        if old_config is None or new_config is None:
+            return False
+        return all(old_config.get(key) == new_config.get(key) for key in keys)
+    
+    def _build_per_api(self, previous: Optional["RequestTemplateEngine"], attribute: str,
+                       keys: Tuple[str, ...], factory: Callable[[str, Dict[str, Any]], Any]) -> Dict[str, Any]:
+        """构建按API索引的组件，相关配置未变化时沿用旧引擎中的实例
+        
+        Args:
+            previous: 重载前的引擎，None表示全部新建
+            attribute: 旧引擎中对应字典的属性名
+            keys: 决定组件能否沿用的配置项
+            factory: 新建组件的函数，返回None表示该API不需要此组件
+            
+        Returns:
+            Dict[str, Any]: 按API名称索引的组件
+        """
+        reusable = getattr(previous, attribute) if previous is not None else {}
+        components = {}
+        for api_name, api_config in self.api_configs.items():
+            if api_name in reusable and self._same_config(previous, api_name, keys):
+                components[api_name] = reusable[api_name]
+                continue
+            component = factory(api_name, api_config)
+            if component is not None:
+                components[api_name] = component
+        return components
+    
+    def check_rule_paths(self, rules: Iterable[Any]) -> List[str]:
+        """检查规则的路径覆盖能否在目标API的路由表中找到对应的方法
+        
+        Args:
+            rules: 规则对象列表
+            
+        Returns:
+            List[str]: 警告信息列表，路径未命中任何 methods 配置时会隐式使用GET
+        """
+        warnings = []
+        for rule in rules:
+            path = getattr(rule, "path_override", None)
+            if not path or getattr(rule, "method_override", None):
+                continue
+            # 扇出规则逐个检查目标API
+            for api_name in getattr(rule, "api_names", [getattr(rule, "api_name", None)]):
+                spec = self.api_specs.get(api_name)
+                router = spec.method_router if spec is not None else None
+                if router is not None and not router.is_routed(path):
+                    warnings.append(f"规则 '{rule.rule_config}' 的路径 {path} 未匹配API '{api_name}' 的methods配置，将使用GET")
+        return warnings
+    
+    async def start(self):
+        """为所有已配置的API创建长连接会话
+        
+        需要在事件循环中调用（插件initialize阶段）
+        """
+        for api_name, spec in self.api_specs.items():
+            if api_name not in self._sessions:
+                self._sessions[api_name] = self._create_session(spec)
+    
+    async def close(self, keep: Iterable[aiohttp.ClientSession] = ()):
+        """关闭所有会话及其连接池
+        
+        Args:
+            keep: 不关闭的会话（热重载时已被新引擎沿用）
+        """
+        kept = {id(session) for session in keep}
+        sessions = [session for session in self._sessions.values() if id(session) not in kept]
+        self._sessions = {}
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.error(f"关闭HTTP会话失败: {str(e)}")
+    
+    def _get_connector_options(self, api_config: Dict[str, Any]) -> Dict[str, Any]:
+        """获取连接池配置
+        
+        全局 connector 配置作为默认值，API 自身的 connector 配置优先
+        
+        Args:
+            api_config: API配置
+            
+        Returns:
+            Dict: 合并后的连接池配置
+        """
+        options = dict(self.global_config.get("connector") or {})
+        options.update(api_config.get("connector") or {})
+        return options
+    
+    def _create_session(self, spec: ApiSpec) -> aiohttp.ClientSession:
+        """根据连接池配置创建会话
+        
+        Args:
+            spec: 编译后的API配置
+            
+        Returns:
+            aiohttp.ClientSession: 新建的会话
+        """
+        options = self._get_connector_options(spec.config)
+        connector = aiohttp.TCPConnector(
+            limit=int(options.get("limit", 100)),
+            limit_per_host=int(options.get("limit_per_host", 0)),
+            keepalive_timeout=float(options.get("keepalive_timeout", 30)),
+            ttl_dns_cache=int(options.get("dns_cache_ttl", 300))
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=spec.timeout)
+        )
     
-    async def send_request(self, api_name: str, match_params: Dict[str, Any]) -> Tuple[bool, Any]:
+    def sessions(self) -> List[aiohttp.ClientSession]:
+        """获取当前持有的所有会话
+        
+        Returns:
+            List[aiohttp.ClientSession]: 会话列表
+        """
+        return list(self._sessions.values())
+    
+    def _get_session(self, api_name: str) -> aiohttp.ClientSession:
+        """获取API对应的会话，不存在或已关闭时重新创建
+        
+        Args:
+            api_name: API名称
+            
+        Returns:
+            aiohttp.ClientSession: 可用的会话
+        """
+        session = self._sessions.get(api_name)
+        if session is None or session.closed:
+            session = self._create_session(self.api_specs[api_name])
+            self._sessions[api_name] = session
+        return session
+    
+    async def send_request(self, api_name: str, match_params: Dict[str, Any], keep_raw: bool = False,
+                           exclusive: bool = False) -> Tuple[bool, Any]:
         """发送API请求
         
         Args:
             api_name: 目标API名称
             match_params: 匹配参数
+            keep_raw: 超过卸载阈值的响应是否以 RawResponse 返回，由调用方在工作池中解码和格式化
+            exclusive: 不经过响应缓存、请求合并和微批，每次调用单独请求上游；用于有副作用的请求（如提交异步任务）
             
         Returns:
             Tuple[bool, Any]: 请求是否成功和响应数据
         """
         # 获取API配置
-        api_config = self.api_configs.get(api_name)
-        if not api_config:
+        spec = self.api_specs.get(api_name)
+        if spec is None:
             logger.error(f"API配置不存在: {api_name}")
             return False, {"error": f"API配置不存在: {api_name}"}
         
         # 构造请求参数
+        started = time.perf_counter()
         try:
-            url, method, headers, data = self._build_request_params(api_config, match_params)
+            url, method, headers, data = self._build_request_params(spec, match_params)
         except Exception as e:
             logger.error(f"构造请求参数失败: {str(e)}")
             return False, {"error": f"构造请求参数失败: {str(e)}"}
+        self._metrics[api_name].build_seconds.observe(time.perf_counter() - started)
+        
+        cache = self._caches.get(api_name)
+        use_cache = not exclusive and cache is not None and cache.is_cacheable(method)
+        coalesce = not exclusive and method.upper() in self._coalesce_methods.get(api_name, ())
+        request_key = None
+        if use_cache or coalesce:
+            request_key = ResponseCache.make_key(api_name, method, url, data)
+        
+        # 查找响应缓存，命中时不再发送请求
+        if use_cache:
+            hit, cached = cache.get(request_key)
+            if hit:
+                return True, cached if keep_raw else await self._resolve(cached)
+        
+        # 独占请求不合并；没有配置批量接口方法时，GET 等无请求体的单条请求也不合并，逐条发送
+        batcher = self._batchers.get(api_name)
+        if batcher is not None and (exclusive or not spec.batch.applies_to(method)):
+            batcher = None
+        
+        async def _fetch() -> Tuple[bool, Any]:
+            # 发送请求
+            try:
+                if batcher is not None:
+                    # 与其他并发请求合并为一次批量调用
+                    success, result = await self._submit_batch(batcher, spec, url, method, match_params, data)
+                else:
+                    success, result = await self._dispatch(
+                        api_name, url, method, headers, data,
+                        allow_retry=bool(match_params.get("allow_retry"))
+                    )
+            except RateLimitExceeded as e:
+                logger.warning(f"API '{api_name}' 请求被限流丢弃: {str(e)}")
+                return False, {"error": "请求过于频繁，请稍后再试"}
+            except CircuitOpenError:
+                return False, {"error": "上游服务暂时不可用", "circuit_open": True}
+            except Exception as e:
+                logger.error(f"发送请求失败: {str(e)}")
+                return False, {"error": f"发送请求失败: {str(e)}"}
+            
+            # 只缓存成功的响应
+            if success and use_cache:
+                cache.put(request_key, result)
+            
+            return success, result
+        
+        # 已有相同请求在进行中时等待其结果
+        if coalesce:
+            success, result = await self._single_flight.do(request_key, _fetch, self._metrics[api_name].coalesce)
+        else:
+            success, result = await _fetch()
+        
+        # 缓存和合并的是原始响应，按调用方需要再解码
+        if success and not keep_raw:
+            result = await self._resolve(result)
+        return success, result
+    
+    async def _resolve(self, result: Any) -> Any:
+        """在工作池中解码尚未解码的大响应
+        
+        Args:
+            result: 响应数据
+            
+        Returns:
+            Any: 解码后的响应数据
+        """
+        if isinstance(result, RawResponse):
+            return await self._offload.decode(result)
+        return result
+    
+    async def _submit_batch(self, batcher: MicroBatcher, spec: ApiSpec, url: str, method: str,
+                            match_params: Dict[str, Any], data: Any) -> Tuple[bool, Any]:
+        """把单条请求加入批次并等待拆分后的结果
         
-        # 发送请求
+        Args:
+            batcher: API的批处理器
+            spec: 编译后的API配置
+            url: 单条请求的URL
+            method: 单条请求的HTTP方法
+            match_params: 匹配参数，按ID拆分时用于重新渲染带 batch_id 的请求体
+            data: 单条请求的请求体
+            
+        Returns:
+            Tuple[bool, Any]: 该条请求的结果
+        """
+        config = spec.batch
+        if config.path:
+            url = f"{spec.endpoint}/{config.path.lstrip('/')}"
+        # 只有目标URL和方法都相同的请求才合并
+        return await batcher.submit((url, config.method or method), (match_params, data))
+    
+    async def _send_batch(self, api_name: str, key: Tuple[str, str], items: List[Tuple[Dict[str, Any], Any]]) -> List[Tuple[bool, Any]]:
+        """发送一个批次并拆分响应
+        
+        Args:
+            api_name: API名称
+            key: 批次键 (url, method)
+            items: 各条请求的 (匹配参数, 请求体)
+            
+        Returns:
+            List[Tuple[bool, Any]]: 与条目顺序对应的结果
+        """
+        spec = self.api_specs[api_name]
+        config = spec.batch
+        url, method = key
+        
+        if config.match_by == MATCH_BY_ID and spec.body_template is not None:
+            # 条目在批次中的序号作为 batch_id，上游在结果中原样返回
+            bodies = [
+                self._apply_template(spec.body_template, dict(params, batch_id=str(index)))
+                for index, (params, _) in enumerate(items)
+            ]
+        else:
+            bodies = [data for _, data in items]
+        body = config.body_template.render({"items": bodies}) if config.body_template is not None else bodies
+        
+        self._metrics[api_name].batch_size.observe(len(items))
+        success, result = await self._dispatch(api_name, url, method, spec.headers, body)
+        if not success:
+            return [(success, result)] * len(items)
+        result = await self._resolve(result)
+        return config.split(result, len(items))
+    
+    def is_streaming(self, api_name: str) -> bool:
+        """判断API是否启用了流式响应
+        
+        Args:
+            api_name: API名称
+            
+        Returns:
+            bool: 是否流式
+        """
+        spec = self.api_specs.get(api_name)
+        return spec is not None and spec.stream is not None
+    
+    def is_async_job(self, api_name: str) -> bool:
+        """判断API是否启用了异步任务模式
+        
+        Args:
+            api_name: API名称
+        
+        Returns:
+            bool: 是否异步任务
+        """
+        spec = self.api_specs.get(api_name)
+        return spec is not None and spec.async_job is not None
+    
+    async def fetch(self, api_name: str, method: str, url: str, data: Any = None) -> Tuple[bool, Any]:
+        """使用API的连接池、请求头、熔断和限流直接请求给定URL，用于异步任务的状态查询
+        
+        不经过请求模板、缓存和合并
+        
+        Args:
+            api_name: API名称
+            method: HTTP方法
+            url: 完整URL
+            data: 请求数据
+        
+        Returns:
+            Tuple[bool, Any]: 请求是否成功和响应数据
+        """
+        spec = self.api_specs.get(api_name)
+        if spec is None:
+            return False, {"error": f"API配置不存在: {api_name}"}
         try:
-            return await self._do_request(url, method, headers, data)
+            success, result = await self._dispatch(api_name, url, method, spec.headers, data)
+            return success, await self._resolve(result)
+        except RateLimitExceeded:
+            return False, {"error": "请求过于频繁，请稍后再试"}
+        except CircuitOpenError:
+            return False, {"error": "上游服务暂时不可用", "circuit_open": True}
         except Exception as e:
             logger.error(f"发送请求失败: {str(e)}")
             return False, {"error": f"发送请求失败: {str(e)}"}
     
-    def _build_request_params(self, api_config: Dict[str, Any], match_params: Dict[str, Any]) -> Tuple[str, str, Dict[str, str], Optional[Union[Dict[str, Any], str]]]:
+    async def stream_request(self, api_name: str, match_params: Dict[str, Any]) -> AsyncIterator[Tuple[bool, Any]]:
+        """发送请求并逐个产出流式响应中的事件
+        
+        支持 Server-Sent Events、按行分隔的JSON和纯文本分块三种格式；
+        流式请求不经过缓存、合并和重试，但仍受熔断和限流控制
+        
+        Args:
+            api_name: 目标API名称
+            match_params: 匹配参数
+            
+        Returns:
+            AsyncIterator[Tuple[bool, Any]]: (是否成功, 事件数据)，失败时只产出一个错误
+        """
+        spec = self.api_specs.get(api_name)
+        if spec is None:
+            logger.error(f"API配置不存在: {api_name}")
+            yield False, {"error": f"API配置不存在: {api_name}"}
+            return
+        
+        started = time.perf_counter()
+        try:
+            url, method, headers, data = self._build_request_params(spec, match_params)
+        except Exception as e:
+            logger.error(f"构造请求参数失败: {str(e)}")
+            yield False, {"error": f"构造请求参数失败: {str(e)}"}
+            return
+        self._metrics[api_name].build_seconds.observe(time.perf_counter() - started)
+        
+        stream_config = spec.stream or {}
+        breaker = self._breakers.get(api_name)
+        if breaker is not None and not breaker.allow_request():
+            yield False, {"error": "上游服务暂时不可用", "circuit_open": True}
+            return
+        
+        # 流式响应总时长不设上限，只限制连接时间和两次读取之间的间隔
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=spec.timeout,
+            sock_read=float(stream_config.get("read_timeout", spec.timeout))
+        )
+        kwargs = self._build_request_kwargs(headers, data, timeout)
+        
+        recorded = False
+        started = time.monotonic()
+        limiter = self._limiters.get(api_name)
+        try:
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                started = time.monotonic()
+                async with self._get_session(api_name).request(method, url, **kwargs) as response:
+                    if response.status >= 400:
+                        body = await response.text()
+                        if breaker is not None:
+                            breaker.record(response.status >= 500 or response.status == 429, time.monotonic() - started)
+                            recorded = True
+                        yield False, {"status_code": response.status, "error": "请求失败", "response": body}
+                        return
+                    
+                    # 连接建立成功即视为上游可用
+                    if breaker is not None:
+                        breaker.record(False, time.monotonic() - started)
+                        recorded = True
+                    
+                    async for event in self._iter_stream_events(response, stream_config):
+                        yield True, event
+            finally:
+                if limiter is not None:
+                    limiter.release()
+        except RateLimitExceeded as e:
+            logger.warning(f"API '{api_name}' 请求被限流丢弃: {str(e)}")
+            yield False, {"error": "请求过于频繁，请稍后再试"}
+        except asyncio.TimeoutError:
+            if breaker is not None and not recorded:
+                breaker.record(True, time.monotonic() - started)
+                recorded = True
+            yield False, {"error": "请求超时", "error_type": "timeout"}
+        except aiohttp.ClientError as e:
+            if breaker is not None and not recorded:
+                breaker.record(True, time.monotonic() - started)
+                recorded = True
+            yield False, {"error": str(e), "error_type": "connection"}
+        finally:
+            if breaker is not None and not recorded:
+                breaker.release()
+    
+    def _iter_stream_events(self, response: aiohttp.ClientResponse, stream_config: Dict[str, Any]) -> AsyncIterator[Any]:
+        """按配置或响应类型选择流解析方式
+        
+        Args:
+            response: 响应对象
+            stream_config: API的 stream 配置块
+            
+        Returns:
+            AsyncIterator[Any]: 事件数据
+        """
+        stream_format = stream_config.get("format", "auto")
+        if stream_format == "auto":
+            content_type = response.headers.get("Content-Type", "")
+            if "text/event-stream" in content_type:
+                stream_format = "sse"
+            elif "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+                stream_format = "ndjson"
+            else:
+                stream_format = "text"
+        
+        chunks = response.content.iter_any()
+        if stream_format == "sse":
+            return iter_sse_events(iter_lines(chunks), stream_config.get("done_marker", "[DONE]"))
+        if stream_format == "ndjson":
+            return iter_json_lines(iter_lines(chunks))
+        return iter_text(chunks)
+    
+    async def _dispatch(self, api_name: str, url: str, method: str, headers: Mapping[str, str], data: Optional[Union[Dict[str, Any], str]], allow_retry: bool = False) -> Tuple[bool, Any]:
+        """在熔断和限流控制下执行请求
+        
+        Args:
+            api_name: API名称
+            url: 请求URL
+            method: HTTP方法
+            headers: 请求头
+            data: 请求数据
+            allow_retry: 规则是否允许重试非幂等方法
+            
+        Returns:
+            Tuple[bool, Any]: 请求是否成功和响应数据
+            
+        Raises:
+            CircuitOpenError: 熔断器打开，请求被直接拒绝
+            RateLimitExceeded: 排队已满或排队超时
+        """
+        breaker = self._breakers.get(api_name)
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitOpenError(f"API '{api_name}' 熔断中")
+        
+        recorded = False
+        
+        async def _call() -> Tuple[bool, Any]:
+            nonlocal recorded
+            started = time.monotonic()
+            success, result = await self._request_with_retries(api_name, url, method, headers, data, allow_retry)
+            if breaker is not None:
+                breaker.record(self._is_upstream_failure(success, result), time.monotonic() - started)
+                recorded = True
+            return success, result
+        
+        try:
+            limiter = self._limiters.get(api_name)
+            if limiter is None:
+                return await _call()
+            async with limiter.slot():
+                return await _call()
+        finally:
+            # 请求被取消或在排队时丢弃，没有可记录的结果
+            if breaker is not None and not recorded:
+                breaker.release()
+    
+    async def _request_with_retries(self, api_name: str, url: str, method: str, headers: Mapping[str, str], data: Optional[Union[Dict[str, Any], str]], allow_retry: bool) -> Tuple[bool, Any]:
+        """按API的重试策略执行请求
+        
+        所有尝试和退避等待共享全局超时作为截止时间
+        
+        Args:
+            api_name: API名称
+            url: 请求URL
+            method: HTTP方法
+            headers: 请求头
+            data: 请求数据
+            allow_retry: 规则是否允许重试非幂等方法
+            
+        Returns:
+            Tuple[bool, Any]: 最后一次尝试的结果
+        """
+        policy = self._retry_policies.get(api_name)
+        if policy is None or not policy.allows_method(method, allow_retry):
+            return await self._do_request(api_name, url, method, headers, data)
+        
+        deadline = time.monotonic() + self.api_specs[api_name].timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            success, result = await self._attempt(policy, api_name, url, method, headers, data, deadline)
+            if success or attempt >= policy.max_attempts or not policy.is_retryable(result):
+                return success, result
+            
+            delay = policy.backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                return success, result
+            
+            self._metrics[api_name].retries.inc()
+            logger.info(f"API '{api_name}' 第 {attempt} 次请求失败，{delay:.2f} 秒后重试")
+            await asyncio.sleep(delay)
+    
+    async def _attempt(self, policy: RetryPolicy, api_name: str, url: str, method: str, headers: Mapping[str, str], data: Optional[Union[Dict[str, Any], str]], deadline: float) -> Tuple[bool, Any]:
+        """执行一次尝试，启用对冲时在延迟超过阈值后补发一个相同请求
+        
+        Args:
+            policy: 重试策略
+            api_name: API名称
+            url: 请求URL
+            method: HTTP方法
+            headers: 请求头
+            data: 请求数据
+            deadline: 截止时间（time.monotonic）
+            
+        Returns:
+            Tuple[bool, Any]: 先成功返回的结果，全部失败时为最后一个失败结果
+        """
+        started = time.monotonic()
+        remaining = deadline - started
+        hedge_delay = policy.hedge_delay()
+        
+        if hedge_delay is None or hedge_delay >= remaining:
+            success, result = await self._do_request(api_name, url, method, headers, data, timeout=remaining)
+            if success:
+                policy.record_latency(time.monotonic() - started)
+            return success, result
+        
+        metrics = self._metrics[api_name]
+        primary = asyncio.ensure_future(self._do_request(api_name, url, method, headers, data, timeout=remaining))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                success, result = primary.result()
+                if success:
+                    policy.record_latency(time.monotonic() - started)
+                return success, result
+            
+            # 对冲请求另占一个限流名额，没有空闲名额时不对冲，继续等待原请求
+            limiter = self._limiters.get(api_name)
+            if limiter is not None and not await limiter.try_acquire():
+                metrics.hedges_skipped.inc()
+                success, result = await primary
+                if success:
+                    policy.record_latency(time.monotonic() - started)
+                return success, result
+            
+            async def _hedge_request() -> Tuple[bool, Any]:
+                try:
+                    return await self._do_request(api_name, url, method, headers, data, timeout=deadline - time.monotonic())
+                finally:
+                    if limiter is not None:
+                        limiter.release()
+            
+            # 超过对冲阈值仍未返回，补发一个相同请求
+            metrics.hedges_sent.inc()
+            hedge = asyncio.ensure_future(_hedge_request())
+            tasks.add(hedge)
+            pending = set(tasks)
+            last_failure: Tuple[bool, Any] = (False, {"error": "请求失败"})
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    success, result = task.result()
+                    if success:
+                        policy.record_latency(time.monotonic() - started)
+                        if task is hedge:
+                            metrics.hedges_won.inc()
+                        return success, result
+                    last_failure = (success, result)
+            return last_failure
+        finally:
+            # 取消落后的请求
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @staticmethod
+    def _is_upstream_failure(success: bool, result: Any) -> bool:
+        """判断请求结果是否属于上游故障
+        
+        连接错误、超时、429和5xx视为上游故障，其余4xx属于请求本身的问题
+        
+        Args:
+            success: 请求是否成功
+            result: 响应数据
+            
+        Returns:
+            bool: 是否为上游故障
+        """
+        if success:
+            return False
+        status_code = result.get("status_code") if isinstance(result, dict) else None
+        if status_code is None:
+            return True
+        return status_code >= 500 or status_code == 429
+    
+    def _build_request_params(self, spec: ApiSpec, match_params: Dict[str, Any]) -> Tuple[str, str, Mapping[str, str], Optional[Union[Dict[str, Any], str]]]:
         """构造请求参数
         
         Args:
-            api_config: API配置
+            spec: 编译后的API配置
             match_params: 匹配参数
             
         Returns:
             Tuple: (url, method, headers, data)
         """
         # 获取基础URL
-        base_url = api_config.get("endpoint", "")
+        base_url = spec.endpoint
         if not base_url:
             raise ValueError("API配置缺少endpoint")
         
         # 构造路径
-        path = match_params.get("path_override") or ""
+        path_template = match_params.get("path_override") or ""
+        path = path_template
         # 替换路径中的参数占位符
         for key, value in match_params.items():
             if key.startswith("$"):
                 path = path.replace(f"{{{key}}}", str(value))
         
         # 构造完整URL
-        url = f"{base_url.rstrip('/')}/{path.lstrip('/')}"
+        url = f"{base_url}/{path.lstrip('/')}"
         
         # 确定HTTP方法
         method = match_params.get("method_override")
         if not method:
-            # 查找匹配的方法配置
-            method = self._determine_http_method(api_config, path)
+            # 按路径模板查找路由表，结果按模板缓存
+            method = self._determine_http_method(spec, path_template)
         
-        # 获取默认请求头
-        headers = api_config.get("headers", {}).copy()
+        # 默认请求头在加载时已构建为只读映射，直接复用
+        headers = spec.headers
         
         # 构造请求体
         data = None
         if method in ["POST", "PUT", "PATCH"]:
             # 如果配置了预处理模板
-            preprocess = api_config.get("preprocess", {})
-            if preprocess.get("enabled", False) and "template" in preprocess:
-                template = preprocess["template"]
-                if "body" in template:
-                    data = self._apply_template(template["body"], match_params)
+            template = spec.body_template
+            if template is not None:
+                data = self._apply_template(template, match_params)
         
         return url, method, headers, data
     
-    def _determine_http_method(self, api_config: Dict[str, Any], path: str) -> str:
+    def _determine_http_method(self, spec: ApiSpec, path_template: str) -> str:
         """确定HTTP请求方法
         
-        根据路径和API配置确定使用的HTTP方法
+        根据路径模板在API的路由表中查找使用的HTTP方法
         
         Args:
-            api_config: API配置
-            path: 请求路径
+            spec: 编译后的API配置
+            path_template: 替换参数前的请求路径
             
         Returns:
             str: HTTP方法
         """
-        methods = api_config.get("methods", {})
-        if not methods:
+        router = spec.method_router
+        if router is None:
             return "GET"  # 默认使用GET
+        return router.resolve(path_template)
+    
+    def _apply_template(self, template: CompiledBodyTemplate, params: Dict[str, Any]) -> Dict[str, Any]:
+        """将参数应用到模板
         
-        if isinstance(methods, str):
-            return methods  # 如果methods直接是字符串
+        Args:
+            template: 预编译的请求体模板
+            params: 参数字典
+            
+        Returns:
+            Dict: 填充参数后的模板
+        """
+        return template.render(params)
+    
+    async def _read_response(self, api_name: str, response: aiohttp.ClientResponse) -> Tuple[bool, Any]:
+        """分块读取响应体，超过大小上限时立即停止
         
-        # 查找最匹配的路径配置
-        path_parts = path.strip("/").split("/")
-        current_config = methods
+        启用增量JSON解析时只保留提取路径指向的子树，找到后不再读取剩余内容
         
-        for part in path_parts:
-            if not part:
-                continue
-                
-            if isinstance(current_config, str):
-                return current_config
-                
-            if part in current_config:
-                current_config = current_config[part]
-            elif "DEFAULT" in current_config:
-                current_config = current_config["DEFAULT"]
-            else:
-                break
+        Args:
+            api_name: API名称
+            response: 响应对象
+            
+        Returns:
+            Tuple[bool, Any]: 是否超过大小上限和解析后的响应数据
+        """
+        spec = self.api_specs[api_name]
+        max_bytes = spec.max_response_bytes
+        if max_bytes and response.content_length is not None and response.content_length > max_bytes:
+            return True, None
+        
+        is_json = "json" in (response.content_type or "")
+        charset = response.charset or "utf-8"
         
-        # 返回找到的方法或默认方法
-        if isinstance(current_config, str):
-            return current_config
-        return current_config.get("DEFAULT", "GET")
+        # 选择增量解析的提取路径
+        parser = None
+        if spec.incremental_json and is_json and response.status < 400:
+            found, path = spec.extract_paths.select(response.status)
+            if found and path is not None and path.is_streamable:
+                parser = JsonSubtreeParser(path)
+        
+        total = 0
+        if parser is not None:
+            decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+            async for chunk in response.content.iter_any():
+                total += len(chunk)
+                if max_bytes and total > max_bytes:
+                    return True, None
+                if parser.feed(decoder.decode(chunk)):
+                    break
+            self._metrics[api_name].response_bytes.observe(total)
+            result = parser.result()
+            # 还原为只包含提取路径的最小结构，格式化时按原路径提取；未找到时为空字典
+            return False, parser.path.wrap(result) if result is not MISSING else {}
+        
+        chunks = []
+        async for chunk in response.content.iter_any():
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                return True, None
+            chunks.append(chunk)
+        body = b"".join(chunks)
+        self._metrics[api_name].response_bytes.observe(total)
+        
+        # 尝试解析JSON响应，UTF-8响应直接从字节串解码，不经过中间字符串
+        if is_json:
+            # 超过卸载阈值的成功响应保留字节串，解码、提取和格式化在工作池中进行
+            if self._offload is not None and response.status < 400 and self._offload.should_offload(total):
+                return False, RawResponse(body, charset)
+            try:
+                if charset.lower() in ("utf-8", "utf8"):
+                    return False, CODEC.loads(body)
+                return False, CODEC.loads(body.decode(charset, errors="replace"))
+            except ValueError:
+                pass
+        
+        # 如果不是JSON，获取文本
+        return False, body.decode(charset, errors="replace")
     
-    def _apply_template(self, template: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
-        """将参数应用到模板
+    def _build_request_kwargs(self, headers: Mapping[str, str], data: Optional[Union[Dict[str, Any], str]], timeout: Optional[aiohttp.ClientTimeout] = None) -> Dict[str, Any]:
+        """构造 session.request 的关键字参数
         
         Args:
-            template: 模板字典
-            params: 参数字典
+            headers: 请求头
+            data: 请求数据
+            timeout: 超时设置，None表示使用会话上配置的超时
             
         Returns:
-            Dict: 填充参数后的模板
+            Dict: 请求关键字参数
         """
-        result = {}
-        
-        def _process_value(value):
-            if isinstance(value, str):
-                # 替换字符串中的参数引用
-                for param_key, param_value in params.items():
-                    value = value.replace(param_key, str(param_value))
-                return value
-            elif isinstance(value, dict):
-                return _process_dict(value)
-            elif isinstance(value, list):
-                return [_process_value(item) for item in value]
-            return value
-        
-        def _process_dict(template_dict):
-            result_dict = {}
-            for key, value in template_dict.items():
-                result_dict[key] = _process_value(value)
-            return result_dict
-        
-        return _process_dict(template)
-    
-    async def _do_request(self, url: str, method: str, headers: Dict[str, str], data: Optional[Union[Dict[str, Any], str]]) -> Tuple[bool, Any]:
+        kwargs = {
+            "headers": headers
+        }
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        
+        # 添加代理配置
+        if self.proxy:
+            kwargs["proxy"] = self.proxy
+        
+        # 添加请求数据
+        if data:
+            if isinstance(data, (dict, list)):
+                # 如果是字典或列表，序列化为JSON，请求头中没有Content-Type时补充
+                kwargs["data"] = CODEC.dumps(data)
+                if not any(key.lower() == "content-type" for key in headers):
+                    kwargs["headers"] = {**headers, "Content-Type": "application/json"}
+            else:
+                # 否则作为普通数据
+                kwargs["data"] = data
+        
+        return kwargs
+    
+    async def _do_request(self, api_name: str, url: str, method: str, headers: Mapping[str, str], data: Optional[Union[Dict[str, Any], str]], timeout: Optional[float] = None) -> Tuple[bool, Any]:
         """执行HTTP请求
         
         Args:
+            api_name: API名称，用于选择连接池
             url: 请求URL
             method: HTTP方法
             headers: 请求头
             data: 请求数据
+            timeout: 本次请求的超时时间（秒），None表示使用会话的全局超时
             
         Returns:
             Tuple[bool, Any]: 请求是否成功和响应数据
         """
-        async with aiohttp.ClientSession() as session:
-            try:
-                # 准备请求参数
-                kwargs = {
-                    "headers": headers,
-                    "timeout": aiohttp.ClientTimeout(total=self.timeout)
-                }
+        session = self._get_session(api_name)
+        metrics = self._metrics[api_name]
+        started = time.perf_counter()
+        # 延迟指标的状态分类，未收到响应时为 error
+        outcome = "error"
+        try:
+            # 准备请求参数（未指定时使用会话上配置的超时）
+            request_timeout = None
+            if timeout is not None:
+                request_timeout = aiohttp.ClientTimeout(total=max(timeout, 0.001))
+            kwargs = self._build_request_kwargs(headers, data, request_timeout)
+            
+            # 发送请求
+            async with session.request(method, url, **kwargs) as response:
+                outcome = status_class(response.status)
                 
-                # 添加代理配置
-                if self.proxy:
-                    kwargs["proxy"] = self.proxy
+                # 在大小上限内读取并解析响应
+                too_large, result = await self._read_response(api_name, response)
+                if too_large:
+                    return False, {
+                        "status_code": response.status,
+                        "error": f"响应超过大小上限 {self.api_specs[api_name].max_response_bytes} 字节",
+                        "error_type": "too_large"
+                    }
                 
-                # 添加请求数据
-                if data:
-                    if isinstance(data, dict):
-                        # 如果是字典，序列化为JSON
-                        kwargs["json"] = data
-                    else:
-                        # 否则作为普通数据
-                        kwargs["data"] = data
+                # 检查响应状态
+                if response.status >= 400:
+                    return False, {
+                        "status_code": response.status,
+                        "error": "请求失败",
+                        "response": result
+                    }
                 
-                # 发送请求
-                async with session.request(method, url, **kwargs) as response:
-                    # 尝试解析JSON响应
-                    try:
-                        result = await response.json()
-                    except:
-                        # 如果不是JSON，获取文本
-                        result = await response.text()
-                    
-                    # 检查响应状态
-                    if response.status >= 400:
-                        return False, {
-                            "status_code": response.status,
-                            "error": "请求失败",
-                            "response": result
-                        }
-                    
-                    return True, result
-            except Exception as e:
-                return False, {"error": str(e)}
\ No newline at end of file
+                return True, result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            metrics.timeouts.inc()
+            return False, {"error": "请求超时", "error_type": "timeout"}
+        except aiohttp.ClientConnectionError as e:
+            return False, {"error": str(e), "error_type": "connection"}
+        except Exception as e:
+            return False, {"error": str(e)}
+        finally:
+            metrics.upstream_seconds(outcome).observe(time.perf_counter() - started)
\ No newline at end of file
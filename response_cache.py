@@ -0,0 +1,157 @@
+# response_cache.py
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+from .json_codec import CODEC
+from .metrics import CACHE_BYTES, CACHE_ENTRIES, CACHE_EVICTIONS, CACHE_LOOKUPS
+from .worker_pool import RawResponse
+
+def estimate_size(value: Any) -> int:
+    """估算响应数据占用的字节数（序列化后的长度）
+    
+    Args:
+        value: 响应数据
+    
+    Returns:
+        int: 估算的字节数
+    """
+    if isinstance(value, (bytes, bytearray, RawResponse)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(CODEC.dumps(value))
+    except (TypeError, ValueError):
+        return len(str(value).encode("utf-8"))
+
+class ResponseCache:
+    """响应缓存：带TTL的LRU缓存，用于幂等API调用
+    
+    以 (API名称, HTTP方法, 最终URL, 请求体哈希) 为键，缓存成功的响应数据，
+    同时限制条目数量和估算的字节数，超出预算时按最近最少使用顺序淘汰
+    """
+    
+    def __init__(self, api_name: str, cache_config: Dict[str, Any]):
+        """初始化缓存
+        
+        Args:
+            api_name: API名称，用作指标标签
+            cache_config: API的 cache 配置块
+        """
+        self.ttl = float(cache_config.get("ttl", 60))
+        self.max_entries = int(cache_config.get("max_entries", 256))
+        self.max_bytes = int(cache_config.get("max_bytes", 4 * 1024 * 1024))
+        self.methods = {method.upper() for method in cache_config.get("methods", ["GET", "HEAD"])}
+        
+        # 键 -> (过期时间, 字节数, 响应数据)，按访问顺序排列
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        
+        # 指标子项
+        self._hits = CACHE_LOOKUPS.labels(api_name, "hit")
+        self._misses = CACHE_LOOKUPS.labels(api_name, "miss")
+        self._evictions = CACHE_EVICTIONS.labels(api_name)
+        self._entries_gauge = CACHE_ENTRIES.labels(api_name)
+        self._bytes_gauge = CACHE_BYTES.labels(api_name)
+        self._update_gauges()
+    
+    def is_cacheable(self, method: str) -> bool:
+        """判断该HTTP方法的请求是否可以缓存
+        
+        Args:
+            method: HTTP方法
+        
+        Returns:
+            bool: 是否可缓存
+        """
+        return method.upper() in self.methods
+    
+    @staticmethod
+    def make_key(api_name: str, method: str, url: str, data: Optional[Union[Dict[str, Any], str]]) -> Tuple:
+        """构造缓存键
+        
+        Args:
+            api_name: API名称
+            method: HTTP方法
+            url: 最终请求URL
+            data: 请求体
+        
+        Returns:
+            Tuple: 缓存键
+        """
+        if data is None:
+            body_hash = ""
+        else:
+            if isinstance(data, (dict, list)):
+                # 规范化序列化，保证键顺序不同的等价请求体哈希相同
+                body = CODEC.dumps(data, sort_keys=True)
+            else:
+                body = str(data).encode("utf-8")
+            body_hash = hashlib.sha1(body).hexdigest()
+        return (api_name, method.upper(), url, body_hash)
+    
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """查找缓存
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            Tuple[bool, Any]: 是否命中和缓存的响应数据
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses.inc()
+            return False, None
+        
+        if entry[0] <= time.monotonic():
+            # 已过期
+            self._remove(key)
+            self._update_gauges()
+            self._misses.inc()
+            return False, None
+        
+        self._entries.move_to_end(key)
+        self._hits.inc()
+        return True, entry[2]
+    
+    def put(self, key: Tuple, value: Any):
+        """写入缓存
+        
+        Args:
+            key: 缓存键
+            value: 响应数据
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # 单条超过总预算，不缓存
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._evictions.inc()
+        self._update_gauges()
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._bytes = 0
+        self._update_gauges()
+    
+    def _update_gauges(self):
+        """更新条目数和字节数指标"""
+        self._entries_gauge.set(len(self._entries))
+        self._bytes_gauge.set(self._bytes)
+    
+    def _remove(self, key: Tuple):
+        """删除条目并更新字节数"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
@@ -1,8 +1,17 @@
 # response_formatter.py
-import json
 import re
-from typing import Dict, Any, List, Optional, Union
+import asyncio
+import time
+from collections.abc import Iterator
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
 from astrbot.api import logger
+from .api_spec import ApiSpec
+from .json_path import CompiledJsonPath, MISSING
+from .json_codec import CODEC
+from .stream_reader import SENTENCE_ENDINGS, StreamFlusher
+from .output_pager import OutputPager, iter_pretty_json, iter_pretty_json_array
+from .worker_pool import MODE_PROCESS, RawResponse, WorkerPool, decode_json
+from .metrics import FORMAT_SECONDS
 
 class ResponseFormatter:
     """响应格式化器：处理API响应并格式化输出
@@ -10,13 +19,16 @@ class ResponseFormatter:
     负责根据API配置处理和格式化响应数据
     """
     
-    def __init__(self, api_configs: Dict[str, Dict[str, Any]]):
+    def __init__(self, api_specs: Dict[str, ApiSpec], offload: Optional[WorkerPool] = None):
         """初始化响应格式化器
         
         Args:
-            api_configs: API配置字典，键为API名称
+            api_specs: 编译后的API配置，键为API名称；提取路径和格式化模板在编译时已解析
+            offload: 大响应的工作池，None表示在当前线程格式化
         """
-        self.api_configs = api_configs
+        self.api_specs = api_specs
+        self._offload = offload
+        self._format_seconds = {api_name: FORMAT_SECONDS.labels(api_name) for api_name in api_specs}
     
     def format_response(self, api_name: str, success: bool, response_data: Any, status_code: int = 200) -> str:
         """格式化API响应
@@ -30,17 +42,210 @@ class ResponseFormatter:
         Returns:
             str: 格式化后的响应文本
         """
-        if not success:
-            return self._format_error(response_data)
+        started = time.perf_counter()
+        try:
+            text, extracted_data = self._prepare(api_name, success, response_data, status_code)
+            if text is not None:
+                return text
+            
+            # 格式化输出
+            return self._apply_format_template(api_name, extracted_data)
+        finally:
+            self._observe_format(api_name, started)
+    
+    def paginate(self, api_name: str, success: bool, response_data: Any, status_code: int = 200) -> OutputPager:
+        """格式化API响应并按API的输出预算分页
+        
+        没有格式化模板时逐段序列化JSON，只生成取到的页面所需的部分；多值提取路径的结果也逐个惰性求值
         
+        Args:
+            api_name: API名称
+            success: 请求是否成功
+            response_data: 响应数据
+            status_code: HTTP状态码
+            
+        Returns:
+            OutputPager: 分页器，未配置输出预算时只有一页
+        """
+        spec = self.api_specs.get(api_name)
+        budget = spec.output_budget if spec is not None else None
+        if budget is None:
+            return OutputPager((self.format_response(api_name, success, response_data, status_code),))
+        
+        started = time.perf_counter()
+        try:
+            text, extracted_data = self._prepare(
+                api_name, success, response_data, status_code, lazy=spec.format_template is None
+            )
+            if text is not None:
+                return OutputPager((text,), budget)
+            if isinstance(extracted_data, Iterator):
+                # 惰性遍历的匹配结果引用整个响应
+                return OutputPager(iter_pretty_json_array(extracted_data), budget, response_data)
+            if spec.format_template is not None or isinstance(extracted_data, str):
+                return OutputPager((self._apply_format_template(api_name, extracted_data),), budget)
+            return OutputPager(iter_pretty_json(extracted_data), budget, extracted_data)
+        finally:
+            self._observe_format(api_name, started)
+    
+    async def paginate_async(self, api_name: str, success: bool, response_data: Any, status_code: int = 200) -> OutputPager:
+        """与 paginate 相同，但尚未解码的大响应在工作池中完成解码、提取和格式化
+        
+        Args:
+            api_name: API名称
+            success: 请求是否成功
+            response_data: 响应数据，可以是 send_request(keep_raw=True) 返回的 RawResponse
+            status_code: HTTP状态码
+            
+        Returns:
+            OutputPager: 分页器
+        """
+        if not isinstance(response_data, RawResponse):
+            return self.paginate(api_name, success, response_data, status_code)
+        if self._offload is None:
+            return self.paginate(api_name, success, decode_json(response_data.body, response_data.charset), status_code)
+        
+        data = response_data
+        if self._offload.mode == MODE_PROCESS:
+            # 子进程只负责解码，提取和格式化依赖编译后的配置，在线程中执行
+            data = await self._offload.decode(response_data)
+        
+        def _render() -> OutputPager:
+            decoded = decode_json(data.body, data.charset) if isinstance(data, RawResponse) else data
+            pager = self.paginate(api_name, success, decoded, status_code)
+            # 在工作线程中生成第一页并估算保留的数据量，惰性序列化的开销也不落在事件循环上
+            pager.prefetch()
+            if not pager.done:
+                pager.retained_bytes()
+            return pager
+        
+        return await self._offload.run(_render)
+    
+    def _prepare(self, api_name: str, success: bool, response_data: Any, status_code: int, lazy: bool = False) -> Tuple[Optional[str], Any]:
+        """处理错误和提取路径
+        
+        Args:
+            api_name: API名称
+            success: 请求是否成功
+            response_data: 响应数据
+            status_code: HTTP状态码
+            lazy: 多值提取路径是否返回惰性迭代器而不是列表
+            
+        Returns:
+            Tuple[Optional[str], Any]: 已确定的输出文本（错误或默认消息），或 (None, 待格式化的数据)
+        """
         # 获取API配置
-        api_config = self.api_configs.get(api_name, {})
+        spec = self.api_specs.get(api_name)
+        fallback = spec.fallback if spec is not None else None
+        
+        if not success:
+            # 熔断期间直接返回配置的默认消息
+            if isinstance(response_data, dict) and response_data.get("circuit_open"):
+                if fallback:
+                    return fallback, None
+            return self._format_error(response_data), None
         
         # 提取响应数据
-        extracted_data = self._extract_data(api_config, response_data, status_code)
+        extracted_data = self._extract_data(api_name, response_data, status_code, lazy)
+        
+        # 提取路径不匹配
+        if extracted_data is MISSING:
+            if fallback:
+                return fallback, None
+            extracted_data = response_data
+        return None, extracted_data
+    
+    async def iter_stream_text(self, api_name: str, events: AsyncIterator[Tuple[bool, Any]]) -> AsyncIterator[str]:
+        """将流式事件转换为分段输出的文本
+        
+        对每个事件应用 stream.extract 路径，累积后按配置的长度、时间或句子边界分段输出；
+        上游停顿时也按时间间隔输出已累积的内容，不等待下一个事件
+        
+        Args:
+            api_name: API名称
+            events: RequestTemplateEngine.stream_request 产出的事件
+            
+        Returns:
+            AsyncIterator[str]: 分段文本
+        """
+        spec = self.api_specs.get(api_name)
+        stream_config = (spec.stream if spec is not None else None) or {}
+        flusher = StreamFlusher(
+            flush_chars=int(stream_config.get("flush_chars", 200)),
+            flush_interval=float(stream_config.get("flush_interval", 1.0)),
+            flush_on_sentence=bool(stream_config.get("flush_on_sentence", True)),
+            sentence_endings=stream_config.get("sentence_endings") or SENTENCE_ENDINGS
+        )
+        path = spec.stream_path if spec is not None else None
+        produced = False
+        
+        iterator = events.__aiter__()
+        next_event = None
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(iterator.__anext__())
+                
+                # 等待下一个事件时不取消读取，超过输出间隔先输出已累积的内容
+                wait = flusher.time_until_flush()
+                if wait is not None:
+                    done, _ = await asyncio.wait((next_event,), timeout=wait)
+                    if not done:
+                        chunk = flusher.flush()
+                        if chunk:
+                            produced = True
+                            yield chunk
+                        continue
+                
+                try:
+                    success, event = await next_event
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_event = None
+                
+                if not success:
+                    # 先输出已累积的内容，再输出错误
+                    rest = flusher.flush()
+                    if rest:
+                        yield rest
+                    yield self.format_response(api_name, False, event)
+                    return
+                
+                text = self._extract_stream_text(path, event)
+                chunk = flusher.feed(text)
+                if chunk:
+                    produced = True
+                    yield chunk
+        finally:
+            if next_event is not None:
+                next_event.cancel()
+        
+        rest = flusher.flush()
+        if rest:
+            yield rest
+        elif not produced and spec is not None and spec.fallback:
+            yield spec.fallback
+    
+    def _extract_stream_text(self, path: Optional[CompiledJsonPath], event: Any) -> str:
+        """从单个流式事件中提取文本
         
-        # 格式化输出
-        return self._apply_format_template(api_config, extracted_data)
+        Args:
+            path: 预编译的提取路径，None表示使用整个事件
+            event: 事件数据
+            
+        Returns:
+            str: 提取的文本，路径不匹配时为空
+        """
+        if path is not None:
+            event = path.extract(event, None)
+        if event is None:
+            return ""
+        if isinstance(event, str):
+            return event
+        if isinstance(event, list):
+            return "".join(item if isinstance(item, str) else CODEC.dumps_text(item) for item in event)
+        return CODEC.dumps_text(event)
     
     def _format_error(self, error_data: Dict[str, Any]) -> str:
         """格式化错误响应
@@ -55,111 +260,88 @@ class ResponseFormatter:
             return f"错误: {error_data['error']}"
         
         try:
-            return f"错误: {json.dumps(error_data, ensure_ascii=False, indent=2)}"
+            return f"错误: {CODEC.dumps_text(error_data, indent=True)}"
         except:
             return f"错误: {str(error_data)}"
     
-    def _extract_data(self, api_config: Dict[str, Any], response_data: Any, status_code: int) -> Any:
+    def _extract_data(self, api_name: str, response_data: Any, status_code: int, lazy: bool = False) -> Any:
         """从响应中提取数据
         
         Args:
-            api_config: API配置
+            api_name: API名称
             response_data: 响应数据
             status_code: HTTP状态码
+            lazy: 多值提取路径是否返回惰性迭代器而不是列表
             
         Returns:
-            Any: 提取的数据
+            Any: 提取的数据，路径不匹配时返回 MISSING
         """
-        response_config = api_config.get("response", {})
-        extract_config = response_config.get("extract", {})
-        
-        # 如果没有提取配置，直接返回响应数据
-        if not extract_config:
+        spec = self.api_specs.get(api_name)
+        if spec is None:
             return response_data
         
-        # 按状态码提取数据
-        by_status = extract_config.get("by_status", {})
-        
-        # 尝试精确匹配状态码
-        if str(status_code) in by_status:
-            return self._extract_by_path(response_data, by_status[str(status_code)])
-        
-        # 尝试状态码范围匹配(4xx, 5xx)
-        status_prefix = f"{status_code // 100}xx"
-        if status_prefix in by_status:
-            return self._extract_by_path(response_data, by_status[status_prefix])
-        
-        # 使用默认提取路径
-        default_path = extract_config.get("default")
-        if default_path:
-            return self._extract_by_path(response_data, default_path)
+        # 依次按精确状态码、状态码范围(4xx, 5xx)和默认路径提取
+        found, path = spec.extract_paths.select(status_code)
+        if not found:
+            # 没有匹配的提取配置，返回原始数据
+            return response_data
         
-        # 没有匹配的提取配置，返回原始数据
-        return response_data
+        if lazy and path is not None and path.is_multi:
+            return path.iter_matches(response_data)
+        return self._extract_by_path(response_data, path)
     
-    def _extract_by_path(self, data: Any, path: str) -> Any:
-        """按路径提取数据
-        
-        支持简单的JSONPath风格路径：$.data.result
+    def _extract_by_path(self, data: Any, path: Optional[CompiledJsonPath]) -> Any:
+        """按预编译路径提取数据
         
         Args:
             data: 数据对象
-            path: 提取路径
+            path: 预编译的提取路径，None表示直接返回原始数据
             
         Returns:
-            Any: 提取的数据
+            Any: 提取的数据，路径不匹配时返回 MISSING
         """
-        if not path.startswith("$."):
+        if path is None:
             return data
         
-        parts = path[2:].split(".")
-        current = data
+        result = path.extract(data)
+        if result is MISSING:
+            logger.warning(f"提取路径不匹配: {path.path}")
+        return result
+    
+    def _observe_format(self, api_name: str, started: float):
+        """记录一次格式化耗时
         
-        for part in parts:
-            if part == "":
-                continue
-                
-            if isinstance(current, dict) and part in current:
-                current = current[part]
-            else:
-                # 路径不匹配，返回原始数据
-                logger.warning(f"提取路径不匹配: {path}")
-                return data
-        
-        return current
+        Args:
+            api_name: API名称，未配置的API不记录
+            started: 开始时间（time.perf_counter）
+        """
+        child = self._format_seconds.get(api_name)
+        if child is not None:
+            child.observe(time.perf_counter() - started)
     
-    def _apply_format_template(self, api_config: Dict[str, Any], data: Any) -> str:
+    def _apply_format_template(self, api_name: str, data: Any) -> str:
         """应用格式化模板
         
         Args:
-            api_config: API配置
+            api_name: API名称
             data: 要格式化的数据
             
         Returns:
             str: 格式化后的文本
         """
-        response_config = api_config.get("response", {})
-        
-        # 获取格式化模板
-        template = response_config.get("format_template")
-        if not template:
+        # 获取预编译的格式化模板
+        spec = self.api_specs.get(api_name)
+        template = spec.format_template if spec is not None else None
+        if template is None:
             # 没有模板，尝试序列化为JSON
             try:
-                return json.dumps(data, ensure_ascii=False, indent=2)
+                return CODEC.dumps_text(data, indent=True)
             except:
                 return str(data)
         
         # 应用模板
         try:
-            if isinstance(data, dict):
-                # 替换模板中的变量
-                result = template
-                for key, value in data.items():
-                    result = result.replace(f"{{{{{key}}}}}", str(value))
-                return result
-            else:
-                # 替换单个result变量
-                return template.replace("{{result}}", str(data))
+            return template.render(data)
         except Exception as e:
             logger.error(f"应用格式化模板失败: {str(e)}")
             return str(data)
\ No newline at end of file
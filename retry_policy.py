@@ -0,0 +1,107 @@
+# retry_policy.py
+import random
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# 默认可以安全重试的幂等方法
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+class RetryPolicy:
+    """单个API的重试与对冲请求策略
+    
+    重试：对可重试的状态码或连接错误按指数退避加随机抖动重试，总耗时不超过整体超时；
+    默认只重试幂等方法，规则可以显式允许重试其他方法
+    
+    对冲：单次尝试的耗时超过近期延迟的指定分位数仍未返回时，再发送一个相同请求，
+    取先成功返回的结果
+    """
+    
+    def __init__(self, retry_config: Dict[str, Any], hedge_config: Optional[Dict[str, Any]] = None):
+        """初始化策略
+        
+        Args:
+            retry_config: API的 retry 配置块
+            hedge_config: API的 hedge 配置块
+        """
+        self.max_attempts = max(1, int(retry_config.get("max_attempts", 3)))
+        self.retry_on_status = {int(code) for code in retry_config.get("retry_on_status", [429, 502, 503, 504])}
+        self.retry_on_errors = set(retry_config.get("retry_on_errors", ["timeout", "connection"]))
+        self.backoff_base = float(retry_config.get("backoff_base", 0.2))
+        self.backoff_max = float(retry_config.get("backoff_max", 2.0))
+        self.methods = {method.upper() for method in retry_config.get("methods", IDEMPOTENT_METHODS)}
+        
+        hedge_config = hedge_config or {}
+        self.hedge_enabled = bool(hedge_config.get("enabled", False))
+        self.hedge_percentile = float(hedge_config.get("percentile", 95))
+        self.hedge_min_samples = int(hedge_config.get("min_samples", 20))
+        self.hedge_min_delay = float(hedge_config.get("min_delay", 0.05))
+        
+        # 近期成功请求的延迟样本，用于计算对冲阈值
+        self._latencies: Deque[float] = deque(maxlen=int(hedge_config.get("window", 200)))
+        self._hedge_delay: Optional[float] = None
+        self._samples_since_update = 0
+    
+    def allows_method(self, method: str, allow_retry: bool = False) -> bool:
+        """判断该请求是否允许重试和对冲
+        
+        Args:
+            method: HTTP方法
+            allow_retry: 规则是否显式允许重试非幂等方法
+        
+        Returns:
+            bool: 是否允许
+        """
+        return allow_retry or method.upper() in self.methods
+    
+    def is_retryable(self, result: Any) -> bool:
+        """判断失败结果是否值得重试
+        
+        Args:
+            result: 失败时的响应数据
+        
+        Returns:
+            bool: 是否可重试
+        """
+        if not isinstance(result, dict):
+            return False
+        if result.get("status_code") in self.retry_on_status:
+            return True
+        return result.get("error_type") in self.retry_on_errors
+    
+    def backoff(self, attempt: int) -> float:
+        """计算第 attempt 次失败后的等待时间（指数退避 + 全抖动）
+        
+        Args:
+            attempt: 已完成的尝试次数，从1开始
+        
+        Returns:
+            float: 等待秒数
+        """
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+    
+    def record_latency(self, latency: float):
+        """记录一次成功请求的延迟
+        
+        Args:
+            latency: 延迟（秒）
+        """
+        self._latencies.append(latency)
+        self._samples_since_update += 1
+    
+    def hedge_delay(self) -> Optional[float]:
+        """获取发送对冲请求前的等待时间
+        
+        Returns:
+            Optional[float]: 延迟分位数，未启用或样本不足时返回None
+        """
+        if not self.hedge_enabled or len(self._latencies) < self.hedge_min_samples:
+            return None
+        
+        # 每积累一定样本再重新排序计算，避免每次请求都排序
+        if self._hedge_delay is None or self._samples_since_update >= max(1, self._latencies.maxlen // 10):
+            samples = sorted(self._latencies)
+            index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+            self._hedge_delay = max(self.hedge_min_delay, samples[index])
+            self._samples_since_update = 0
+        return self._hedge_delay
@@ -1,11 +1,14 @@
 # rule_factory.py
-from typing import Dict, Type, List, Optional
+import time
+from typing import Any, Dict, Type, List, Optional, Tuple
 from .rules.abstract_rule import AbstractRule
 from .rules.regex_rule import RegexRule
 from .rules.keyword_rule import KeywordRule
 from .rules.command_rule import CommandRule
 from .rules.prefix_rule import PrefixRule
 from .rules.default_rule import DefaultRule
+from .rule_matcher import CompiledRuleMatcher
+from .metrics import RULE_MATCH_SECONDS, RULE_HITS
 
 class RuleFactory:
     """规则工厂：创建并管理各类规则
@@ -25,6 +28,11 @@ class RuleFactory:
         }
         
         self.rules: List[AbstractRule] = []
+        self._matcher: Optional[CompiledRuleMatcher] = None
+        
+        # 各规则的匹配耗时和命中次数子指标，构建规则时创建，键为规则对象的 id
+        self._rule_metrics: Dict[int, Tuple[Any, Any]] = {}
+        self._miss_seconds = RULE_MATCH_SECONDS.labels("none")
     
     def create_rule(self, rule_config: str) -> Optional[AbstractRule]:
         """创建规则实例
@@ -52,21 +60,39 @@ class RuleFactory:
             logger.error(f"创建规则失败: {str(e)}")
             return None
     
-    def build_rules(self, rule_configs: List[str]) -> List[AbstractRule]:
+    def build_rules(self, rule_configs: List[str], previous: Optional["RuleFactory"] = None) -> List[AbstractRule]:
         """根据配置构建规则列表
         
         Args:
             rule_configs: 规则配置字符串列表
+            previous: 热重载前的规则工厂，配置字符串未变化的规则直接沿用
             
         Returns:
             List[AbstractRule]: 构建的规则对象列表
         """
+        existing: Dict[str, AbstractRule] = {}
+        if previous is not None:
+            existing = {rule.rule_config: rule for rule in previous.rules}
+        
         self.rules = []
         for config in rule_configs:
-            rule = self.create_rule(config)
+            rule = existing.get(config) or self.create_rule(config)
             if rule:
                 self.rules.append(rule)
         
+        # 配置重复的规则共用同一个对象，按第一次出现的序号计数
+        self._rule_metrics = {}
+        for index, rule in enumerate(self.rules):
+            if id(rule) not in self._rule_metrics:
+                rule_type = type(rule).__name__
+                self._rule_metrics[id(rule)] = (
+                    RULE_MATCH_SECONDS.labels(rule_type),
+                    RULE_HITS.labels(str(index), rule_type)
+                )
+        
+        # 编译多模式匹配器，KEYWORD/COMMAND/PREFIX 规则一次扫描完成匹配
+        self._matcher = CompiledRuleMatcher(self.rules)
+        
         return self.rules
     
     def match_message(self, message: str):
@@ -78,9 +104,34 @@ class RuleFactory:
         Returns:
             Tuple[bool, Optional[Dict]]: 是否匹配成功和匹配参数
         """
+        started = time.perf_counter()
+        rule, params = self._match_rule(message)
+        elapsed = time.perf_counter() - started
+        
+        if rule is None:
+            self._miss_seconds.observe(elapsed)
+            return False, None
+        
+        match_seconds, hits = self._rule_metrics[id(rule)]
+        match_seconds.observe(elapsed)
+        hits.inc()
+        return True, params
+    
+    def _match_rule(self, message: str) -> Tuple[Optional[AbstractRule], Optional[Dict[str, Any]]]:
+        """查找第一条匹配消息的规则
+        
+        Args:
+            message: 要匹配的消息
+            
+        Returns:
+            Tuple[Optional[AbstractRule], Optional[Dict]]: 命中的规则和匹配参数
+        """
+        if self._matcher is not None:
+            return self._matcher.match_rule(message)
+        
         for rule in self.rules:
             matched, params = rule.match(message)
             if matched:
-                return True, params
+                return rule, params
         
-        return False, None
\ No newline at end of file
+        return None, None
\ No newline at end of file
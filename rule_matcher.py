@@ -0,0 +1,256 @@
+# rule_matcher.py
+from typing import Dict, Any, List, Optional, Tuple
+from .rules.abstract_rule import AbstractRule
+from .rules.keyword_rule import KeywordRule
+from .rules.command_rule import CommandRule
+from .rules.prefix_rule import PrefixRule
+
+# 表示"没有候选规则"的规则序号
+_NO_MATCH = float("inf")
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick 自动机：一次扫描找出所有命中的关键词
+    
+    每个关键词绑定一个规则序号，扫描结果为命中关键词中最小的规则序号
+    """
+    
+    def __init__(self):
+        """初始化自动机"""
+        # 节点以并行列表存储：转移表、失败指针、命中的最小规则序号
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[float] = [_NO_MATCH]
+        self._built = False
+    
+    def add(self, pattern: str, rule_index: int):
+        """添加关键词
+        
+        Args:
+            pattern: 关键词
+            rule_index: 关键词对应的规则序号
+        """
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(_NO_MATCH)
+                self._goto[node][char] = next_node
+            node = next_node
+        self._out[node] = min(self._out[node], rule_index)
+        self._built = False
+    
+    def build(self):
+        """构建失败指针，并沿失败链合并命中的规则序号"""
+        queue = []
+        for next_node in self._goto[0].values():
+            self._fail[next_node] = 0
+            queue.append(next_node)
+        
+        # 广度优先遍历，保证处理某节点时其失败节点已处理完毕
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, next_node in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(char, 0)
+                self._fail[next_node] = fail_target if fail_target != next_node else 0
+                self._out[next_node] = min(self._out[next_node], self._out[self._fail[next_node]])
+                queue.append(next_node)
+        
+        self._built = True
+    
+    def search(self, text: str) -> float:
+        """扫描文本
+        
+        Args:
+            text: 要扫描的文本
+        
+        Returns:
+            float: 命中关键词中最小的规则序号，未命中时为无穷大
+        """
+        if not self._built:
+            self.build()
+        
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        best = out[0]
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node] < best:
+                best = out[node]
+        return best
+
+class CommandPrefixTrie:
+    """命令/前缀字符树：沿消息开头走一遍即可找出所有命中的命令和前缀规则"""
+    
+    def __init__(self):
+        """初始化字符树"""
+        self._children: List[Dict[str, int]] = [{}]
+        self._prefix_index: List[float] = [_NO_MATCH]
+        self._command_index: List[float] = [_NO_MATCH]
+    
+    def _insert(self, pattern: str) -> int:
+        """插入模式串并返回末尾节点"""
+        node = 0
+        for char in pattern:
+            next_node = self._children[node].get(char)
+            if next_node is None:
+                next_node = len(self._children)
+                self._children.append({})
+                self._prefix_index.append(_NO_MATCH)
+                self._command_index.append(_NO_MATCH)
+                self._children[node][char] = next_node
+            node = next_node
+        return node
+    
+    def add_prefix(self, prefix: str, rule_index: int):
+        """添加前缀规则
+        
+        Args:
+            prefix: 前缀
+            rule_index: 规则序号
+        """
+        node = self._insert(prefix)
+        self._prefix_index[node] = min(self._prefix_index[node], rule_index)
+    
+    def add_command(self, command: str, rule_index: int):
+        """添加命令规则
+        
+        Args:
+            command: 命令
+            rule_index: 规则序号
+        """
+        node = self._insert(command)
+        self._command_index[node] = min(self._command_index[node], rule_index)
+    
+    def search(self, text: str) -> float:
+        """沿文本开头匹配
+        
+        前缀规则只要走到节点即命中；命令规则要求消息在此结束或紧跟空格
+        
+        Args:
+            text: 要匹配的文本
+        
+        Returns:
+            float: 命中规则中最小的规则序号，未命中时为无穷大
+        """
+        children = self._children
+        prefix_index = self._prefix_index
+        command_index = self._command_index
+        length = len(text)
+        
+        best = _NO_MATCH
+        node = 0
+        depth = 0
+        while True:
+            if prefix_index[node] < best:
+                best = prefix_index[node]
+            if command_index[node] < best and (depth == length or text[depth] == " "):
+                best = command_index[node]
+            if depth == length:
+                break
+            node = children[node].get(text[depth])
+            if node is None:
+                break
+            depth += 1
+        return best
+
+class CompiledRuleMatcher:
+    """编译后的规则匹配器
+    
+    KEYWORD 规则编入 Aho-Corasick 自动机，COMMAND/PREFIX 规则编入字符树，
+    一次扫描得到命中的最小规则序号；其余规则（REGEX、DEFAULT 等）仍逐条调用
+    match()，但只检查序号更靠前的规则，从而保持"先匹配先得"的顺序不变
+    """
+    
+    def __init__(self, rules: List[AbstractRule]):
+        """根据规则列表编译匹配器
+        
+        Args:
+            rules: 按优先级排列的规则列表
+        """
+        self.rules = rules
+        self._keywords = AhoCorasickAutomaton()
+        self._trie = CommandPrefixTrie()
+        self._has_keywords = False
+        self._has_trie = False
+        # 无法编译的规则，保存(序号, 规则)
+        self._generic: List[Tuple[int, AbstractRule]] = []
+        
+        for index, rule in enumerate(rules):
+            # 只编译内置类型本身，子类可能重写了匹配逻辑
+            rule_class = type(rule)
+            pattern = getattr(rule, "match_pattern", None)
+            if pattern is None:
+                self._generic.append((index, rule))
+            elif rule_class is KeywordRule:
+                self._keywords.add(pattern, index)
+                self._has_keywords = True
+            elif rule_class is CommandRule:
+                self._trie.add_command(pattern, index)
+                self._has_trie = True
+            elif rule_class is PrefixRule:
+                self._trie.add_prefix(pattern, index)
+                self._has_trie = True
+            else:
+                self._generic.append((index, rule))
+        
+        if self._has_keywords:
+            self._keywords.build()
+    
+    def match(self, message: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """匹配消息
+        
+        Args:
+            message: 要匹配的消息
+        
+        Returns:
+            Tuple[bool, Optional[Dict]]: 是否匹配成功和匹配参数
+        """
+        rule, params = self.match_rule(message)
+        return rule is not None, params
+    
+    def match_rule(self, message: str) -> Tuple[Optional[AbstractRule], Optional[Dict[str, Any]]]:
+        """匹配消息并返回命中的规则
+        
+        Args:
+            message: 要匹配的消息
+        
+        Returns:
+            Tuple[Optional[AbstractRule], Optional[Dict]]: 命中的规则和匹配参数，未命中时均为None
+        """
+        # 与 AbstractRule._pre_match 一致：空白消息不匹配任何规则
+        if not message.strip():
+            return None, None
+        
+        best = _NO_MATCH
+        if self._has_trie:
+            best = self._trie.search(message)
+        if self._has_keywords:
+            best = min(best, self._keywords.search(message))
+        
+        # 只需检查比已命中规则更靠前的通用规则
+        for index, rule in self._generic:
+            if index > best:
+                break
+            matched, params = rule.match(message)
+            if matched:
+                return rule, params
+        
+        if best == _NO_MATCH:
+            return None, None
+        
+        # 由命中的规则自己生成参数，保证输出与逐条匹配完全一致
+        rule = self.rules[int(best)]
+        matched, params = rule.match(message)
+        return (rule, params) if matched else (None, None)
\ No newline at end of file
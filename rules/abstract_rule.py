@@ -1,6 +1,8 @@
 # rules/abstract_rule.py
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, Tuple
+from ..fan_out import FanOutPolicy
+from ..quota import QuotaLimit
 
 class AbstractRule(ABC):
     """规则抽象基类，定义规则匹配的模板方法
@@ -26,13 +28,26 @@ class AbstractRule(ABC):
         if len(parts) >= 3:
             self.rule_type = parts[0]  # 规则类型
             self.match_pattern = parts[1]  # 匹配模式
-            self.api_name = parts[2]  # 目标API名称
+            # 目标API名称，多个API以 | 分隔时并发请求并合并结果（扇出）
+            self.api_names = [name.strip() for name in parts[2].split("|") if name.strip()] or [parts[2]]
+            self.api_name = self.api_names[0]
             
             # 可选的路径覆盖
             self.path_override = parts[3] if len(parts) > 3 else None
             
             # 可选的HTTP方法覆盖
             self.method_override = parts[4] if len(parts) > 4 else None
+            
+            # 可选的规则选项，例如 retry 表示允许重试非幂等方法，merge=all 指定扇出的合并策略
+            options = {option.strip().lower() for option in parts[5:]}
+            self.allow_retry = "retry" in options
+            self.fan_out = FanOutPolicy.from_options(self.api_names, options) if len(self.api_names) > 1 else None
+            
+            # 规则级配额，例如 quota=user:10/60，可写多个；与规则配置字符串绑定，规则修改后重新计数
+            self.quotas = tuple(
+                (f"rule:{self.rule_config}", QuotaLimit.parse(option[len("quota="):]))
+                for option in sorted(options) if option.startswith("quota=")
+            )
     
     def match(self, message: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """模板方法：执行规则匹配流程
@@ -99,6 +114,9 @@ class AbstractRule(ABC):
         result.update({
             "api_name": self.api_name,
             "path_override": self.path_override,
-            "method_override": self.method_override
+            "method_override": self.method_override,
+            "allow_retry": self.allow_retry,
+            "fan_out": self.fan_out,
+            "quotas": self.quotas
         })
         return result
\ No newline at end of file
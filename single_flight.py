@@ -0,0 +1,44 @@
+# single_flight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class SingleFlight:
+    """单飞请求合并：相同键的并发调用只执行一次
+    
+    第一个调用者发起实际请求，请求完成前到达的相同键调用者等待同一个任务，
+    请求完成后立即移除，不会返回过期数据
+    """
+    
+    def __init__(self):
+        """初始化"""
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], counters: Optional[Tuple[Any, Any]] = None) -> Any:
+        """执行或加入一次调用
+        
+        Args:
+            key: 合并键
+            func: 无参协程函数，只有首个调用者会执行
+            counters: (发起请求, 等待合并) 两个计数器子指标，None表示不计数
+        
+        Returns:
+            Any: 调用结果，所有合并的调用者得到同一个结果
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            if counters is not None:
+                counters[0].inc()
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            if counters is not None:
+                counters[1].inc()
+        
+        # shield 保证单个调用者被取消时不会取消其他人共享的请求
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """请求完成后移除，之后的调用会重新发起请求"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
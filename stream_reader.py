@@ -0,0 +1,198 @@
+# stream_reader.py
+import codecs
+import time
+from typing import Any, AsyncIterator, Optional
+from .json_codec import CODEC
+
+# 默认的句子结束符，用于按句子边界刷新；ASCII 标点只有后跟空白或流结束时才算句子边界
+SENTENCE_ENDINGS = "。！？!?；;.…\n"
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """将字节块流切分为文本行
+    
+    自行按换行切分，不受 aiohttp 单行长度上限限制；
+    使用增量解码器，多字节字符被拆到两个块中也能正确解码
+    
+    Args:
+        chunks: 字节块异步迭代器
+    
+    Returns:
+        AsyncIterator[str]: 去掉行尾换行符的文本行
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        while True:
+            index = buffer.find("\n")
+            if index < 0:
+                break
+            line = buffer[:index]
+            buffer = buffer[index + 1:]
+            yield line[:-1] if line.endswith("\r") else line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def iter_sse_events(lines: AsyncIterator[str], done_marker: Optional[str] = "[DONE]") -> AsyncIterator[Any]:
+    """解析 Server-Sent Events 流
+    
+    Args:
+        lines: 文本行异步迭代器
+        done_marker: 表示流结束的 data 内容，None表示不检查
+    
+    Returns:
+        AsyncIterator[Any]: 每个事件的 data，能解析为JSON时返回解析结果
+    """
+    data_lines = []
+    async for line in lines:
+        if line == "":
+            # 空行表示一个事件结束
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if done_marker is not None and data.strip() == done_marker:
+                    return
+                yield _decode_json(data)
+            continue
+        if line.startswith(":"):
+            # 注释/心跳
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+    
+    if data_lines:
+        data = "\n".join(data_lines)
+        if done_marker is None or data.strip() != done_marker:
+            yield _decode_json(data)
+
+async def iter_json_lines(lines: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """解析按行分隔的JSON流（NDJSON / JSON Lines）
+    
+    Args:
+        lines: 文本行异步迭代器
+    
+    Returns:
+        AsyncIterator[Any]: 每行解析后的对象，无法解析的行按原文返回
+    """
+    async for line in lines:
+        if line.strip():
+            yield _decode_json(line)
+
+async def iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """将字节块流解码为文本片段
+    
+    Args:
+        chunks: 字节块异步迭代器
+    
+    Returns:
+        AsyncIterator[str]: 文本片段
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+def _decode_json(text: str) -> Any:
+    """尝试解析JSON，失败时返回原文"""
+    try:
+        return CODEC.loads(text)
+    except ValueError:
+        return text
+
+class StreamFlusher:
+    """流式输出缓冲：累积文本，在达到长度、时间间隔或句子边界时输出一段
+    
+    ASCII 标点（如 "."）也出现在小数、缩写和URL中，片段以其结尾时推迟到下一个片段：
+    下一个片段以空白开头才在此处输出，流结束时由调用方 flush
+    """
+    
+    def __init__(self, flush_chars: int = 200, flush_interval: float = 1.0, flush_on_sentence: bool = True,
+                 sentence_endings: str = SENTENCE_ENDINGS):
+        """初始化缓冲
+        
+        Args:
+            flush_chars: 累积超过该字符数时输出，0表示不按长度输出
+            flush_interval: 距上次输出超过该秒数时输出，0表示不按时间输出
+            flush_on_sentence: 遇到句子结束符时是否输出
+            sentence_endings: 句子结束符，每个字符为一个结束符
+        """
+        self.flush_chars = flush_chars
+        self.flush_interval = flush_interval
+        self.flush_on_sentence = flush_on_sentence
+        self.sentence_endings = frozenset(sentence_endings)
+        # 需要看到后面的空白才能确定是句子边界的结束符
+        self._deferred_endings = frozenset(char for char in sentence_endings if char.isascii() and not char.isspace())
+        self._ending_pending = False
+        self._buffer = []
+        self._length = 0
+        self._last_flush = time.monotonic()
+    
+    def feed(self, text: str) -> Optional[str]:
+        """追加文本
+        
+        Args:
+            text: 新到达的文本
+        
+        Returns:
+            Optional[str]: 满足输出条件时返回累积的文本，否则返回None
+        """
+        if not text:
+            return None
+        
+        # 上一片段以 ASCII 标点结尾，本片段以空白开头时确认是句子边界，先输出上一片段
+        previous = None
+        if self._ending_pending:
+            self._ending_pending = False
+            if text[0].isspace():
+                previous = self.flush()
+        
+        self._buffer.append(text)
+        self._length += len(text)
+        chunk = self._check(text)
+        if previous is None:
+            return chunk
+        return previous + chunk if chunk else previous
+    
+    def _check(self, text: str) -> Optional[str]:
+        """检查追加片段后是否满足输出条件"""
+        if self.flush_chars and self._length >= self.flush_chars:
+            return self.flush()
+        if self.flush_on_sentence:
+            stripped = text.rstrip(" ")
+            ending = stripped[-1:]
+            if ending in self.sentence_endings:
+                if ending not in self._deferred_endings or len(stripped) < len(text):
+                    return self.flush()
+                self._ending_pending = True
+        if self.flush_interval and time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return None
+    
+    def time_until_flush(self) -> Optional[float]:
+        """距离按时间间隔输出还剩多少秒
+        
+        Returns:
+            Optional[float]: 剩余秒数，缓冲为空或不按时间输出时返回None
+        """
+        if not self.flush_interval or not self._length:
+            return None
+        return max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+    
+    def flush(self) -> str:
+        """输出并清空缓冲
+        
+        Returns:
+            str: 累积的文本
+        """
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._length = 0
+        self._ending_pending = False
+        self._last_flush = time.monotonic()
+        return text
\ No newline at end of file
@@ -0,0 +1,141 @@
+# worker_pool.py
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from .json_codec import CODEC
+from .metrics import OFFLOADED_RESPONSES, OFFLOAD_INFLIGHT
+
+# 工作池类型
+MODE_THREAD = "thread"
+MODE_PROCESS = "process"
+
+def decode_json(body: bytes, charset: str = "utf-8") -> Any:
+    """解码JSON响应体，定义在模块级以便在进程池中执行
+    
+    Args:
+        body: 原始响应体
+        charset: 响应的字符集
+    
+    Returns:
+        Any: 解码结果，不是合法JSON时为解码后的文本
+    """
+    try:
+        if charset.lower() in ("utf-8", "utf8"):
+            return CODEC.loads(body)
+        return CODEC.loads(body.decode(charset, errors="replace"))
+    except ValueError:
+        return body.decode(charset, errors="replace")
+
+class RawResponse:
+    """超过卸载阈值、尚未解码的成功响应
+    
+    原样保存响应体字节串，直到在工作池中解码，避免在事件循环上解析大响应
+    """
+    
+    __slots__ = ("body", "charset")
+    
+    def __init__(self, body: bytes, charset: str = "utf-8"):
+        self.body = body
+        self.charset = charset
+    
+    def __len__(self) -> int:
+        return len(self.body)
+
+class WorkerPool:
+    """把大响应的解码、数据提取和模板格式化放到工作池中执行
+    
+    线程池模式下所有步骤在线程中执行，字节串直接传递不复制；进程池模式下解码在子进程中执行，
+    提取和格式化依赖编译后的配置，仍在线程中执行。工作池满后新任务直接在事件循环上执行
+    """
+    
+    def __init__(self, offload_config: Optional[Dict[str, Any]] = None):
+        """初始化，执行器在首次使用时创建
+        
+        Args:
+            offload_config: 全局 offload 配置块
+        
+        Raises:
+            ValueError: 配置无效
+        """
+        offload_config = offload_config or {}
+        self.config = offload_config
+        self.enabled = bool(offload_config.get("enabled", False))
+        self.threshold = int(offload_config.get("threshold_bytes", 1024 * 1024))
+        self.mode = offload_config.get("mode", MODE_THREAD)
+        if self.mode not in (MODE_THREAD, MODE_PROCESS):
+            raise ValueError(f"offload.mode 只能是 thread 或 process: {self.mode}")
+        self.workers = max(1, int(offload_config.get("workers", 2)))
+        self.max_queue = max(0, int(offload_config.get("max_queue", 16)))
+        
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        # 已提交到工作池、尚未完成的任务数，不超过 workers + max_queue
+        self._inflight = 0
+        
+        self._offloaded_thread = OFFLOADED_RESPONSES.labels(MODE_THREAD)
+        self._offloaded_process = OFFLOADED_RESPONSES.labels(MODE_PROCESS) if self.mode == MODE_PROCESS else None
+        self._inline = OFFLOADED_RESPONSES.labels("inline")
+        self._inflight_gauge = OFFLOAD_INFLIGHT.labels()
+    
+    def should_offload(self, size: int) -> bool:
+        """判断该大小的响应是否交给工作池处理
+        
+        Args:
+            size: 响应体字节数
+        
+        Returns:
+            bool: 是否卸载
+        """
+        return self.enabled and size >= self.threshold
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在线程池中执行函数，工作池已满时在当前线程执行
+        
+        Args:
+            func: 要执行的函数
+            args: 位置参数
+        
+        Returns:
+            Any: 函数返回值
+        """
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extapi-offload")
+        return await self._submit(self._threads, func, *args)
+    
+    async def decode(self, raw: RawResponse) -> Any:
+        """在工作池中解码原始响应
+        
+        Args:
+            raw: 原始响应
+        
+        Returns:
+            Any: 解码结果
+        """
+        if self.mode == MODE_PROCESS:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            return await self._submit(self._processes, decode_json, raw.body, raw.charset)
+        return await self.run(decode_json, raw.body, raw.charset)
+    
+    async def _submit(self, executor: Executor, func: Callable[..., Any], *args: Any) -> Any:
+        """提交任务，超过队列上限时在当前线程执行"""
+        if self._inflight >= self.workers + self.max_queue:
+            self._inline.inc()
+            return func(*args)
+        self._inflight += 1
+        self._inflight_gauge.inc()
+        (self._offloaded_process if executor is self._processes else self._offloaded_thread).inc()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args))
+        finally:
+            self._inflight -= 1
+            self._inflight_gauge.inc(-1)
+    
+    def shutdown(self):
+        """关闭执行器，不等待进行中的任务"""
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self._threads = None
+        self._processes = None